@@ -1,17 +1,25 @@
 # app/app.py
 
 import os
-from fastapi import FastAPI, Security, File, UploadFile
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import List
+from fastapi import FastAPI, Security, File, UploadFile, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, JSONResponse, FileResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from .schema import (
   MenuSchema,
   AddStaffSchema,
+  BulkAddStaffSchema,
   UpdateStaffEmailSchema,
   UpdateMenuItemSchema,
+  BulkUpdateMenuItemsSchema,
   MenuScanResponse,
   CreateOrderSchema,
   UpdateOrderStatusSchema,
+  BulkUpdateOrderStatusSchema,
   UpdateUserProfileSchema,
   VerifyPickupSchema,
   VerifyPaymentSchema,
@@ -26,11 +34,19 @@ from .staff import (
   upload_menu,
   get_menu,
   scan_menu_image,
+  scan_menu_images,
+  stream_scan_menu_image,
+  MAX_SCAN_PAGES,
+  MAX_STAFF_CSV_BYTES,
   update_menu_item,
+  bulk_update_menu_items,
   delete_menu_item,
   add_staff_member,
+  add_staff_members,
   get_stall_orders,
+  get_stall_prep_queue,
   update_order_status_staff,
+  bulk_update_order_status_staff,
   get_staff_me,
   verify_order_pickup,
   activate_staff,
@@ -42,7 +58,8 @@ from .manager import (
   get_my_staff,
   remove_staff_member,
   update_staff_email,
-  get_stall_performance_overview
+  get_stall_performance_overview,
+  export_stall_orders
 )
 from .user import (
   get_user_menu,
@@ -55,8 +72,55 @@ from .user import (
   buy_resale_item
 )
 from .webhook import router as webhook_router
-
-app = FastAPI()
+from .prep_queue import stop_all_prep_queues
+from .image_preprocess import shutdown_preprocess_pool
+from .uploads import UploadSizeLimitMiddleware, MAX_SCAN_UPLOAD_BYTES
+from .circuit_breaker import breaker_snapshots
+from .http_client import close_sessions
+from .firestore_trace import FirestoreTraceMiddleware
+from .metrics import MetricsMiddleware, render_metrics, instrument_firebase_auth, mark_worker_stopped
+from .outbox import run_outbox_worker, OUTBOX_WORKER_ENABLED
+from .sweeper import run_sweeper, SWEEPER_ENABLED
+from .archive import run_archiver, ARCHIVE_ENABLED
+from .resale_feed import FEED_PAGE_SIZE, MAX_FEED_PAGE_SIZE
+from .logging_config import configure_logging, stop_logging, RequestContextMiddleware
+from .profiling import ProfilingMiddleware, is_profiling_admin, list_profiles, get_profile_path
+
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    background_tasks = []
+    if OUTBOX_WORKER_ENABLED:
+        background_tasks.append(asyncio.create_task(run_outbox_worker()))
+    if SWEEPER_ENABLED:
+        background_tasks.append(asyncio.create_task(run_sweeper()))
+    if ARCHIVE_ENABLED:
+        background_tasks.append(asyncio.create_task(run_archiver()))
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    stop_all_prep_queues()
+    shutdown_preprocess_pool()
+    close_sessions()
+    mark_worker_stopped()
+    stop_logging()
+
+app = FastAPI(lifespan=lifespan)
+
+# Registered before CORS so its 413s still carry CORS headers.
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/staff/menu/scan-image": MAX_SCAN_UPLOAD_BYTES,
+        "/staff/menu/scan-image/stream": MAX_SCAN_UPLOAD_BYTES,
+        "/staff/menu/scan-images": MAX_SCAN_UPLOAD_BYTES * MAX_SCAN_PAGES,
+        "/staff/add-members/csv": MAX_STAFF_CSV_BYTES,
+    },
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -74,8 +138,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed", "X-Request-ID"],
 )
 
+# Inside the tracing and metrics middlewares, so profiles show handler time only.
+app.add_middleware(ProfilingMiddleware)
+
+# Added last so they wrap everything and also see the upload guard's time.
+app.add_middleware(FirestoreTraceMiddleware)
+app.add_middleware(MetricsMiddleware)
+# Outermost, so every log line of the request carries its id.
+app.add_middleware(RequestContextMiddleware)
+
+instrument_firebase_auth()
+
 security = HTTPBearer()
 
 
@@ -87,6 +163,29 @@ def health_check():
         "environment": os.getenv("ENV", "development")
     }
 
+@app.get("/metrics", tags=["health"], include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/health/dependencies", tags=["health"])
+def dependency_health():
+    return {"circuit_breakers": breaker_snapshots()}
+
+# Both answer 404 without a valid X-Profile-Token, as if they did not exist.
+@app.get("/debug/profiles", tags=["health"], include_in_schema=False)
+def profiles(profile_token: str = Header(None, alias="X-Profile-Token")):
+    if not is_profiling_admin(profile_token):
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    return {"profiles": list_profiles()}
+
+@app.get("/debug/profiles/{name}", tags=["health"], include_in_schema=False)
+def download_profile(name: str, profile_token: str = Header(None, alias="X-Profile-Token")):
+    path = get_profile_path(name) if is_profiling_admin(profile_token) else None
+    if path is None:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    return FileResponse(path, media_type="application/json", filename=name)
+
 app.include_router(webhook_router)
 
 @app.post('/auth/verify-staff', tags=["auth"])
@@ -112,22 +211,27 @@ async def get_student_menu_endpoint(
 
 @app.get("/user/feed/discounted", tags=["user"])
 async def get_discounted_feed_endpoint(
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=MAX_FEED_PAGE_SIZE),
+    cursor: str = None,
     credentials: HTTPAuthorizationCredentials = Security(security)
 ):
-    return await get_discounted_feed(credentials.credentials)
+    return await get_discounted_feed(credentials.credentials, limit=limit, cursor=cursor)
 
 @app.post("/user/order/create", tags=["user"])
 async def create_order_endpoint(
     order_data: CreateOrderSchema,
-    credentials: HTTPAuthorizationCredentials = Security(security)
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    idempotency_key: str = Header(None, alias="Idempotency-Key")
 ):
-    return await create_payment_order(order_data, credentials.credentials)
+    return await create_payment_order(order_data, credentials.credentials, idempotency_key)
 
 @app.get("/user/orders", tags=["user"])
 async def get_student_orders_endpoint(
+    include_archived: bool = False,
+    cursor: str = None,
     credentials: HTTPAuthorizationCredentials = Security(security)
 ):
-    return await get_user_orders(credentials.credentials)
+    return await get_user_orders(credentials.credentials, include_archived=include_archived, cursor=cursor)
 
 @app.post("/user/order/verify",tags=["user"])
 async def verify_order_endpoint(
@@ -146,9 +250,10 @@ async def cancel_order_endpoint(
 @app.post("/user/resale/{resale_id}/buy", tags=["user"])
 async def buy_resale_item_endpoint(
     resale_id: str,
-    credentials: HTTPAuthorizationCredentials = Security(security)
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    idempotency_key: str = Header(None, alias="Idempotency-Key")
 ):
-    return await buy_resale_item(resale_id, credentials.credentials)
+    return await buy_resale_item(resale_id, credentials.credentials, idempotency_key)
 
 @app.get("/staff/performance/overview", tags=["manager"])
 async def get_stall_performance_overview_endpoint(
@@ -158,6 +263,16 @@ async def get_stall_performance_overview_endpoint(
 ):
     return await get_stall_performance_overview(month, year, credentials.credentials)
 
+@app.get("/staff/orders/export", tags=["manager"])
+async def export_stall_orders_endpoint(
+    start: date,
+    end: date,
+    format: str = "csv",
+    gzip: bool = False,
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    return await export_stall_orders(credentials.credentials, start, end, export_format=format, compress=gzip)
+
 @app.post('/staff/add-member', tags=["manager"])
 async def add_staff_endpoint(
     staff_data: AddStaffSchema,
@@ -165,6 +280,20 @@ async def add_staff_endpoint(
 ):
     return await add_staff_member(staff_data, credentials.credentials)
 
+@app.post('/staff/add-members', tags=["manager"])
+async def add_staff_members_endpoint(
+    staff_data: BulkAddStaffSchema,
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    return await add_staff_members(staff_data, credentials.credentials)
+
+@app.post('/staff/add-members/csv', tags=["manager"])
+async def add_staff_members_csv_endpoint(
+    file: UploadFile = File(...),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    return await add_staff_members(None, credentials.credentials, csv_file=file)
+
 @app.get('/staff/list', tags=["manager"])
 async def get_staff_list_endpoint(
     credentials: HTTPAuthorizationCredentials = Security(security)
@@ -228,6 +357,28 @@ async def scan_menu_endpoint(
     token = credentials.credentials
     return await scan_menu_image(file, token)
 
+@app.post("/staff/menu/scan-image/stream", tags=["staff", "manager"])
+async def stream_scan_menu_endpoint(
+    file: UploadFile = File(...),
+    format: str = "ndjson",
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    return await stream_scan_menu_image(file, credentials.credentials, stream_format=format)
+
+@app.post("/staff/menu/scan-images", tags=["staff", "manager"], response_model=MenuScanResponse)
+async def scan_menu_pages_endpoint(
+    files: List[UploadFile] = File(...),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    return await scan_menu_images(files, credentials.credentials)
+
+@app.patch("/staff/menu", tags=["staff", "manager"])
+async def bulk_update_menu_items_endpoint(
+    update_data: BulkUpdateMenuItemsSchema,
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    return await bulk_update_menu_items(update_data, credentials.credentials)
+
 @app.patch("/staff/menu/{item_id}", tags=["staff", "manager"])
 async def update_menu_item_endpoint(
     item_id: str,
@@ -257,6 +408,19 @@ async def get_staff_orders_endpoint(
 ):
     return await get_stall_orders(credentials.credentials, status_filter=status)
 
+@app.get("/staff/orders/prep-queue", tags=["staff", "manager"])
+async def get_prep_queue_endpoint(
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    return await get_stall_prep_queue(credentials.credentials)
+
+@app.patch("/staff/orders/bulk-status", tags=["staff", "manager"])
+async def bulk_update_order_status_endpoint(
+    status_data: BulkUpdateOrderStatusSchema,
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    return await bulk_update_order_status_staff(status_data, credentials.credentials)
+
 @app.patch("/staff/orders/{order_id}/status", tags=["staff", "manager"])
 async def update_order_status_endpoint(
     order_id: str,
@@ -0,0 +1,250 @@
+# app/archive.py
+
+import os
+import gzip
+import json
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from .firebase_init import db, firestore
+from .firestore_batch import build_batch, FIRESTORE_BATCH_LIMIT
+from .orders_store import all_orders
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "order_archives"
+ARCHIVE_ENABLED = os.environ.get("ORDER_ARCHIVE_ENABLED", "true").lower() == "true"
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ORDER_ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_INTERVAL_SECONDS = float(os.environ.get("ORDER_ARCHIVE_INTERVAL_SECONDS", str(6 * 60 * 60)))
+ARCHIVED_STATUSES = ["CLAIMED", "COMPLETED", "CANCELLED", "EXPIRED"]
+
+# One archive part plus the deletes of its orders must fit in one batch, so
+# moving a part is atomic: an order is either live or archived, never lost.
+ARCHIVE_PART_MAX_ORDERS = FIRESTORE_BATCH_LIMIT - 1
+# Parts are also split until they fit under Firestore's 1 MiB document limit,
+# with headroom for field names and the index arrays.
+ARCHIVE_PART_MAX_BYTES = int(os.environ.get("ORDER_ARCHIVE_PART_MAX_BYTES", str(900 * 1024)))
+
+
+def _json_default(value):
+  if isinstance(value, datetime):
+    return value.isoformat()
+  if isinstance(value, bytes):
+    return value.hex()
+  return str(value)
+
+
+def encode_orders(orders: list) -> bytes:
+  lines = (json.dumps(order, default=_json_default, separators=(",", ":")) for order in orders)
+  return gzip.compress("\n".join(lines).encode("utf-8"))
+
+
+def decode_orders(blob: bytes) -> list:
+  text = gzip.decompress(blob).decode("utf-8")
+  return [json.loads(line) for line in text.splitlines() if line]
+
+
+def archive_month(created_at: datetime) -> str:
+  return created_at.strftime("%Y-%m")
+
+
+def _archive_part(college_id: str, month: str, docs: list):
+  orders = []
+  for doc in docs:
+    data = doc.to_dict()
+    data["id"] = doc.id
+    orders.append(data)
+
+  created = [order["created_at"] for order in orders if order.get("created_at")]
+
+  # Derived from the order ids, so re-archiving the same page overwrites the
+  # same part instead of duplicating it.
+  part_id = hashlib.sha1(",".join(sorted(doc.id for doc in docs)).encode()).hexdigest()[:20]
+  ref = db.collection(ARCHIVE_COLLECTION).document(f"{college_id}_{month}_{part_id}")
+
+  return ref, {
+    "college_id": college_id,
+    "month": month,
+    "user_ids": sorted({order["user_id"] for order in orders if order.get("user_id")}),
+    "stall_ids": sorted({order["stall_id"] for order in orders if order.get("stall_id")}),
+    "order_count": len(orders),
+    "first_created_at": min(created) if created else None,
+    "last_created_at": max(created) if created else None,
+    "orders_ndjson_gz": encode_orders(orders),
+    "archived_at": firestore.SERVER_TIMESTAMP
+  }
+
+
+def _part_size(part: dict) -> int:
+  # Approximate stored size: the blob dominates, plus the lookup arrays.
+  ids = part["user_ids"] + part["stall_ids"]
+  return len(part["orders_ndjson_gz"]) + sum(len(value) + 1 for value in ids) + 512
+
+
+def _split_parts(college_id: str, month: str, docs: list) -> list:
+  # Returns [(ref, part, docs)], halving the orders until every part fits in
+  # ARCHIVE_PART_MAX_BYTES. A single order that cannot fit stays live.
+  ref, part = _archive_part(college_id, month, docs)
+  if _part_size(part) <= ARCHIVE_PART_MAX_BYTES:
+    return [(ref, part, docs)]
+  if len(docs) == 1:
+    logger.warning("Order %s is too large to archive (%d bytes)", docs[0].id, _part_size(part))
+    return []
+
+  middle = len(docs) // 2
+  return _split_parts(college_id, month, docs[:middle]) + _split_parts(college_id, month, docs[middle:])
+
+
+def archive_old_orders(now: datetime = None) -> int:
+  # Moves terminal orders older than ARCHIVE_AFTER_DAYS into compressed
+  # per-college, per-month archive parts and deletes them from `orders`.
+  now = now or datetime.now(timezone.utc)
+  cutoff = now - timedelta(days=ARCHIVE_AFTER_DAYS)
+  return _archive_collection(all_orders(), cutoff)
+
+
+def _archive_collection(orders, cutoff: datetime) -> int:
+  query = (
+    orders
+    .where("status", "in", ARCHIVED_STATUSES)
+    .where("created_at", "<", cutoff)
+    .order_by("created_at")
+    .limit(ARCHIVE_PART_MAX_ORDERS)
+  )
+
+  archived = 0
+  page = query
+  while True:
+    docs = list(page.stream())
+    if not docs:
+      break
+
+    groups = {}
+    for doc in docs:
+      data = doc.to_dict()
+      key = (data.get("college_id") or "unknown", archive_month(data["created_at"]))
+      groups.setdefault(key, []).append(doc)
+
+    for (college_id, month), group in groups.items():
+      for ref, part, part_docs in _split_parts(college_id, month, group):
+        ops = [("set", ref, part)] + [("delete", doc.reference) for doc in part_docs]
+        try:
+          build_batch(ops).commit()
+        except Exception:
+          # These orders stay live and are retried on the next run.
+          logger.exception("Could not archive %d orders of %s %s", len(part_docs), college_id, month)
+          continue
+        archived += len(part_docs)
+
+    if len(docs) < ARCHIVE_PART_MAX_ORDERS:
+      break
+    # Continue after this page rather than from the top, so orders that
+    # failed to archive do not hold up the rest.
+    page = query.start_after(docs[-1])
+
+  return archived
+
+
+def get_archived_user_orders(user_uid: str, limit_parts: int = 1, cursor: str = None):
+  # Pages through a user's archived orders, newest part first. Returns
+  # (orders, next_cursor); next_cursor is the last part id read.
+  query = (
+    db.collection(ARCHIVE_COLLECTION)
+    .where("user_ids", "array_contains", user_uid)
+    .order_by("last_created_at", direction=firestore.Query.DESCENDING)
+  )
+
+  if cursor:
+    cursor_doc = db.collection(ARCHIVE_COLLECTION).document(cursor).get()
+    if not cursor_doc.exists:
+      return [], None
+    query = query.start_after(cursor_doc)
+
+  parts = list(query.limit(limit_parts + 1).stream())
+
+  orders = []
+  for part in parts[:limit_parts]:
+    for order in decode_orders(part.get("orders_ndjson_gz")):
+      if order.get("user_id") == user_uid:
+        orders.append(order)
+
+  orders.sort(key=lambda order: order.get("created_at") or "", reverse=True)
+  next_cursor = parts[limit_parts - 1].id if len(parts) > limit_parts else None
+  return orders, next_cursor
+
+
+def iter_archived_stall_orders(college_id: str, stall_id: str, months: list):
+  # Yields one decoded part at a time, so callers can stream large ranges.
+  # Months in the given order, parts by first_created_at and orders sorted
+  # within each part: oldest first for an ascending month list.
+  for month in months:
+    parts = (
+      db.collection(ARCHIVE_COLLECTION)
+      .where("college_id", "==", college_id)
+      .where("month", "==", month)
+      .where("stall_ids", "array_contains", stall_id)
+      .order_by("first_created_at")
+      .stream()
+    )
+    for part in parts:
+      orders = [
+        order for order in decode_orders(part.get("orders_ndjson_gz"))
+        if order.get("stall_id") == stall_id
+      ]
+      orders.sort(key=lambda order: order.get("created_at") or "")
+      yield from orders
+
+
+def get_archived_stall_orders(college_id: str, stall_id: str, months: list) -> list:
+  return list(iter_archived_stall_orders(college_id, stall_id, months))
+
+
+def may_be_archived(since: datetime) -> bool:
+  # True when orders created at `since` could already have been archived.
+  cutoff = datetime.now(timezone.utc) - timedelta(days=ARCHIVE_AFTER_DAYS)
+  if since.tzinfo is None:
+    since = since.replace(tzinfo=timezone.utc)
+  return since < cutoff
+
+
+def export_archive(college_id: str, month: str, output_path: str) -> int:
+  # Concatenates all parts of a college's month into one .ndjson.gz file.
+  parts = (
+    db.collection(ARCHIVE_COLLECTION)
+    .where("college_id", "==", college_id)
+    .where("month", "==", month)
+    .stream()
+  )
+
+  count = 0
+  with gzip.open(output_path, "wt", encoding="utf-8") as output:
+    for part in parts:
+      for order in decode_orders(part.get("orders_ndjson_gz")):
+        output.write(json.dumps(order, separators=(",", ":")) + "\n")
+        count += 1
+  return count
+
+
+async def run_archiver():
+  while True:
+    try:
+      await asyncio.to_thread(archive_old_orders)
+    except Exception:
+      logger.exception("Order archive run failed")
+
+    await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+  import argparse
+
+  parser = argparse.ArgumentParser(description="Archive old orders or export an archived month.")
+  parser.add_argument("--export", nargs=3, metavar=("COLLEGE_ID", "YYYY-MM", "OUTPUT"))
+  args = parser.parse_args()
+
+  if args.export:
+    college_id, month, output_path = args.export
+    print(f"Exported {export_archive(college_id, month, output_path)} orders to {output_path}")
+  else:
+    print(f"Archived {archive_old_orders()} orders")
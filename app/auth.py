@@ -1,9 +1,13 @@
 # app/auth.py
 
+import logging
 from fastapi.responses import JSONResponse
 from starlette import status
 from firebase_admin import auth, firestore
 from .firebase_init import db
+from .logging_config import bind_log_context
+
+logger = logging.getLogger(__name__)
 
 def _create_response(status_code: int, message: str, **kwargs):
   content = {"message": message}
@@ -24,7 +28,7 @@ def _get_college_by_domain(email: str):
       return doc.id, doc.to_dict()
     return None, None
   except Exception as e:
-    print(f"College lookup error: {e}")
+    logger.exception("College lookup failed", extra={"domain": email.split("@")[-1]})
     return None, None
 
 
@@ -40,6 +44,7 @@ async def authenticate_student(token: str):
 
     uid = decoded.get("uid")
     email = decoded.get("email")
+    bind_log_context(user_id=uid)
 
     if not uid or not email:
       return _create_response(
@@ -116,6 +121,7 @@ async def verify_staff_access(token: str):
     decoded = auth.verify_id_token(token)
     email = decoded.get("email")
     uid = decoded.get("uid")
+    bind_log_context(user_id=uid)
 
     if not email:
       return _create_response(status.HTTP_400_BAD_REQUEST, "Invalid token: No email found.")
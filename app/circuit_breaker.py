@@ -0,0 +1,199 @@
+# app/circuit_breaker.py
+
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from fastapi.responses import JSONResponse
+from starlette import status
+from .metrics import observe_dependency, record_circuit_state, record_circuit_rejection
+
+CIRCUIT_WINDOW_SIZE = int(os.environ.get("CIRCUIT_WINDOW_SIZE", "20"))
+CIRCUIT_MIN_CALLS = int(os.environ.get("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_FAILURE_RATE = float(os.environ.get("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_OPEN_SECONDS = float(os.environ.get("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_CALLS = int(os.environ.get("CIRCUIT_HALF_OPEN_CALLS", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+  def __init__(self, name: str, retry_after: float):
+    self.name = name
+    self.retry_after = max(1, int(retry_after + 0.999))
+    super().__init__(f"{name} is temporarily unavailable. Please try again in {self.retry_after}s.")
+
+
+def circuit_open_response(error: CircuitOpenError, message: str):
+  # 503 for a request turned away by an open circuit; clients retry after
+  # the circuit's remaining open time.
+  return JSONResponse(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    content={"message": message},
+    headers={"Retry-After": str(error.retry_after)}
+  )
+
+
+class CircuitBreaker:
+  # Failure-rate breaker over a sliding window of the last `window_size`
+  # calls. Once at least `min_calls` are recorded and the failure rate
+  # reaches `failure_rate`, the circuit opens and calls fail fast for
+  # `open_seconds`. It then lets `half_open_calls` probes through: if they
+  # succeed the circuit closes, if one fails it opens again.
+
+  def __init__(
+      self,
+      name: str,
+      window_size: int = CIRCUIT_WINDOW_SIZE,
+      min_calls: int = CIRCUIT_MIN_CALLS,
+      failure_rate: float = CIRCUIT_FAILURE_RATE,
+      open_seconds: float = CIRCUIT_OPEN_SECONDS,
+      half_open_calls: int = CIRCUIT_HALF_OPEN_CALLS,
+      ignore_exceptions: tuple = ()
+  ):
+    self.name = name
+    self.min_calls = min_calls
+    self.failure_rate = failure_rate
+    self.open_seconds = open_seconds
+    self.half_open_calls = half_open_calls
+    self.ignore_exceptions = ignore_exceptions
+
+    self._lock = threading.Lock()
+    self._window = deque(maxlen=window_size)
+    self._state = CLOSED
+    self._opened_at = 0.0
+    self._probes_in_flight = 0
+    self._probe_successes = 0
+    self.times_opened = 0
+    self.rejected_calls = 0
+
+  def _current_state(self, now: float) -> str:
+    if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+      self._state = HALF_OPEN
+      self._probes_in_flight = 0
+      self._probe_successes = 0
+      record_circuit_state(self.name, HALF_OPEN)
+    return self._state
+
+  def _open(self, now: float):
+    self._state = OPEN
+    self._opened_at = now
+    self.times_opened += 1
+    record_circuit_state(self.name, OPEN)
+
+  def _rejection(self, now: float) -> CircuitOpenError:
+    self.rejected_calls += 1
+    record_circuit_rejection(self.name)
+    return CircuitOpenError(self.name, self.open_seconds - (now - self._opened_at))
+
+  @property
+  def state(self) -> str:
+    with self._lock:
+      return self._current_state(time.monotonic())
+
+  def ensure_available(self):
+    # Fail fast before doing any work the dependency call depends on
+    # (e.g. writing a PENDING order), without consuming a half-open probe.
+    now = time.monotonic()
+    with self._lock:
+      if self._current_state(now) == OPEN:
+        raise self._rejection(now)
+
+  def _acquire(self):
+    now = time.monotonic()
+    with self._lock:
+      state = self._current_state(now)
+      if state == OPEN:
+        raise self._rejection(now)
+      if state == HALF_OPEN:
+        if self._probes_in_flight >= self.half_open_calls:
+          raise self._rejection(self._opened_at + self.open_seconds)
+        self._probes_in_flight += 1
+
+  def _record(self, success: bool):
+    now = time.monotonic()
+    with self._lock:
+      if self._state == HALF_OPEN:
+        self._probes_in_flight = max(0, self._probes_in_flight - 1)
+        if not success:
+          self._open(now)
+          return
+        self._probe_successes += 1
+        if self._probe_successes >= self.half_open_calls:
+          self._state = CLOSED
+          self._window.clear()
+          record_circuit_state(self.name, CLOSED)
+        return
+
+      if self._state == OPEN:
+        return
+
+      self._window.append(success)
+      if len(self._window) >= self.min_calls:
+        failures = self._window.count(False)
+        if failures / len(self._window) >= self.failure_rate:
+          self._open(now)
+
+  def _release_probe(self):
+    with self._lock:
+      if self._state == HALF_OPEN:
+        self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+  @contextmanager
+  def guard(self, operation: str = "call"):
+    self._acquire()
+    started = time.perf_counter()
+    try:
+      yield
+    except self.ignore_exceptions as e:
+      self._record(True)
+      observe_dependency(self.name, operation, time.perf_counter() - started, e)
+      raise
+    except Exception as e:
+      self._record(False)
+      observe_dependency(self.name, operation, time.perf_counter() - started, e)
+      raise
+    except BaseException:
+      # Cancelled or abandoned (e.g. a closed stream): no verdict either way.
+      self._release_probe()
+      raise
+    self._record(True)
+    observe_dependency(self.name, operation, time.perf_counter() - started)
+
+  def call(self, fn, *args, **kwargs):
+    with self.guard(getattr(fn, "__qualname__", "call")):
+      return fn(*args, **kwargs)
+
+  def snapshot(self) -> dict:
+    with self._lock:
+      state = self._current_state(time.monotonic())
+      calls = len(self._window)
+      failures = self._window.count(False)
+      return {
+        "name": self.name,
+        "state": state,
+        "window_calls": calls,
+        "failure_rate": round(failures / calls, 3) if calls else 0.0,
+        "times_opened": self.times_opened,
+        "rejected_calls": self.rejected_calls
+      }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, **options) -> CircuitBreaker:
+  with _breakers_lock:
+    if name not in _breakers:
+      _breakers[name] = CircuitBreaker(name, **options)
+    return _breakers[name]
+
+
+def breaker_snapshots() -> list:
+  with _breakers_lock:
+    breakers = list(_breakers.values())
+  return [breaker.snapshot() for breaker in breakers]
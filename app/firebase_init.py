@@ -4,18 +4,35 @@ import os
 import firebase_admin
 from firebase_admin import credentials, firestore
 from dotenv import load_dotenv
+from .firestore_trace import install_firestore_tracer
 
 load_dotenv()
 
 IS_CI = os.environ.get("CI") == "true"
 
+# "memory" swaps in the in-process fake from app/memory_firestore.py, for
+# tests and microbenchmarks. Nothing is persisted.
+FIRESTORE_BACKEND = os.environ.get("FIRESTORE_BACKEND", "firestore").lower()
+USE_MEMORY_FIRESTORE = FIRESTORE_BACKEND == "memory"
+
 firebase_credentials = os.environ.get("FIREBASE_SERVICE_ACCOUNT")
 
-if not firebase_credentials and not IS_CI:
+if not firebase_credentials and not IS_CI and not USE_MEMORY_FIRESTORE:
     raise RuntimeError("FIREBASE_SERVICE_ACCOUNT env variable not set")
 
 if not firebase_admin._apps:
-    cred = credentials.Certificate(firebase_credentials)
-    firebase_admin.initialize_app(cred)
+    if firebase_credentials:
+        cred = credentials.Certificate(firebase_credentials)
+        firebase_admin.initialize_app(cred)
+    else:
+        # Token checks only need a project id (with FIREBASE_AUTH_EMULATOR_HOST).
+        firebase_admin.initialize_app(options={"projectId": os.environ.get("GOOGLE_CLOUD_PROJECT", "demo-greenplate")})
+
+if USE_MEMORY_FIRESTORE:
+    from .memory_firestore import MemoryFirestore
+    db = MemoryFirestore()
+else:
+    db = firestore.client()
 
-db = firestore.client()
+# Feeds the Firestore dependency metrics and, per request, the tracer.
+install_firestore_tracer()
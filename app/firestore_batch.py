@@ -0,0 +1,65 @@
+# app/firestore_batch.py
+
+import os
+import asyncio
+from .firebase_init import db
+
+# Firestore rejects a batched write with more than 500 operations.
+FIRESTORE_BATCH_LIMIT = 500
+BATCH_COMMIT_CONCURRENCY = int(os.environ.get("BATCH_COMMIT_CONCURRENCY", "4"))
+
+
+def chunked(items: list, size: int = FIRESTORE_BATCH_LIMIT):
+  for start in range(0, len(items), size):
+    yield items[start:start + size]
+
+
+def build_batch(ops: list):
+  # ops are ("set", ref, data[, merge]), ("update", ref, data[, option]) or
+  # ("delete", ref[, option]), where option is a write precondition
+  # (db.write_option).
+  batch = db.batch()
+  for op in ops:
+    method, ref = op[0], op[1]
+    if method == "set":
+      batch.set(ref, op[2], merge=len(op) > 3 and op[3])
+    elif method == "update":
+      batch.update(ref, op[2], option=op[3] if len(op) > 3 else None)
+    elif method == "delete":
+      batch.delete(ref, option=op[2] if len(op) > 2 else None)
+    else:
+      raise ValueError(f"Unsupported batch operation: {method}")
+  return batch
+
+
+def commit_in_batches(ops: list, chunk_size: int = FIRESTORE_BATCH_LIMIT):
+  # Commits ops chunk by chunk and returns (chunk, error) pairs so callers
+  # can report per-write outcomes; error is None for committed chunks.
+  results = []
+  for chunk in chunked(ops, chunk_size):
+    try:
+      build_batch(chunk).commit()
+      results.append((chunk, None))
+    except Exception as e:
+      results.append((chunk, e))
+  return results
+
+
+async def commit_in_batches_concurrently(
+    ops: list,
+    chunk_size: int = FIRESTORE_BATCH_LIMIT,
+    max_concurrency: int = BATCH_COMMIT_CONCURRENCY
+):
+  # Same contract as commit_in_batches, but chunks are committed in
+  # parallel worker threads (bounded by max_concurrency).
+  semaphore = asyncio.Semaphore(max_concurrency)
+
+  async def commit_chunk(chunk):
+    async with semaphore:
+      try:
+        await asyncio.to_thread(build_batch(chunk).commit)
+        return chunk, None
+      except Exception as e:
+        return chunk, e
+
+  return await asyncio.gather(*(commit_chunk(chunk) for chunk in chunked(ops, chunk_size)))
@@ -0,0 +1,260 @@
+# app/firestore_trace.py
+
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from google.cloud.firestore_v1.batch import WriteBatch
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.document import DocumentReference
+from google.cloud.firestore_v1.query import Query
+from google.cloud.firestore_v1.transaction import Transaction
+from .metrics import observe_dependency
+
+FIRESTORE_TRACE_ENABLED = os.environ.get("FIRESTORE_TRACE", "true").lower() == "true"
+FIRESTORE_TRACE_LOG = os.environ.get("FIRESTORE_TRACE_LOG", "false").lower() == "true"
+# A request that runs the same query shape more often than this is flagged
+# as a likely N+1 (e.g. one .get() per cart item).
+FIRESTORE_N_PLUS_ONE_THRESHOLD = int(os.environ.get("FIRESTORE_N_PLUS_ONE_THRESHOLD", "10"))
+
+logger = logging.getLogger(__name__)
+
+_current_trace = ContextVar("firestore_trace", default=None)
+_installed = False
+
+
+class RequestTrace:
+  # Firestore calls made while handling one request. Shared by reference
+  # with worker threads (asyncio.to_thread copies the context), hence the lock.
+
+  def __init__(self, label: str):
+    self.label = label
+    self._lock = threading.Lock()
+    self.read_calls = 0
+    self.docs_read = 0
+    self.read_ms = 0.0
+    self.write_calls = 0
+    self.docs_written = 0
+    self.write_ms = 0.0
+    self.shapes = Counter()
+
+  def record_read(self, shape: str, elapsed_ms: float, docs: int):
+    with self._lock:
+      self.read_calls += 1
+      self.docs_read += docs
+      self.read_ms += elapsed_ms
+      self.shapes[shape] += 1
+
+  def record_write(self, shape: str, elapsed_ms: float, writes: int):
+    with self._lock:
+      self.write_calls += 1
+      self.docs_written += writes
+      self.write_ms += elapsed_ms
+      self.shapes[shape] += 1
+
+  def repeated_shapes(self, threshold: int = FIRESTORE_N_PLUS_ONE_THRESHOLD) -> list:
+    with self._lock:
+      return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+  def server_timing(self) -> str:
+    with self._lock:
+      return (
+        f'firestore-read;dur={self.read_ms:.1f};desc="{self.read_calls} calls, {self.docs_read} docs", '
+        f'firestore-write;dur={self.write_ms:.1f};desc="{self.write_calls} calls, {self.docs_written} writes"'
+      )
+
+  def summary(self) -> dict:
+    with self._lock:
+      return {
+        "request": self.label,
+        "read_calls": self.read_calls,
+        "docs_read": self.docs_read,
+        "read_ms": round(self.read_ms, 1),
+        "write_calls": self.write_calls,
+        "docs_written": self.docs_written,
+        "write_ms": round(self.write_ms, 1)
+      }
+
+
+def current_trace():
+  return _current_trace.get()
+
+
+@contextmanager
+def trace_calls(label: str):
+  # Counts the Firestore calls made inside the block, outside of a request
+  # (benchmarks, scripts).
+  trace = RequestTrace(label)
+  token = _current_trace.set(trace)
+  try:
+    yield trace
+  finally:
+    _current_trace.reset(token)
+
+
+def _path_shape(path) -> str:
+  # colleges/abc/stalls/xyz/menu_items -> colleges/*/stalls/*/menu_items
+  return "/".join("*" if index % 2 else part for index, part in enumerate(path))
+
+
+def _filter_fields(pb) -> list:
+  if hasattr(pb, "filters"):
+    fields = []
+    for child in pb.filters:
+      inner = child.field_filter if "field_filter" in child else (
+        child.unary_filter if "unary_filter" in child else child.composite_filter
+      )
+      fields.extend(_filter_fields(inner))
+    return fields
+  return [f"{pb.field.field_path} {pb.op.name}"]
+
+
+def _query_shape(query: Query) -> str:
+  if query._all_descendants:
+    target = f"group:{query._parent.id}"
+  else:
+    target = _path_shape(query._parent._path)
+
+  shape = f"query {target}"
+  filters = [field for pb in query._field_filters for field in _filter_fields(pb)]
+  if filters:
+    shape += " where " + ", ".join(filters)
+  if query._orders:
+    shape += " order " + ", ".join(order.field.field_path for order in query._orders)
+  return shape
+
+
+def _report(operation: str, shape_of, started: float, count: int = 0, error: BaseException = None, write: bool = False, elapsed: float = None):
+  # Every call feeds the dependency histogram; calls inside a request are
+  # also added to its trace (shape_of is only evaluated then). Callers that
+  # time the call themselves pass elapsed instead of started.
+  if elapsed is None:
+    elapsed = time.perf_counter() - started
+  observe_dependency("firestore", operation, elapsed, error)
+
+  trace = _current_trace.get()
+  if trace is None:
+    return
+  if write:
+    trace.record_write(shape_of(), elapsed * 1000, count)
+  else:
+    trace.record_read(shape_of(), elapsed * 1000, count)
+
+
+def _traced_stream(original, operation: str, shape_of):
+  def stream(self, *args, **kwargs):
+    # Only time spent inside the underlying stream counts, not the caller's
+    # work between documents (or, for exports, the client's download).
+    elapsed = 0.0
+    docs = 0
+    error = None
+    try:
+      started = time.perf_counter()
+      documents = iter(original(self, *args, **kwargs))
+      while True:
+        try:
+          doc = next(documents)
+        except StopIteration:
+          break
+        finally:
+          elapsed += time.perf_counter() - started
+        docs += 1
+        yield doc
+        started = time.perf_counter()
+    except Exception as e:
+      error = e
+      raise
+    finally:
+      _report(operation, lambda: shape_of(self, *args, **kwargs), None, docs, error, elapsed=elapsed)
+  return stream
+
+
+def _traced_call(original, operation: str, shape_of, count_of, write: bool = False):
+  def call(self, *args, **kwargs):
+    # Writes are counted before the call: a commit clears its pending writes.
+    writes = count_of(self, None) if write else 0
+    started = time.perf_counter()
+    try:
+      result = original(self, *args, **kwargs)
+    except Exception as e:
+      _report(operation, lambda: shape_of(self), started, 0, e, write)
+      raise
+    _report(operation, lambda: shape_of(self), started, writes if write else count_of(self, result), None, write)
+    return result
+  return call
+
+
+def _get_all_shape(client, references, *args, **kwargs):
+  parents = sorted({_path_shape(ref._path[:-1]) for ref in references})
+  return "get_all " + ", ".join(parents)
+
+
+def install_firestore_tracer():
+  # Patches the sync client classes once. Snapshot listeners use a separate
+  # watch stream and are not counted.
+  global _installed
+  if _installed:
+    return
+  _installed = True
+
+  DocumentReference.get = _traced_call(
+    DocumentReference.get, "get",
+    lambda ref: f"get {_path_shape(ref._path)}",
+    lambda ref, snapshot: 1 if snapshot.exists else 0
+  )
+  DocumentReference.delete = _traced_call(
+    DocumentReference.delete, "delete",
+    lambda ref: f"delete {_path_shape(ref._path)}",
+    lambda ref, result: 1,
+    write=True
+  )
+  WriteBatch.commit = _traced_call(
+    WriteBatch.commit, "commit",
+    lambda batch: "batch commit",
+    lambda batch, result: len(batch._write_pbs),
+    write=True
+  )
+  Transaction._commit = _traced_call(
+    Transaction._commit, "transaction_commit",
+    lambda transaction: "transaction commit",
+    lambda transaction, result: len(transaction._write_pbs),
+    write=True
+  )
+  # Query.get and CollectionReference.stream/get all go through Query.stream.
+  Query.stream = _traced_stream(Query.stream, "query", lambda query, *args, **kwargs: _query_shape(query))
+  Client.get_all = _traced_stream(Client.get_all, "get_all", _get_all_shape)
+
+
+class FirestoreTraceMiddleware:
+  # Starts a trace per HTTP request, reports it in a Server-Timing header and
+  # warns about query shapes repeated past FIRESTORE_N_PLUS_ONE_THRESHOLD.
+  # Reads made while a streaming body is sent miss the header but are logged.
+
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http" or not FIRESTORE_TRACE_ENABLED:
+      return await self.app(scope, receive, send)
+
+    trace = RequestTrace(f"{scope.get('method')} {scope.get('path')}")
+    token = _current_trace.set(trace)
+
+    async def traced_send(message):
+      if message["type"] == "http.response.start":
+        headers = list(message.get("headers", []))
+        headers.append((b"server-timing", trace.server_timing().encode()))
+        message = {**message, "headers": headers}
+      await send(message)
+
+    try:
+      await self.app(scope, receive, traced_send)
+    finally:
+      _current_trace.reset(token)
+      for shape, count in trace.repeated_shapes():
+        logger.warning("Firestore N+1 suspected", extra={"request": trace.label, "shape": shape, "count": count})
+      if FIRESTORE_TRACE_LOG:
+        logger.info("Firestore trace", extra=trace.summary())
@@ -0,0 +1,75 @@
+# app/http_client.py
+
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "15"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "2"))
+
+# Only these are retried after the request may have reached the server.
+# Connection failures (nothing was sent) are retried for every method.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class TimeoutSession(requests.Session):
+  # requests has no session-wide timeout and the Razorpay SDK never passes
+  # one, so apply a default to every request made through this session.
+
+  def __init__(self, timeout):
+    super().__init__()
+    self.timeout = timeout
+
+  def request(self, method, url, **kwargs):
+    if kwargs.get("timeout") is None:
+      kwargs["timeout"] = self.timeout
+    return super().request(method, url, **kwargs)
+
+
+def _build_session(pool_size: int, timeout, max_retries: int) -> TimeoutSession:
+  retry = Retry(
+    total=max_retries,
+    connect=max_retries,
+    read=max_retries,
+    status=max_retries,
+    backoff_factor=0.3,
+    status_forcelist=(502, 503, 504),
+    allowed_methods=IDEMPOTENT_METHODS,
+    raise_on_status=False
+  )
+  adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+  session = TimeoutSession(timeout)
+  session.mount("https://", adapter)
+  session.mount("http://", adapter)
+  return session
+
+
+def get_session(
+    name: str,
+    pool_size: int = 10,
+    connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+    read_timeout: float = HTTP_READ_TIMEOUT,
+    max_retries: int = HTTP_MAX_RETRIES
+) -> requests.Session:
+  # One keep-alive session per outbound service, shared by all requests in
+  # this worker so TLS connections are reused instead of re-established.
+  with _sessions_lock:
+    if name not in _sessions:
+      _sessions[name] = _build_session(pool_size, (connect_timeout, read_timeout), max_retries)
+    return _sessions[name]
+
+
+def close_sessions():
+  with _sessions_lock:
+    sessions = list(_sessions.values())
+    _sessions.clear()
+
+  for session in sessions:
+    session.close()
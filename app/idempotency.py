@@ -0,0 +1,136 @@
+# app/idempotency.py
+
+import os
+import json
+import hashlib
+from datetime import datetime, timedelta, timezone
+from fastapi.responses import JSONResponse
+from starlette import status
+from .firebase_init import db, firestore
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+# How long a request holds its key before a retry may take over (covers a
+# worker that died between claiming the key and storing the response).
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", "60"))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+IN_PROGRESS = "IN_PROGRESS"
+COMPLETED = "COMPLETED"
+
+
+class IdempotencyKeyInProgressError(Exception):
+  pass
+
+
+class IdempotencyKeyReusedError(Exception):
+  pass
+
+
+def request_fingerprint(payload) -> str:
+  encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+  return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _key_ref(user_uid: str, scope: str, key: str):
+  # Keys are client-chosen strings, so hash them into a safe document id.
+  # Scoping by user and route keeps one user's key from matching another's.
+  doc_id = hashlib.sha256(f"{user_uid}:{scope}:{key}".encode()).hexdigest()
+  return db.collection(IDEMPOTENCY_COLLECTION).document(doc_id)
+
+
+def claim_idempotency_key(user_uid: str, scope: str, key: str, fingerprint: str):
+  # Returns (ref, stored_record). stored_record is None when this request
+  # owns the key and should run; otherwise it holds the original response.
+  ref = _key_ref(user_uid, scope, key)
+  transaction = db.transaction()
+
+  @firestore.transactional
+  def claim(transaction):
+    now = datetime.now(timezone.utc)
+    snapshot = ref.get(transaction=transaction)
+
+    if snapshot.exists:
+      record = snapshot.to_dict()
+      if record.get("expires_at") and record["expires_at"] > now:
+        if record.get("fingerprint") != fingerprint:
+          raise IdempotencyKeyReusedError()
+        if record.get("status") == COMPLETED:
+          return record
+        if record.get("locked_until") and record["locked_until"] > now:
+          raise IdempotencyKeyInProgressError()
+
+    transaction.set(ref, {
+      "user_id": user_uid,
+      "scope": scope,
+      "fingerprint": fingerprint,
+      "status": IN_PROGRESS,
+      "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+      "expires_at": now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+      "created_at": firestore.SERVER_TIMESTAMP
+    })
+    return None
+
+  return ref, claim(transaction)
+
+
+def store_idempotent_response(ref, response: JSONResponse):
+  # Server errors and conflicts (e.g. a resale item reserved by someone
+  # else) are transient, so they are not remembered and a retry runs again.
+  if response.status_code >= 500 or response.status_code == status.HTTP_409_CONFLICT:
+    ref.delete()
+    return
+
+  ref.update({
+    "status": COMPLETED,
+    "status_code": response.status_code,
+    "body": json.loads(response.body),
+    "completed_at": firestore.SERVER_TIMESTAMP
+  })
+
+
+def replay_response(record: dict) -> JSONResponse:
+  return JSONResponse(
+    status_code=record["status_code"],
+    content=record["body"],
+    headers={"Idempotent-Replayed": "true"}
+  )
+
+
+async def run_idempotent(user_uid: str, scope: str, key: str, payload, handler):
+  # Runs `handler` (an async callable returning a JSONResponse) at most once
+  # per (user, scope, key). Repeats get the stored response back.
+  if not key:
+    return await handler()
+
+  if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+    return JSONResponse(
+      status_code=status.HTTP_400_BAD_REQUEST,
+      content={"message": f"Idempotency-Key must be at most {MAX_IDEMPOTENCY_KEY_LENGTH} characters."}
+    )
+
+  try:
+    ref, record = claim_idempotency_key(user_uid, scope, key, request_fingerprint(payload))
+  except IdempotencyKeyInProgressError:
+    return JSONResponse(
+      status_code=status.HTTP_409_CONFLICT,
+      content={"message": "A request with this Idempotency-Key is still being processed."},
+      headers={"Retry-After": "1"}
+    )
+  except IdempotencyKeyReusedError:
+    return JSONResponse(
+      status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+      content={"message": "This Idempotency-Key was already used with a different request."}
+    )
+
+  if record is not None:
+    return replay_response(record)
+
+  try:
+    response = await handler()
+  except BaseException:
+    ref.delete()
+    raise
+
+  store_idempotent_response(ref, response)
+  return response
@@ -0,0 +1,112 @@
+# app/image_preprocess.py
+
+import os
+import io
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image, ImageOps
+
+SCAN_PREPROCESS = os.environ.get("SCAN_PREPROCESS", "true").lower() == "true"
+SCAN_PREPROCESS_WORKERS = int(os.environ.get("SCAN_PREPROCESS_WORKERS", "2"))
+SCAN_TARGET_LONG_EDGE = int(os.environ.get("SCAN_TARGET_LONG_EDGE", "1600"))
+SCAN_PREPROCESS_GRAYSCALE = os.environ.get("SCAN_PREPROCESS_GRAYSCALE", "true").lower() == "true"
+SCAN_JPEG_QUALITY = int(os.environ.get("SCAN_JPEG_QUALITY", "85"))
+SCAN_PREPROCESS_TIMEOUT_SECONDS = float(os.environ.get("SCAN_PREPROCESS_TIMEOUT_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def preprocess_menu_image(
+    image_bytes: bytes,
+    mime_type: str,
+    target_long_edge: int = SCAN_TARGET_LONG_EDGE,
+    grayscale: bool = SCAN_PREPROCESS_GRAYSCALE,
+    quality: int = SCAN_JPEG_QUALITY
+):
+  # Returns (bytes, mime_type) ready for the model: upright, no larger than
+  # target_long_edge, contrast-normalized and recompressed as JPEG. Falls
+  # back to the original upload if that would not make it smaller.
+  with Image.open(io.BytesIO(image_bytes)) as img:
+    if img.format == "JPEG":
+      # Let libjpeg decode at a reduced scale when the photo is much larger
+      # than the target, which is far cheaper than a full decode + resize.
+      img.draft("RGB", (target_long_edge, target_long_edge))
+
+    img = ImageOps.exif_transpose(img)
+
+    if max(img.size) > target_long_edge:
+      img.thumbnail((target_long_edge, target_long_edge), Image.Resampling.LANCZOS)
+
+    if grayscale:
+      img = ImageOps.autocontrast(ImageOps.grayscale(img), cutoff=1)
+    elif img.mode != "RGB":
+      img = img.convert("RGB")
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality, optimize=True)
+
+  processed = out.getvalue()
+  if len(processed) >= len(image_bytes):
+    return image_bytes, mime_type
+  return processed, "image/jpeg"
+
+
+def _get_pool():
+  global _pool
+  with _pool_lock:
+    if _pool is None:
+      # Spawned, not forked: forking a process that already runs gRPC
+      # channels, Firestore watch threads and the log listener can deadlock.
+      _pool = ProcessPoolExecutor(
+        max_workers=SCAN_PREPROCESS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+      )
+    return _pool
+
+
+def preprocess_in_worker(image_bytes: bytes, mime_type: str):
+  # Image decoding is CPU-bound, so it runs in a separate process to keep it
+  # off both the event loop and the GIL. Any failure sends the original.
+  if not SCAN_PREPROCESS:
+    return image_bytes, mime_type
+
+  pool = _get_pool()
+  try:
+    return pool.submit(preprocess_menu_image, image_bytes, mime_type).result(timeout=SCAN_PREPROCESS_TIMEOUT_SECONDS)
+  except BrokenProcessPool:
+    # A worker died (e.g. out of memory on a decompression bomb). The pool
+    # is unusable from now on, so replace it for the next scan.
+    logger.error("Image preprocessing worker died; restarting the pool")
+    _discard_pool(pool)
+  except TimeoutError:
+    # A hung worker would hold its slot forever; restart the pool.
+    logger.error("Image preprocessing timed out after %ss; restarting the pool", SCAN_PREPROCESS_TIMEOUT_SECONDS)
+    _discard_pool(pool, kill=True)
+  except Exception:
+    logger.warning("Image preprocessing failed; sending the original upload", exc_info=True)
+  return image_bytes, mime_type
+
+
+def _discard_pool(pool, kill: bool = False):
+  global _pool
+  with _pool_lock:
+    if _pool is pool:
+      _pool = None
+  if kill:
+    for process in list((pool._processes or {}).values()):
+      process.kill()
+  pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_preprocess_pool():
+  global _pool
+  with _pool_lock:
+    if _pool is not None:
+      _pool.shutdown(wait=False, cancel_futures=True)
+      _pool = None
@@ -0,0 +1,67 @@
+# app/json_stream.py
+
+import json
+
+
+class IncrementalJSONArrayParser:
+  # Parses a JSON array of objects that arrives in arbitrary text chunks
+  # (e.g. a streamed model response) and hands back each object as soon as
+  # its closing brace has been seen. Text before the opening '[' (such as a
+  # ```json fence) is ignored, as are non-object array elements.
+
+  def __init__(self):
+    self.started = False
+    self.finished = False
+    self._depth = 0
+    self._in_string = False
+    self._escape = False
+    self._current = []
+
+  def feed(self, text: str) -> list:
+    completed = []
+
+    for char in text:
+      if self.finished:
+        break
+
+      if not self.started:
+        if char == "[":
+          self.started = True
+          self._depth = 1
+        continue
+
+      if self._depth >= 2:
+        self._current.append(char)
+
+        if self._in_string:
+          if self._escape:
+            self._escape = False
+          elif char == "\\":
+            self._escape = True
+          elif char == '"':
+            self._in_string = False
+          continue
+
+        if char == '"':
+          self._in_string = True
+        elif char in "{[":
+          self._depth += 1
+        elif char in "}]":
+          self._depth -= 1
+          if self._depth == 1:
+            element = "".join(self._current)
+            self._current = []
+            try:
+              completed.append(json.loads(element))
+            except ValueError:
+              pass
+        continue
+
+      # Top level of the array: only object starts and the closing bracket matter.
+      if char == "{":
+        self._depth = 2
+        self._current = [char]
+      elif char == "]":
+        self.finished = True
+
+    return completed
@@ -0,0 +1,167 @@
+# app/logging_config.py
+
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+from datetime import datetime, timezone
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+# e.g. "DEBUG=0.01,INFO=0.25": keep that fraction of records per level.
+# Levels not listed are always kept.
+LOG_SAMPLE_RATES = os.environ.get("LOG_SAMPLE_RATES", "")
+
+_log_context = ContextVar("log_context", default={})
+_listener = None
+
+# Attributes every LogRecord has; anything else came in through `extra=`.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def bind_log_context(**fields):
+  # Adds fields (request_id, user_id, stall_id, ...) to every log record
+  # emitted later in the current request. The dict is replaced, not mutated,
+  # so concurrent requests never see each other's context.
+  _log_context.set({**_log_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+
+
+def get_log_context() -> dict:
+  return _log_context.get()
+
+
+class JSONFormatter(logging.Formatter):
+  def format(self, record: logging.LogRecord) -> str:
+    entry = {
+      "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+      "level": record.levelname,
+      "logger": record.name,
+      "message": record.getMessage()
+    }
+    entry.update(getattr(record, "context", {}))
+    for key, value in vars(record).items():
+      if key not in _RECORD_ATTRIBUTES and key != "context":
+        entry[key] = value
+    if record.exc_info:
+      entry["exc_info"] = self.formatException(record.exc_info)
+    return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ContextFilter(logging.Filter):
+  # Runs in the caller's thread, before the record is queued, so the request
+  # context is captured while it is still current.
+  def filter(self, record: logging.LogRecord) -> bool:
+    record.context = _log_context.get()
+    return True
+
+
+class SamplingFilter(logging.Filter):
+  def __init__(self, rates: dict):
+    super().__init__()
+    self.rates = rates
+
+  def filter(self, record: logging.LogRecord) -> bool:
+    rate = self.rates.get(record.levelno)
+    return rate is None or random.random() < rate
+
+
+class DroppingQueueHandler(QueueHandler):
+  # Never blocks the caller: when the writer falls behind, records are dropped
+  # and counted instead of stalling the request.
+
+  def __init__(self, log_queue):
+    super().__init__(log_queue)
+    self.dropped = 0
+
+  def enqueue(self, record):
+    try:
+      self.queue.put_nowait(record)
+    except queue.Full:
+      self.dropped += 1
+
+
+def _parse_sample_rates(value: str) -> dict:
+  rates = {}
+  for part in value.split(","):
+    if "=" not in part:
+      continue
+    level, rate = part.split("=", 1)
+    levelno = logging.getLevelName(level.strip().upper())
+    if isinstance(levelno, int):
+      rates[levelno] = float(rate)
+  return rates
+
+
+def configure_logging():
+  # Routes the root logger through a bounded queue; a background listener
+  # thread writes JSON lines to stdout, off the request path.
+  global _listener
+  if _listener is not None:
+    return
+
+  log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+
+  handler = DroppingQueueHandler(log_queue)
+  handler.setFormatter(JSONFormatter())
+  handler.addFilter(ContextFilter())
+  handler.addFilter(SamplingFilter(_parse_sample_rates(LOG_SAMPLE_RATES)))
+
+  # Records arrive already formatted by the queue handler.
+  output = logging.StreamHandler(sys.stdout)
+  output.setFormatter(logging.Formatter("%(message)s"))
+
+  root = logging.getLogger()
+  root.handlers = [handler]
+  root.setLevel(LOG_LEVEL)
+
+  _listener = QueueListener(log_queue, output, respect_handler_level=False)
+  _listener.start()
+  atexit.register(stop_logging)
+
+
+def stop_logging():
+  global _listener
+  if _listener is not None:
+    _listener.stop()
+    _listener = None
+
+
+class RequestContextMiddleware:
+  # Gives every request an id (the caller's X-Request-ID if sent), binds it
+  # to the log context and echoes it back in the response.
+
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http":
+      return await self.app(scope, receive, send)
+
+    request_id = None
+    for name, value in scope.get("headers", []):
+      if name == b"x-request-id":
+        request_id = value.decode("latin-1")[:128]
+        break
+    request_id = request_id or uuid.uuid4().hex
+
+    token = _log_context.set({
+      "request_id": request_id,
+      "method": scope.get("method"),
+      "path": scope.get("path")
+    })
+
+    async def send_with_request_id(message):
+      if message["type"] == "http.response.start":
+        message = {**message, "headers": list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]}
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_with_request_id)
+    finally:
+      _log_context.reset(token)
@@ -1,15 +1,61 @@
 #app/mailer.py
 
 import os
-from sendgrid import SendGridAPIClient
+import smtplib
+from email.message import EmailMessage
 from sendgrid.helpers.mail import Mail
+from .circuit_breaker import get_breaker
+from .http_client import get_session
+
+SENDGRID_API_BASE_URL = os.getenv("SENDGRID_API_BASE_URL", "https://api.sendgrid.com")
+
+# "smtp" delivers through SMTP_HOST:SMTP_PORT instead, e.g. a local
+# `python -m aiosmtpd -n -l localhost:1025` stand-in during development.
+MAIL_TRANSPORT = os.getenv("MAIL_TRANSPORT", "sendgrid").lower()
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "1025"))
+
+sendgrid_breaker = get_breaker("sendgrid")
+sendgrid_session = get_session("sendgrid", pool_size=int(os.getenv("SENDGRID_POOL_SIZE", "4")))
+
+def _send_via_sendgrid(message: Mail):
+    # Posts to the v3 API through the shared keep-alive session instead of
+    # SendGridAPIClient, which opens a fresh connection for every send.
+    response = sendgrid_session.post(
+        f"{SENDGRID_API_BASE_URL}/v3/mail/send",
+        json=message.get(),
+        headers={"Authorization": f"Bearer {os.getenv('SENDGRID_API_KEY')}"}
+    )
+    response.raise_for_status()
+
+def _send_via_smtp(to_email: str, subject: str, html_content: str):
+    message = EmailMessage()
+    message["From"] = os.getenv("SENDGRID_FROM_EMAIL")
+    message["To"] = to_email
+    message["Subject"] = subject
+    message.set_content(html_content, subtype="html")
+
+    with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10) as smtp:
+        smtp.send_message(message)
+
+def send_email(to_email: str, subject: str, html_content: str):
+    if MAIL_TRANSPORT == "smtp":
+        _send_via_smtp(to_email, subject, html_content)
+        return
 
-def send_staff_password_setup_email(to_email: str, reset_link: str):
     message = Mail(
         from_email=os.getenv("SENDGRID_FROM_EMAIL"),
         to_emails=to_email,
-        subject="Set your GreenPlate password",
-        html_content=f"""
+        subject=subject,
+        html_content=html_content
+    )
+    sendgrid_breaker.call(_send_via_sendgrid, message)
+
+def send_staff_password_setup_email(to_email: str, reset_link: str):
+    send_email(
+        to_email,
+        "Set your GreenPlate password",
+        f"""
         <html>
           <body style="font-family: Arial, sans-serif;">
             <p>You have been added as a staff member on <b>GreenPlate</b>.</p>
@@ -41,6 +87,3 @@ def send_staff_password_setup_email(to_email: str, reset_link: str):
         </html>
         """
     )
-
-    sg = SendGridAPIClient(os.getenv("SENDGRID_API_KEY"))
-    sg.send(message)
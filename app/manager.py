@@ -1,14 +1,16 @@
 # app/manager.py
 
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 from starlette import status
-from .staff import (
-  get_staff_details,
-  serialize_firestore_data
-)
+from .staff import get_staff_details
+from .serialization import serialize_firestore_data
 from firebase_admin import firestore, auth
 from .firebase_init import db
-from datetime import datetime, time
+from .archive import get_archived_stall_orders, may_be_archived
+from .orders_store import order_collections, stream_orders
+from .order_export import iter_export_rows, export_chunks
+from datetime import datetime, date, time, timedelta
 import calendar
 
 async def get_my_staff(id_token: str):
@@ -152,22 +154,38 @@ async def get_stall_performance_overview(month: int, year: int, id_token: str):
           "last_active": None
         }
 
-    orders_query = (
-      db.collection("orders")
+    orders_queries = [
+      orders
       .where("stall_id", "==", stall_id)
       .where("status", "==", "CLAIMED")
       .where("picked_up_at", ">=", month_start)
       .where("picked_up_at", "<=", month_end)
       .select(["handled_by", "picked_up_at"])
-    )
-
-    order_docs = orders_query.stream()
-
-    for doc in order_docs:
-      data = doc.to_dict()
-      handler_email = data.get("handled_by")
-      pickup_time = data.get("picked_up_at")
-
+      for orders in order_collections(requester_data.get("college_id"))
+    ]
+
+    # to_dict(): DocumentSnapshot.get raises KeyError for missing fields.
+    pickups = [
+      (data.get("handled_by"), data.get("picked_up_at"))
+      for data in (doc.to_dict() for doc in stream_orders(orders_queries, order_by="picked_up_at"))
+    ]
+
+    # Orders picked up this month may have been created last month.
+    previous_month_start = (month_start - timedelta(days=1)).replace(day=1)
+    if may_be_archived(previous_month_start):
+      archived = get_archived_stall_orders(
+        requester_data.get("college_id"),
+        stall_id,
+        [previous_month_start.strftime("%Y-%m"), month_start.strftime("%Y-%m")]
+      )
+      for data in archived:
+        if data.get("status") != "CLAIMED" or not data.get("picked_up_at"):
+          continue
+        pickup_time = datetime.fromisoformat(data["picked_up_at"])
+        if month_start.timestamp() <= pickup_time.timestamp() <= month_end.timestamp():
+          pickups.append((data.get("handled_by"), pickup_time))
+
+    for handler_email, pickup_time in pickups:
       if handler_email in staff_map and pickup_time:
         staff_map[handler_email]["month_total"] += 1
 
@@ -197,3 +215,33 @@ async def get_stall_performance_overview(month: int, year: int, id_token: str):
 
   except Exception as e:
     return JSONResponse(status_code=500, content={"message": str(e)})
+
+async def export_stall_orders(id_token: str, start: date, end: date, export_format: str = "csv", compress: bool = False):
+  try:
+    requester_data, _ = await get_staff_details(id_token)
+    if not requester_data or requester_data.get("role") != "manager":
+      return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"message": "Access denied."})
+
+    if export_format not in ["csv", "ndjson"]:
+      return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "format must be csv or ndjson"})
+
+    if end < start:
+      return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "end must not be before start"})
+
+    stall_id = requester_data.get("stall_id")
+    rows = iter_export_rows(requester_data.get("college_id"), stall_id, start, end)
+
+    filename = f"orders_{stall_id}_{start.isoformat()}_{end.isoformat()}.{export_format}"
+    headers = {"Cache-Control": "no-store"}
+    if compress:
+      filename += ".gz"
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    return StreamingResponse(
+      iterate_in_threadpool(export_chunks(rows, export_format, compress)),
+      media_type="application/gzip" if compress else ("text/csv" if export_format == "csv" else "application/x-ndjson"),
+      headers=headers
+    )
+
+  except Exception as e:
+    return JSONResponse(status_code=500, content={"message": str(e)})
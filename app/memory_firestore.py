@@ -0,0 +1,822 @@
+# app/memory_firestore.py
+
+import copy
+import queue
+import random
+import string
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from google.api_core import exceptions
+from google.cloud.firestore_v1.transforms import (
+  SERVER_TIMESTAMP,
+  DELETE_FIELD,
+  Increment,
+  ArrayUnion,
+  ArrayRemove
+)
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+from .firestore_trace import _report, _path_shape
+
+# An in-process stand-in for the subset of the sync Firestore client this app
+# uses: collections and documents, where/order_by/select/limit/cursors,
+# collection groups, get_all, batches, transactions (including
+# @firestore.transactional), write preconditions, SERVER_TIMESTAMP /
+# DELETE_FIELD / Increment / ArrayUnion / ArrayRemove and on_snapshot.
+# Selected with FIRESTORE_BACKEND=memory (see firebase_init); calls are
+# reported to firestore_trace like real ones, so query counts still show up.
+#
+# Not emulated: indexes (every query works), security rules, the 1 MiB
+# document limit and read-your-writes rules inside transactions.
+
+_MAX_BATCH_WRITES = 500
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+
+
+def _auto_id() -> str:
+  return "".join(random.choice(_AUTO_ID_CHARS) for _ in range(20))
+
+
+def _split(path) -> tuple:
+  if isinstance(path, str):
+    return tuple(part for part in path.split("/") if part)
+  return tuple(path)
+
+
+# --- values -----------------------------------------------------------------
+
+def _normalize(value):
+  # Deep copy on the way in, with naive datetimes read as UTC like Firestore.
+  if isinstance(value, datetime):
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+  if isinstance(value, dict):
+    return {key: _normalize(item) for key, item in value.items()}
+  if isinstance(value, (list, tuple)):
+    return [_normalize(item) for item in value]
+  return copy.copy(value)
+
+
+def _type_rank(value) -> int:
+  # Firestore's cross-type ordering.
+  if value is None:
+    return 0
+  if isinstance(value, bool):
+    return 1
+  if isinstance(value, (int, float)):
+    return 2
+  if isinstance(value, datetime):
+    return 3
+  if isinstance(value, str):
+    return 4
+  if isinstance(value, bytes):
+    return 5
+  if isinstance(value, DocumentReference):
+    return 6
+  if isinstance(value, list):
+    return 8
+  return 9
+
+
+def _sort_key(value):
+  rank = _type_rank(value)
+  if rank == 6:
+    return (rank, value._path)
+  if rank == 8:
+    return (rank, [_sort_key(item) for item in value])
+  if rank == 9:
+    return (rank, sorted((key, _sort_key(item)) for key, item in value.items()))
+  return (rank, value)
+
+
+_MISSING = object()
+
+
+def _get_field(data: dict, field_path: str):
+  value = data
+  for part in field_path.split("."):
+    if not isinstance(value, dict) or part not in value:
+      return _MISSING
+    value = value[part]
+  return value
+
+
+def _matches(value, op: str, expected) -> bool:
+  if op == "array_contains":
+    return isinstance(value, list) and any(_sort_key(item) == _sort_key(expected) for item in value)
+  if op == "array_contains_any":
+    wanted = [_sort_key(item) for item in expected]
+    return isinstance(value, list) and any(_sort_key(item) in wanted for item in value)
+  if op == "in":
+    return _sort_key(value) in [_sort_key(item) for item in expected]
+  if op == "not-in":
+    return value is not None and _sort_key(value) not in [_sort_key(item) for item in expected]
+  if op == "==":
+    return _sort_key(value) == _sort_key(expected)
+  if op == "!=":
+    return value is not None and _sort_key(value) != _sort_key(expected)
+
+  # Range filters only match values of the same type.
+  if _type_rank(value) != _type_rank(expected):
+    return False
+  left, right = _sort_key(value), _sort_key(expected)
+  if op == "<":
+    return left < right
+  if op == "<=":
+    return left <= right
+  if op == ">":
+    return left > right
+  if op == ">=":
+    return left >= right
+  raise ValueError(f"Unsupported operator: {op}")
+
+
+_INEQUALITY_OPS = {"<", "<=", ">", ">=", "!=", "not-in"}
+
+
+def _set_path(data: dict, parts: list, value):
+  for part in parts[:-1]:
+    child = data.get(part)
+    if not isinstance(child, dict):
+      child = data[part] = {}
+    data = child
+  data[parts[-1]] = value
+
+
+def _apply_transform(current, value, now: datetime):
+  # Returns the stored value for a field, or _MISSING to delete it.
+  if value is SERVER_TIMESTAMP:
+    return now
+  if value is DELETE_FIELD:
+    return _MISSING
+  if isinstance(value, Increment):
+    base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+    return base + value.value
+  if isinstance(value, ArrayUnion):
+    result = list(current) if isinstance(current, list) else []
+    for item in value.values:
+      if all(_sort_key(item) != _sort_key(existing) for existing in result):
+        result.append(_normalize(item))
+    return result
+  if isinstance(value, ArrayRemove):
+    removed = [_sort_key(item) for item in value.values]
+    return [item for item in current if _sort_key(item) not in removed] if isinstance(current, list) else []
+  if isinstance(value, dict):
+    return {
+      key: item
+      for key, item in ((key, _apply_transform(None, item, now)) for key, item in value.items())
+      if item is not _MISSING
+    }
+  return _normalize(value)
+
+
+def _write_field(data: dict, parts: list, value, now: datetime):
+  parent = data
+  for part in parts[:-1]:
+    child = parent.get(part)
+    if not isinstance(child, dict):
+      child = parent[part] = {}
+    parent = child
+  result = _apply_transform(parent.get(parts[-1]), value, now)
+  if result is _MISSING:
+    parent.pop(parts[-1], None)
+  else:
+    parent[parts[-1]] = result
+
+
+def _merge(data: dict, updates: dict, now: datetime):
+  for key, value in updates.items():
+    if isinstance(value, dict) and isinstance(data.get(key), dict):
+      _merge(data[key], value, now)
+    else:
+      _write_field(data, [key], value, now)
+
+
+def _masked(data: dict, field_paths) -> dict:
+  if field_paths is None:
+    return data
+  result = {}
+  for field_path in field_paths:
+    value = _get_field(data, field_path)
+    if value is not _MISSING:
+      _set_path(result, field_path.split("."), value)
+  return result
+
+
+# --- snapshots and references -----------------------------------------------
+
+class WriteResult:
+  def __init__(self, update_time: datetime):
+    self.update_time = update_time
+
+
+class DocumentSnapshot:
+  def __init__(self, reference, data, create_time, update_time, read_time):
+    self.reference = reference
+    self._data = data
+    self.create_time = create_time
+    self.update_time = update_time
+    self.read_time = read_time
+
+  @property
+  def id(self) -> str:
+    return self.reference.id
+
+  @property
+  def exists(self) -> bool:
+    return self._data is not None
+
+  def to_dict(self):
+    return copy.deepcopy(self._data) if self._data is not None else None
+
+  def get(self, field_path: str):
+    value = _get_field(self._data or {}, field_path)
+    if value is _MISSING:
+      raise KeyError(field_path)
+    return copy.deepcopy(value)
+
+
+class DocumentReference:
+  def __init__(self, client, path: tuple):
+    self._client = client
+    self._path = path
+
+  def __eq__(self, other):
+    return isinstance(other, DocumentReference) and other._path == self._path
+
+  def __hash__(self):
+    return hash(self._path)
+
+  def __repr__(self):
+    return f"<DocumentReference {self.path}>"
+
+  @property
+  def id(self) -> str:
+    return self._path[-1]
+
+  @property
+  def path(self) -> str:
+    return "/".join(self._path)
+
+  @property
+  def parent(self):
+    return CollectionReference(self._client, self._path[:-1])
+
+  def collection(self, collection_id: str):
+    return CollectionReference(self._client, self._path + (collection_id,))
+
+  def get(self, field_paths=None, transaction=None):
+    started = time.perf_counter()
+    snapshot = self._client._snapshot(self._path, field_paths, transaction)
+    _report("get", lambda: f"get {_path_shape(self._path)}", started, 1 if snapshot.exists else 0)
+    return snapshot
+
+  def _write(self, method: str, *args, **kwargs):
+    batch = self._client.batch()
+    getattr(batch, method)(self, *args, **kwargs)
+    return batch.commit()[0]
+
+  def create(self, document_data: dict):
+    return self._write("create", document_data)
+
+  def set(self, document_data: dict, merge: bool = False):
+    return self._write("set", document_data, merge=merge)
+
+  def update(self, field_updates: dict, option=None):
+    return self._write("update", field_updates, option=option)
+
+  def delete(self, option=None):
+    started = time.perf_counter()
+    batch = self._client.batch()
+    batch.delete(self, option=option)
+    batch._commit()
+    _report("delete", lambda: f"delete {_path_shape(self._path)}", started, 1, write=True)
+    return batch._commit_time
+
+  def on_snapshot(self, callback):
+    return self._client._watch(_DocumentTarget(self), callback)
+
+
+class _DocumentTarget:
+  def __init__(self, reference: DocumentReference):
+    self.reference = reference
+
+  def _results(self, client) -> list:
+    snapshot = client._snapshot(self.reference._path, None, None)
+    return [snapshot] if snapshot.exists else []
+
+
+class Query:
+  def __init__(self, client, parent_path: tuple, all_descendants: bool = False):
+    self._client = client
+    self._parent_path = parent_path
+    self._all_descendants = all_descendants
+    self._filters = []
+    self._orders = []
+    self._limit = None
+    self._offset = 0
+    self._projection = None
+    self._start = None
+    self._end = None
+
+  def _copy(self, **changes):
+    query = copy.copy(self)
+    query._filters = list(self._filters)
+    query._orders = list(self._orders)
+    for key, value in changes.items():
+      setattr(query, key, value)
+    return query
+
+  def where(self, field_path: str = None, op_string: str = None, value=None, *, filter=None):
+    if filter is not None:
+      field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+    query = self._copy()
+    query._filters.append((field_path, op_string, _normalize(value)))
+    return query
+
+  def order_by(self, field_path: str, direction: str = "ASCENDING"):
+    query = self._copy()
+    query._orders.append((field_path, direction))
+    return query
+
+  def limit(self, count: int):
+    return self._copy(_limit=count)
+
+  def offset(self, num_to_skip: int):
+    return self._copy(_offset=num_to_skip)
+
+  def select(self, field_paths):
+    return self._copy(_projection=list(field_paths))
+
+  def start_at(self, document_fields_or_snapshot):
+    return self._copy(_start=(document_fields_or_snapshot, True))
+
+  def start_after(self, document_fields_or_snapshot):
+    return self._copy(_start=(document_fields_or_snapshot, False))
+
+  def end_before(self, document_fields_or_snapshot):
+    return self._copy(_end=(document_fields_or_snapshot, False))
+
+  def end_at(self, document_fields_or_snapshot):
+    return self._copy(_end=(document_fields_or_snapshot, True))
+
+  def _shape(self) -> str:
+    target = f"group:{self._parent_path[-1]}" if self._all_descendants else _path_shape(self._parent_path)
+    shape = f"query {target}"
+    if self._filters:
+      shape += " where " + ", ".join(f"{field} {op}" for field, op, _ in self._filters)
+    if self._orders:
+      shape += " order " + ", ".join(field for field, _ in self._orders)
+    return shape
+
+  def _effective_orders(self) -> list:
+    # Like Firestore: an inequality field is ordered first when no explicit
+    # order is given, and the document name breaks ties.
+    orders = list(self._orders)
+    if not orders:
+      orders = [(field, "ASCENDING") for field, op, _ in self._filters[:1] if op in _INEQUALITY_OPS]
+    if all(field != "__name__" for field, _ in orders):
+      orders.append(("__name__", orders[-1][1] if orders else "ASCENDING"))
+    return orders
+
+  def _cursor_values(self, cursor, orders: list) -> list:
+    if isinstance(cursor, DocumentSnapshot):
+      data, name = cursor._data or {}, cursor.reference._path
+    else:
+      # A dict of order values; __name__ may be a document id or reference.
+      data, name = cursor, cursor.get("__name__")
+      if isinstance(name, DocumentReference):
+        name = name._path
+      elif isinstance(name, str):
+        name = self._parent_path + (name,)
+    values = []
+    for field, _ in orders:
+      if field == "__name__":
+        if name is None:
+          break
+        values.append((6, name))
+      else:
+        value = _get_field(data, field)
+        if value is _MISSING:
+          break
+        values.append(_sort_key(value))
+    return values
+
+  def _compare_to_cursor(self, key: list, cursor_values: list, orders: list) -> int:
+    for (_, direction), value, bound in zip(orders, key, cursor_values):
+      if value != bound:
+        smaller = value < bound
+        if direction == "DESCENDING":
+          smaller = not smaller
+        return -1 if smaller else 1
+    return 0
+
+  def _results(self, client, transaction=None) -> list:
+    orders = self._effective_orders()
+    rows = []
+    for path, doc in client._documents_in(self._parent_path, self._all_descendants):
+      data = doc["data"]
+      if not all(
+        (value := _get_field(data, field)) is not _MISSING and _matches(value, op, expected)
+        for field, op, expected in self._filters
+      ):
+        continue
+      key = []
+      for field, _ in orders:
+        value = path if field == "__name__" else _get_field(data, field)
+        if value is _MISSING:
+          break
+        key.append((6, value) if field == "__name__" else _sort_key(value))
+      else:
+        rows.append((key, path, doc))
+
+    for index in range(len(orders) - 1, -1, -1):
+      rows.sort(key=lambda row: row[0][index], reverse=orders[index][1] == "DESCENDING")
+
+    if self._start is not None:
+      cursor, inclusive = self._start
+      values = self._cursor_values(cursor, orders)
+      rows = [row for row in rows if (c := self._compare_to_cursor(row[0], values, orders)) > 0 or (inclusive and c == 0)]
+    if self._end is not None:
+      cursor, inclusive = self._end
+      values = self._cursor_values(cursor, orders)
+      rows = [row for row in rows if (c := self._compare_to_cursor(row[0], values, orders)) < 0 or (inclusive and c == 0)]
+
+    rows = rows[self._offset:]
+    if self._limit is not None:
+      rows = rows[:self._limit]
+
+    read_time = client._now()
+    snapshots = []
+    for _, path, doc in rows:
+      if transaction is not None:
+        transaction._record_read(path, doc)
+      snapshots.append(DocumentSnapshot(
+        DocumentReference(client, path),
+        _masked(copy.deepcopy(doc["data"]), self._projection),
+        doc["create_time"],
+        doc["update_time"],
+        read_time
+      ))
+    return snapshots
+
+  def stream(self, transaction=None):
+    started = time.perf_counter()
+    with self._client._lock:
+      snapshots = self._results(self._client, transaction)
+    _report("query", self._shape, started, len(snapshots))
+    return iter(snapshots)
+
+  def get(self, transaction=None):
+    return list(self.stream(transaction=transaction))
+
+  def on_snapshot(self, callback):
+    return self._client._watch(self, callback)
+
+
+class CollectionReference(Query):
+  def __init__(self, client, path: tuple):
+    super().__init__(client, path)
+    self._path = path
+
+  @property
+  def id(self) -> str:
+    return self._path[-1]
+
+  @property
+  def parent(self):
+    return DocumentReference(self._client, self._path[:-1]) if len(self._path) > 1 else None
+
+  def document(self, document_id: str = None):
+    return DocumentReference(self._client, self._path + (document_id or _auto_id(),))
+
+  def add(self, document_data: dict, document_id: str = None):
+    reference = self.document(document_id)
+    result = reference.create(document_data)
+    return result.update_time, reference
+
+  def list_documents(self):
+    with self._client._lock:
+      ids = list(self._client._collections.get(self._path, {}))
+    return [self.document(document_id) for document_id in ids]
+
+
+# --- writes -----------------------------------------------------------------
+
+class Precondition:
+  def __init__(self, exists: bool = None, last_update_time: datetime = None):
+    self.exists = exists
+    self.last_update_time = last_update_time
+
+
+class WriteBatch:
+  def __init__(self, client):
+    self._client = client
+    self._writes = []
+    self._commit_time = None
+
+  def __len__(self):
+    return len(self._writes)
+
+  def create(self, reference, document_data: dict):
+    self._writes.append(("set", reference._path, document_data, False, Precondition(exists=False)))
+
+  def set(self, reference, document_data: dict, merge: bool = False):
+    self._writes.append(("set", reference._path, document_data, merge, None))
+
+  def update(self, reference, field_updates: dict, option=None):
+    self._writes.append(("update", reference._path, field_updates, False, option or Precondition(exists=True)))
+
+  def delete(self, reference, option=None):
+    self._writes.append(("delete", reference._path, None, False, option))
+
+  def _commit(self, reads: dict = None) -> list:
+    if len(self._writes) > _MAX_BATCH_WRITES:
+      raise exceptions.InvalidArgument(f"maximum {_MAX_BATCH_WRITES} writes allowed per request")
+    results = self._client._apply(self._writes, reads)
+    self._commit_time = results[0].update_time if results else self._client._now()
+    self._writes = []
+    return results
+
+  def commit(self) -> list:
+    started = time.perf_counter()
+    writes = len(self._writes)
+    try:
+      results = self._commit()
+    except Exception as e:
+      _report("commit", lambda: "batch commit", started, 0, e, write=True)
+      raise
+    _report("commit", lambda: "batch commit", started, writes, write=True)
+    return results
+
+
+class Transaction(WriteBatch):
+  # Optimistic, like Firestore's: documents read inside the transaction are
+  # checked again at commit time, and a change in between aborts the attempt
+  # (which @firestore.transactional retries).
+
+  _counter = 0
+
+  def __init__(self, client, max_attempts: int = 5, read_only: bool = False):
+    super().__init__(client)
+    self._max_attempts = max_attempts
+    self._read_only = read_only
+    self._id = None
+    self._reads = {}
+
+  @property
+  def in_progress(self) -> bool:
+    return self._id is not None
+
+  @property
+  def id(self):
+    return self._id
+
+  def _begin(self, retry_id=None):
+    Transaction._counter += 1
+    self._id = str(Transaction._counter).encode()
+
+  def _clean_up(self):
+    self._writes = []
+    self._reads = {}
+    self._id = None
+
+  def _rollback(self):
+    self._clean_up()
+
+  def _record_read(self, path: tuple, doc):
+    self._reads.setdefault(path, doc["update_time"] if doc else None)
+
+  def _commit(self):
+    if self._read_only and self._writes:
+      raise exceptions.InvalidArgument("Cannot write in a read-only transaction")
+    started = time.perf_counter()
+    writes = len(self._writes)
+    try:
+      results = super()._commit(self._reads)
+    except Exception as e:
+      _report("transaction_commit", lambda: "transaction commit", started, 0, e, write=True)
+      raise
+    finally:
+      self._clean_up()
+    _report("transaction_commit", lambda: "transaction commit", started, writes, write=True)
+    return results
+
+  def get(self, ref_or_query):
+    if isinstance(ref_or_query, DocumentReference):
+      return iter([ref_or_query.get(transaction=self)])
+    return ref_or_query.stream(transaction=self)
+
+  def get_all(self, references):
+    return self._client.get_all(references, transaction=self)
+
+
+# --- watches ----------------------------------------------------------------
+
+class Watch:
+  def __init__(self, client, target, callback):
+    self._client = client
+    self._target = target
+    self._callback = callback
+    self._versions = {}
+    self.is_active = True
+
+  def unsubscribe(self):
+    self.is_active = False
+    with self._client._lock:
+      if self in self._client._watches:
+        self._client._watches.remove(self)
+
+  def _changes(self) -> tuple:
+    # Called under the client lock after each commit.
+    snapshots = self._target._results(self._client)
+    versions = {snapshot.reference._path: snapshot.update_time for snapshot in snapshots}
+    changes = []
+    for index, snapshot in enumerate(snapshots):
+      path = snapshot.reference._path
+      if path not in self._versions:
+        changes.append(DocumentChange(ChangeType.ADDED, snapshot, -1, index))
+      elif self._versions[path] != versions[path]:
+        changes.append(DocumentChange(ChangeType.MODIFIED, snapshot, index, index))
+    previous = list(self._versions)
+    for path in previous:
+      if path not in versions:
+        removed = DocumentSnapshot(DocumentReference(self._client, path), None, None, None, self._client._now())
+        changes.append(DocumentChange(ChangeType.REMOVED, removed, previous.index(path), -1))
+    self._versions = versions
+    return snapshots, changes
+
+
+# --- client -----------------------------------------------------------------
+
+class MemoryFirestore:
+  def __init__(self):
+    self._lock = threading.RLock()
+    # collection path -> {document id: {"data", "create_time", "update_time"}}
+    self._collections = {}
+    self._last_time = None
+    self._watches = []
+    self._deliveries = queue.SimpleQueue()
+    self._dispatcher = None
+
+  def _now(self) -> datetime:
+    # Strictly increasing, so update_time preconditions can tell writes apart.
+    now = datetime.now(timezone.utc)
+    if self._last_time is not None and now <= self._last_time:
+      now = self._last_time + timedelta(microseconds=1)
+    self._last_time = now
+    return now
+
+  def collection(self, *collection_path):
+    path = _split("/".join(collection_path))
+    if len(path) % 2 != 1:
+      raise ValueError(f"A collection path needs an odd number of segments: {path}")
+    return CollectionReference(self, path)
+
+  def document(self, *document_path):
+    path = _split("/".join(document_path))
+    if len(path) % 2 != 0:
+      raise ValueError(f"A document path needs an even number of segments: {path}")
+    return DocumentReference(self, path)
+
+  def collection_group(self, collection_id: str):
+    return Query(self, (collection_id,), all_descendants=True)
+
+  def collections(self):
+    with self._lock:
+      ids = sorted({path[0] for path in self._collections if len(path) == 1 and self._collections[path]})
+    return [CollectionReference(self, (collection_id,)) for collection_id in ids]
+
+  def batch(self):
+    return WriteBatch(self)
+
+  def transaction(self, max_attempts: int = 5, read_only: bool = False):
+    return Transaction(self, max_attempts=max_attempts, read_only=read_only)
+
+  def write_option(self, exists: bool = None, last_update_time: datetime = None):
+    return Precondition(exists=exists, last_update_time=last_update_time)
+
+  def get_all(self, references, field_paths=None, transaction=None):
+    started = time.perf_counter()
+    references = list(references)
+    with self._lock:
+      snapshots = [self._snapshot(reference._path, field_paths, transaction) for reference in references]
+    _report(
+      "get_all",
+      lambda: "get_all " + ", ".join(sorted({_path_shape(reference._path[:-1]) for reference in references})),
+      started,
+      sum(1 for snapshot in snapshots if snapshot.exists)
+    )
+    return iter(snapshots)
+
+  def reset(self):
+    # Drops every document; watches stay subscribed and see removals.
+    with self._lock:
+      self._collections = {}
+      self._notify_watches()
+
+  def _documents_in(self, parent_path: tuple, all_descendants: bool):
+    if not all_descendants:
+      for document_id, doc in self._collections.get(parent_path, {}).items():
+        yield parent_path + (document_id,), doc
+      return
+    for path, documents in self._collections.items():
+      if path[-1] == parent_path[-1]:
+        for document_id, doc in documents.items():
+          yield path + (document_id,), doc
+
+  def _snapshot(self, path: tuple, field_paths, transaction) -> DocumentSnapshot:
+    with self._lock:
+      doc = self._collections.get(path[:-1], {}).get(path[-1])
+      if transaction is not None:
+        transaction._record_read(path, doc)
+      reference = DocumentReference(self, path)
+      if doc is None:
+        return DocumentSnapshot(reference, None, None, None, self._now())
+      return DocumentSnapshot(
+        reference,
+        _masked(copy.deepcopy(doc["data"]), field_paths),
+        doc["create_time"],
+        doc["update_time"],
+        self._now()
+      )
+
+  def _check(self, path: tuple, option, doc):
+    if option is None:
+      return
+    if option.exists is True and doc is None:
+      raise exceptions.NotFound(f"No document to update: {'/'.join(path)}")
+    if option.exists is False and doc is not None:
+      raise exceptions.AlreadyExists(f"Document already exists: {'/'.join(path)}")
+    if option.last_update_time is not None and (doc is None or doc["update_time"] != option.last_update_time):
+      raise exceptions.FailedPrecondition(f"Document was modified: {'/'.join(path)}")
+
+  def _apply(self, writes: list, reads: dict = None) -> list:
+    # All preconditions are checked before anything is written, so a batch
+    # applies completely or not at all.
+    with self._lock:
+      for path, update_time in (reads or {}).items():
+        doc = self._collections.get(path[:-1], {}).get(path[-1])
+        if (doc["update_time"] if doc else None) != update_time:
+          raise exceptions.Aborted(f"Transaction lost a race on {'/'.join(path)}")
+      for method, path, _, _, option in writes:
+        self._check(path, option, self._collections.get(path[:-1], {}).get(path[-1]))
+
+      now = self._now()
+      results = []
+      for method, path, data, merge, _ in writes:
+        documents = self._collections.setdefault(path[:-1], {})
+        doc = documents.get(path[-1])
+        if method == "delete":
+          documents.pop(path[-1], None)
+        else:
+          if method == "set" and not merge:
+            fields = _apply_transform(None, data, now)
+          else:
+            fields = copy.deepcopy(doc["data"]) if doc else {}
+            if method == "set":
+              _merge(fields, data, now)
+            else:
+              for field_path, value in data.items():
+                _write_field(fields, field_path.split("."), value, now)
+          documents[path[-1]] = {
+            "data": fields,
+            "create_time": doc["create_time"] if doc else now,
+            "update_time": now
+          }
+        results.append(WriteResult(now))
+
+      if self._watches:
+        self._notify_watches()
+      return results
+
+  # Listeners are called from a background thread, as with the real client,
+  # never from inside the write that triggered them.
+
+  def _watch(self, target, callback) -> Watch:
+    watch = Watch(self, target, callback)
+    with self._lock:
+      self._watches.append(watch)
+      snapshots, changes = watch._changes()
+      self._deliver(watch, snapshots, changes)
+    return watch
+
+  def _notify_watches(self):
+    for watch in list(self._watches):
+      snapshots, changes = watch._changes()
+      if changes:
+        self._deliver(watch, snapshots, changes)
+
+  def _deliver(self, watch: Watch, snapshots: list, changes: list):
+    if self._dispatcher is None:
+      self._dispatcher = threading.Thread(target=self._dispatch, name="memory-firestore-watch", daemon=True)
+      self._dispatcher.start()
+    self._deliveries.put((watch, snapshots, changes, self._now()))
+
+  def _dispatch(self):
+    while True:
+      watch, snapshots, changes, read_time = self._deliveries.get()
+      if watch.is_active:
+        try:
+          watch._callback(snapshots, changes, read_time)
+        except Exception:
+          watch.is_active = False
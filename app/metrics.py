@@ -0,0 +1,172 @@
+# app/metrics.py
+
+import os
+import time
+import functools
+from contextlib import contextmanager
+from prometheus_client import (
+  CollectorRegistry,
+  Counter,
+  Gauge,
+  Histogram,
+  REGISTRY,
+  CONTENT_TYPE_LATEST,
+  generate_latest,
+  multiprocess
+)
+
+# With several uvicorn/gunicorn workers, set PROMETHEUS_MULTIPROC_DIR to an
+# empty directory shared by them (before start-up); each worker then writes
+# its samples there and /metrics aggregates all of them.
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_LATENCY = Histogram(
+  "http_request_duration_seconds",
+  "HTTP request latency by route template and status.",
+  ["method", "route", "status"],
+  buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+  "http_requests_in_flight",
+  "HTTP requests currently being handled.",
+  multiprocess_mode="livesum"
+)
+DEPENDENCY_LATENCY = Histogram(
+  "dependency_request_duration_seconds",
+  "Latency of calls to external dependencies.",
+  ["dependency", "operation", "outcome"],
+  buckets=LATENCY_BUCKETS
+)
+DEPENDENCY_ERRORS = Counter(
+  "dependency_errors_total",
+  "Failed calls to external dependencies.",
+  ["dependency", "operation", "error"]
+)
+CACHE_REQUESTS = Counter(
+  "cache_requests_total",
+  "Cache lookups by result; hit ratio = hit / (hit + miss).",
+  ["cache", "result"]
+)
+CIRCUIT_STATE = Gauge(
+  "circuit_breaker_state",
+  "Circuit breaker state (0 closed, 1 half-open, 2 open), worst across workers.",
+  ["name"],
+  multiprocess_mode="livemax"
+)
+CIRCUIT_REJECTIONS = Counter(
+  "circuit_breaker_rejections_total",
+  "Calls rejected by an open circuit breaker.",
+  ["name"]
+)
+
+_CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def observe_dependency(dependency: str, operation: str, seconds: float, error: BaseException = None):
+  outcome = "ok" if error is None else "error"
+  DEPENDENCY_LATENCY.labels(dependency, operation, outcome).observe(seconds)
+  if error is not None:
+    DEPENDENCY_ERRORS.labels(dependency, operation, type(error).__name__).inc()
+
+
+@contextmanager
+def track_dependency(dependency: str, operation: str = "call"):
+  started = time.perf_counter()
+  try:
+    yield
+  except Exception as e:
+    observe_dependency(dependency, operation, time.perf_counter() - started, e)
+    raise
+  observe_dependency(dependency, operation, time.perf_counter() - started)
+
+
+def record_cache(cache: str, hit: bool):
+  CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_circuit_state(name: str, state: str):
+  CIRCUIT_STATE.labels(name).set(_CIRCUIT_STATE_VALUES.get(state, 0))
+
+
+def record_circuit_rejection(name: str):
+  CIRCUIT_REJECTIONS.labels(name).inc()
+
+
+_AUTH_OPERATIONS = (
+  "verify_id_token",
+  "get_user",
+  "get_user_by_email",
+  "get_users",
+  "create_user",
+  "update_user",
+  "delete_user",
+  "generate_password_reset_link"
+)
+
+
+def instrument_firebase_auth():
+  # Callers use `auth.verify_id_token(...)` etc., so wrapping the module
+  # attributes once covers every call site.
+  from firebase_admin import auth
+
+  def instrumented(name, original):
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+      with track_dependency("firebase_auth", name):
+        return original(*args, **kwargs)
+    wrapper._instrumented = True
+    return wrapper
+
+  for name in _AUTH_OPERATIONS:
+    original = getattr(auth, name)
+    if not getattr(original, "_instrumented", False):
+      setattr(auth, name, instrumented(name, original))
+
+
+def render_metrics():
+  # Returns (body, content_type) for the /metrics endpoint.
+  if MULTIPROCESS_DIR:
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+  else:
+    registry = REGISTRY
+  return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_stopped():
+  if MULTIPROCESS_DIR:
+    multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+  # Times every HTTP request and labels it with the matched route template
+  # (e.g. /staff/menu/{item_id}), so ids don't explode the label set.
+
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http":
+      return await self.app(scope, receive, send)
+
+    state = {"status": 500}
+
+    async def recording_send(message):
+      if message["type"] == "http.response.start":
+        state["status"] = message["status"]
+      await send(message)
+
+    REQUESTS_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    try:
+      await self.app(scope, receive, recording_send)
+    finally:
+      REQUESTS_IN_FLIGHT.dec()
+      route = scope.get("route")
+      REQUEST_LATENCY.labels(
+        scope.get("method"),
+        getattr(route, "path", "unmatched"),
+        str(state["status"])
+      ).observe(time.perf_counter() - started)
@@ -0,0 +1,149 @@
+# app/order_export.py
+
+import io
+import csv
+import json
+import zlib
+from datetime import datetime, date, time, timedelta, timezone
+from .orders_store import order_collections, iter_orders
+from .archive import iter_archived_stall_orders, may_be_archived
+
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+EXPORT_COLUMNS = [
+  "order_id",
+  "created_at",
+  "status",
+  "order_type",
+  "customer_name",
+  "roll_number",
+  "items",
+  "total_amount",
+  "refund_amount",
+  "refund_status",
+  "picked_up_at",
+  "handled_by"
+]
+
+
+def _timestamp(value):
+  if isinstance(value, datetime):
+    return value.isoformat()
+  return value
+
+
+def export_row(order_id: str, data: dict) -> dict:
+  user_details = data.get("user_details") or {}
+  refund = data.get("refund") or {}
+  return {
+    "order_id": order_id,
+    "created_at": _timestamp(data.get("created_at")),
+    "status": data.get("status"),
+    "order_type": data.get("order_type", "REGULAR"),
+    "customer_name": user_details.get("name"),
+    "roll_number": user_details.get("roll_number"),
+    "items": [
+      {"name": item.get("name"), "quantity": item.get("quantity"), "price": item.get("price")}
+      for item in data.get("items", [])
+    ],
+    "total_amount": data.get("total_amount", 0),
+    "refund_amount": refund.get("amount", 0),
+    "refund_status": refund.get("status"),
+    "picked_up_at": _timestamp(data.get("picked_up_at")),
+    "handled_by": data.get("handled_by")
+  }
+
+
+def _months_between(start: date, end: date) -> list:
+  months = []
+  current = start.replace(day=1)
+  while current <= end:
+    months.append(current.strftime("%Y-%m"))
+    current = (current + timedelta(days=32)).replace(day=1)
+  return months
+
+
+def iter_export_rows(college_id: str, stall_id: str, start: date, end: date):
+  # Oldest first: archived months (parts and their orders in created_at
+  # order), then live orders merged across layouts.
+  # Nothing is collected into a list, so memory does not grow with the range.
+  range_start = datetime.combine(start, time.min, tzinfo=timezone.utc)
+  range_end = datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc)
+
+  if may_be_archived(range_start):
+    for data in iter_archived_stall_orders(college_id, stall_id, _months_between(start, end)):
+      created_at = data.get("created_at")
+      if created_at and range_start <= datetime.fromisoformat(created_at) < range_end:
+        yield export_row(data["id"], data)
+
+  queries = [
+    orders
+    .where("stall_id", "==", stall_id)
+    .where("created_at", ">=", range_start)
+    .where("created_at", "<", range_end)
+    .order_by("created_at")
+    for orders in order_collections(college_id)
+  ]
+  for doc in iter_orders(queries):
+    yield export_row(doc.id, doc.to_dict())
+
+
+# Cells starting with these are run as formulas by Excel and other
+# spreadsheets; customer names, roll numbers and item names are user input.
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_safe(value):
+  if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+    return "'" + value
+  return value
+
+
+def _csv_lines(rows):
+  buffer = io.StringIO()
+  writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+  writer.writeheader()
+  for row in rows:
+    row["items"] = "; ".join(f"{item['quantity']}x {item['name']}" for item in row["items"])
+    writer.writerow({key: _csv_safe(value) for key, value in row.items()})
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+  # The header alone, for an empty range.
+  if buffer.tell():
+    yield buffer.getvalue()
+
+
+def _ndjson_lines(rows):
+  for row in rows:
+    yield json.dumps(row, separators=(",", ":")) + "\n"
+
+
+def export_chunks(rows, export_format: str = "csv", compress: bool = False):
+  # Encodes rows one at a time and yields ~64KB byte chunks (gzip-framed when
+  # compress is set). Sync on purpose: it runs in a worker thread and the
+  # Firestore stream underneath is blocking.
+  lines = _csv_lines(rows) if export_format == "csv" else _ndjson_lines(rows)
+  compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+
+  pending = []
+  size = 0
+  for line in lines:
+    encoded = line.encode("utf-8")
+    pending.append(encoded)
+    size += len(encoded)
+    if size < EXPORT_CHUNK_BYTES:
+      continue
+
+    chunk = b"".join(pending)
+    pending, size = [], 0
+    if compressor is not None:
+      chunk = compressor.compress(chunk)
+    if chunk:
+      yield chunk
+
+  chunk = b"".join(pending)
+  if compressor is not None:
+    chunk = compressor.compress(chunk) + compressor.flush()
+  if chunk:
+    yield chunk
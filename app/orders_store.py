@@ -0,0 +1,162 @@
+# app/orders_store.py
+
+import os
+import heapq
+from datetime import datetime, timezone
+from .firebase_init import db
+from .firestore_batch import commit_in_batches
+
+ORDERS_COLLECTION = "orders"
+
+# Orders are stored under colleges/{college_id}/orders so each campus has its
+# own index ranges. Orders written before that still live in the top-level
+# `orders` collection; reads keep looking there until the migration below
+# has run and ORDERS_LEGACY_READS is switched off.
+ORDERS_LEGACY_READS = os.environ.get("ORDERS_LEGACY_READS", "true").lower() == "true"
+
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def college_orders(college_id: str):
+  return db.collection("colleges").document(college_id).collection(ORDERS_COLLECTION)
+
+
+def legacy_orders():
+  return db.collection(ORDERS_COLLECTION)
+
+
+def new_order_ref(college_id: str):
+  return college_orders(college_id).document()
+
+
+def order_collections(college_id: str) -> list:
+  # Where this college's orders may live, partitioned first. Callers filter
+  # each one by user or stall, which also scopes the legacy collection.
+  collections = [college_orders(college_id)]
+  if ORDERS_LEGACY_READS:
+    collections.append(legacy_orders())
+  return collections
+
+
+def all_orders():
+  # For background jobs that sweep every college: one collection-group query
+  # covers every colleges/{college_id}/orders and the legacy top-level
+  # collection, however many colleges there are. Filters used on it need
+  # collection-group indexes.
+  return db.collection_group(ORDERS_COLLECTION)
+
+
+def stream_orders(queries: list, order_by: str = "created_at", descending: bool = True) -> list:
+  # Runs the same query against each layout and merges the results.
+  docs = [doc for query in queries for doc in query.stream()]
+  if len(queries) > 1:
+    docs.sort(key=lambda doc: doc.to_dict().get(order_by) or _EPOCH, reverse=descending)
+  return docs
+
+
+def iter_orders(queries: list, order_by: str = "created_at", descending: bool = False):
+  # Lazy version of stream_orders for large reads: each query must already be
+  # ordered by `order_by`, and only one document per query is held at a time.
+  streams = [query.stream() for query in queries]
+  if len(streams) == 1:
+    return streams[0]
+  return heapq.merge(
+    *streams,
+    key=lambda doc: doc.to_dict().get(order_by) or _EPOCH,
+    reverse=descending
+  )
+
+
+def find_order(order_id: str, college_id: str = None):
+  # Returns the order's snapshot (use .reference to write to it) or None.
+  refs = []
+  if college_id:
+    refs.append(college_orders(college_id).document(order_id))
+  if ORDERS_LEGACY_READS or not college_id:
+    refs.append(legacy_orders().document(order_id))
+
+  for ref in refs:
+    snapshot = ref.get()
+    if snapshot.exists:
+      return snapshot
+
+  if not college_id:
+    # Callers that don't know the college (e.g. older payment notes).
+    for snapshot in db.collection_group(ORDERS_COLLECTION).where("order_id", "==", order_id).limit(1).stream():
+      return snapshot
+
+  return None
+
+
+def get_orders(order_ids: list, college_id: str) -> dict:
+  # Batched find_order for one college: order_id -> snapshot, missing ids omitted.
+  found = {
+    doc.id: doc
+    for doc in db.get_all([college_orders(college_id).document(order_id) for order_id in order_ids])
+    if doc.exists
+  }
+
+  missing = [order_id for order_id in order_ids if order_id not in found]
+  if missing and ORDERS_LEGACY_READS:
+    for doc in db.get_all([legacy_orders().document(order_id) for order_id in missing]):
+      if doc.exists:
+        found[doc.id] = doc
+
+  return found
+
+
+def migrate_legacy_orders(dry_run: bool = False, page_size: int = 250) -> dict:
+  # Moves every top-level order to colleges/{college_id}/orders under the
+  # same id, so Razorpay notes keep resolving. Each copy and delete share a
+  # batch, and the delete only applies if the order is unchanged since it
+  # was read; orders written to mid-run fail their batch and are picked up
+  # by the next run.
+  moved = failed = skipped = 0
+  last = None
+
+  while True:
+    query = legacy_orders().order_by("__name__").limit(page_size)
+    if last is not None:
+      query = query.start_after(last)
+    docs = list(query.stream())
+    if not docs:
+      break
+    last = docs[-1]
+
+    ops = []
+    for doc in docs:
+      data = doc.to_dict()
+      college_id = data.get("college_id")
+      if not college_id:
+        skipped += 1
+        continue
+      data.setdefault("order_id", doc.id)
+      ops.append(("set", college_orders(college_id).document(doc.id), data))
+      ops.append(("delete", doc.reference, db.write_option(last_update_time=doc.update_time)))
+
+    if dry_run:
+      moved += len(ops) // 2
+      continue
+
+    # An even chunk size keeps each copy with its delete.
+    for chunk, error in commit_in_batches(ops):
+      if error is None:
+        moved += len(chunk) // 2
+      else:
+        failed += len(chunk) // 2
+
+  return {"moved": moved, "failed": failed, "skipped_without_college": skipped}
+
+
+if __name__ == "__main__":
+  import argparse
+
+  parser = argparse.ArgumentParser(description="Move top-level orders under colleges/{college_id}/orders.")
+  parser.add_argument("--migrate", action="store_true", help="copy and delete legacy orders")
+  parser.add_argument("--dry-run", action="store_true", help="only count what would be moved")
+  args = parser.parse_args()
+
+  if args.migrate or args.dry_run:
+    print(migrate_legacy_orders(dry_run=args.dry_run))
+  else:
+    parser.print_help()
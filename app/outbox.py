@@ -0,0 +1,166 @@
+# app/outbox.py
+
+import os
+import time
+import logging
+import asyncio
+from datetime import datetime, timedelta, timezone
+from firebase_admin import auth, firestore
+from firebase_admin.auth import ActionCodeSettings
+from .firebase_init import db
+from .mailer import send_staff_password_setup_email
+from .circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "email_outbox"
+OUTBOX_WORKER_ENABLED = os.environ.get("EMAIL_OUTBOX_WORKER", "true").lower() == "true"
+OUTBOX_POLL_SECONDS = float(os.environ.get("EMAIL_OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_BATCH_SIZE = int(os.environ.get("EMAIL_OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("EMAIL_OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_RATE_PER_SECOND = float(os.environ.get("EMAIL_OUTBOX_RATE_PER_SECOND", "5"))
+OUTBOX_LEASE_SECONDS = 300
+
+STAFF_PASSWORD_SETUP = "staff_password_setup"
+
+_wakeup = None
+
+
+def email_job(kind: str, to_email: str, payload: dict = None):
+  # Returns (ref, data) for a new outbox job, for callers that assemble
+  # their own batched writes.
+  job_ref = db.collection(OUTBOX_COLLECTION).document()
+  return job_ref, {
+    "kind": kind,
+    "to_email": to_email,
+    "payload": payload or {},
+    "status": "PENDING",
+    "attempts": 0,
+    "next_attempt_at": firestore.SERVER_TIMESTAMP,
+    "created_at": firestore.SERVER_TIMESTAMP
+  }
+
+
+def enqueue_email(batch, kind: str, to_email: str, payload: dict = None):
+  # Adds an email job to `batch`, so it is committed atomically with the
+  # document it belongs to. The background sender picks it up.
+  job_ref, data = email_job(kind, to_email, payload)
+  batch.set(job_ref, data)
+  return job_ref
+
+
+def notify_outbox():
+  # Lets the sender pick up freshly committed jobs without waiting a poll.
+  if _wakeup is not None:
+    _wakeup.set()
+
+
+def _send_staff_password_setup(job: dict):
+  # The reset link is generated at send time: it stays fresh across retries
+  # and the Firebase Auth round-trip happens off the request path.
+  action_settings = ActionCodeSettings(
+    url=os.getenv("FRONTEND_BASE_URL") + "/set-password",
+    handle_code_in_app=True
+  )
+  reset_link = auth.generate_password_reset_link(job["to_email"], action_settings)
+  send_staff_password_setup_email(job["to_email"], reset_link)
+
+
+_SENDERS = {
+  STAFF_PASSWORD_SETUP: _send_staff_password_setup,
+}
+
+
+def _claim_jobs(now: datetime) -> list:
+  # Jobs in SENDING whose lease expired (the sender died mid-batch) are due
+  # again, so one query covers both fresh and abandoned work.
+  query = (
+    db.collection(OUTBOX_COLLECTION)
+    .where("status", "in", ["PENDING", "SENDING"])
+    .where("next_attempt_at", "<=", now)
+    .order_by("next_attempt_at")
+    .limit(OUTBOX_BATCH_SIZE)
+  )
+
+  transaction = db.transaction()
+
+  @firestore.transactional
+  def claim(transaction):
+    docs = list(transaction.get(query))
+    lease_until = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+    for doc in docs:
+      transaction.update(doc.reference, {"status": "SENDING", "next_attempt_at": lease_until})
+    return [(doc.reference, doc.to_dict()) for doc in docs]
+
+  return claim(transaction)
+
+
+def _retry_delay(attempts: int) -> float:
+  return min(30 * (2 ** (attempts - 1)), 3600)
+
+
+def process_outbox_batch() -> int:
+  now = datetime.now(timezone.utc)
+  jobs = _claim_jobs(now)
+  if not jobs:
+    return 0
+
+  interval = 1 / OUTBOX_RATE_PER_SECOND if OUTBOX_RATE_PER_SECOND > 0 else 0
+  batch = db.batch()
+  last_sent = 0.0
+
+  for job_ref, job in jobs:
+    wait = last_sent + interval - time.monotonic()
+    if wait > 0:
+      time.sleep(wait)
+    last_sent = time.monotonic()
+
+    sender = _SENDERS.get(job.get("kind"))
+    try:
+      if sender is None:
+        raise ValueError(f"Unknown email kind: {job.get('kind')}")
+      sender(job)
+      batch.update(job_ref, {
+        "status": "SENT",
+        "sent_at": firestore.SERVER_TIMESTAMP,
+        "last_error": None
+      })
+    except CircuitOpenError as e:
+      # The provider is known to be down: push back without using an attempt.
+      batch.update(job_ref, {
+        "status": "PENDING",
+        "next_attempt_at": datetime.now(timezone.utc) + timedelta(seconds=e.retry_after)
+      })
+    except Exception as e:
+      attempts = job.get("attempts", 0) + 1
+      update = {"attempts": attempts, "last_error": str(e)}
+      if attempts >= OUTBOX_MAX_ATTEMPTS or sender is None:
+        update["status"] = "FAILED"
+      else:
+        update["status"] = "PENDING"
+        update["next_attempt_at"] = datetime.now(timezone.utc) + timedelta(seconds=_retry_delay(attempts))
+      batch.update(job_ref, update)
+
+  batch.commit()
+  return len(jobs)
+
+
+async def run_outbox_worker():
+  global _wakeup
+  _wakeup = asyncio.Event()
+
+  while True:
+    _wakeup.clear()
+    try:
+      processed = await asyncio.to_thread(process_outbox_batch)
+    except Exception:
+      logger.exception("Email outbox batch failed")
+      processed = 0
+
+    if processed >= OUTBOX_BATCH_SIZE:
+      continue
+
+    try:
+      await asyncio.wait_for(_wakeup.wait(), timeout=OUTBOX_POLL_SECONDS)
+    except asyncio.TimeoutError:
+      pass
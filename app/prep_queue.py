@@ -0,0 +1,162 @@
+# app/prep_queue.py
+
+import os
+import threading
+import time
+from .orders_store import order_collections
+
+PREP_QUEUE_IDLE_SECONDS = int(os.environ.get("PREP_QUEUE_IDLE_SECONDS", "900"))
+PREP_QUEUE_READY_TIMEOUT = float(os.environ.get("PREP_QUEUE_READY_TIMEOUT", "10"))
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def _item_key(item: dict):
+  return item.get("item_id") or (item.get("name") or "").strip().lower()
+
+
+class StallPrepQueue:
+  # Per-item pending quantities across a stall's PAID orders. Kept up to date
+  # from a Firestore snapshot listener, so serving it never re-reads orders.
+
+  def __init__(self, college_id: str, stall_id: str):
+    self.college_id = college_id
+    self.stall_id = stall_id
+    self.last_served_at = time.monotonic()
+    self._lock = threading.Lock()
+    self._ready = threading.Event()
+    self._order_items = {}
+    self._totals = {}
+    self._read_time = None
+    self._watches = []
+    self._synced = set()
+
+  def start(self):
+    # One listener per place the stall's orders may live (see orders_store);
+    # the queue is ready once each has delivered its first snapshot.
+    for index, orders in enumerate(order_collections(self.college_id)):
+      query = (
+        orders
+        .where("stall_id", "==", self.stall_id)
+        .where("status", "==", "PAID")
+      )
+      self._watches.append(query.on_snapshot(
+        lambda docs, changes, read_time, index=index: self._on_snapshot(index, changes, read_time)
+      ))
+
+  def stop(self):
+    for watch in self._watches:
+      watch.unsubscribe()
+    self._watches = []
+
+  @property
+  def is_active(self):
+    return bool(self._watches) and (
+      not self._ready.is_set() or all(watch.is_active for watch in self._watches)
+    )
+
+  def wait_ready(self, timeout: float) -> bool:
+    return self._ready.wait(timeout)
+
+  def _add_order(self, order_key: tuple, order: dict):
+    counted = {}
+    for item in order.get("items", []):
+      key = _item_key(item)
+      if not key:
+        continue
+      quantity = int(item.get("quantity", 0) or 0)
+      counted[key] = counted.get(key, 0) + quantity
+
+      entry = self._totals.setdefault(key, {
+        "item_id": item.get("item_id"),
+        "name": item.get("name"),
+        "quantity": 0,
+        "orders": 0
+      })
+      entry["quantity"] += quantity
+
+    for key in counted:
+      self._totals[key]["orders"] += 1
+
+    self._order_items[order_key] = counted
+
+  def _remove_order(self, order_key: tuple):
+    counted = self._order_items.pop(order_key, None)
+    if not counted:
+      return
+
+    for key, quantity in counted.items():
+      entry = self._totals.get(key)
+      if entry is None:
+        continue
+      entry["quantity"] -= quantity
+      entry["orders"] -= 1
+      if entry["orders"] <= 0:
+        del self._totals[key]
+
+  def _on_snapshot(self, index: int, changes, read_time):
+    # Entries are keyed by (collection index, order id): the legacy migration
+    # moves an order between collections under the same id, and the two
+    # listeners may report the ADDED before the REMOVED.
+    with self._lock:
+      for change in changes:
+        order_key = (index, change.document.id)
+        self._remove_order(order_key)
+        if change.type.name != "REMOVED":
+          self._add_order(order_key, change.document.to_dict() or {})
+      self._read_time = read_time
+      self._synced.add(index)
+      synced = len(self._synced) == len(self._watches)
+    if synced:
+      self._ready.set()
+
+  def snapshot(self) -> dict:
+    self.last_served_at = time.monotonic()
+    with self._lock:
+      items = [dict(entry) for entry in self._totals.values()]
+      pending_orders = len(self._order_items)
+      read_time = self._read_time
+
+    items.sort(key=lambda x: x["quantity"], reverse=True)
+
+    return {
+      "stall_id": self.stall_id,
+      "pending_orders": pending_orders,
+      "items": items,
+      "as_of": read_time.isoformat() if read_time else None
+    }
+
+
+def get_prep_queue(college_id: str, stall_id: str) -> StallPrepQueue:
+  now = time.monotonic()
+  stale = []
+
+  with _queues_lock:
+    queue = _queues.get(stall_id)
+    if queue is not None and not queue.is_active:
+      stale.append(_queues.pop(stall_id))
+      queue = None
+
+    if queue is None:
+      queue = StallPrepQueue(college_id, stall_id)
+      queue.start()
+      _queues[stall_id] = queue
+
+    for other_id, other in list(_queues.items()):
+      if other_id != stall_id and now - other.last_served_at > PREP_QUEUE_IDLE_SECONDS:
+        stale.append(_queues.pop(other_id))
+
+  for old in stale:
+    old.stop()
+
+  return queue
+
+
+def stop_all_prep_queues():
+  with _queues_lock:
+    queues = list(_queues.values())
+    _queues.clear()
+
+  for queue in queues:
+    queue.stop()
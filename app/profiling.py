@@ -0,0 +1,127 @@
+# app/profiling.py
+
+import os
+import re
+import hmac
+import time
+import uuid
+import random
+import asyncio
+import logging
+from pathlib import Path
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+
+logger = logging.getLogger(__name__)
+
+# Off unless PROFILING_TOKEN is set. A request carrying the token in
+# X-Profile-Token is always profiled; PROFILING_SAMPLE_RATE additionally
+# profiles that fraction of all requests.
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN", "")
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL_SECONDS = float(os.environ.get("PROFILING_INTERVAL_SECONDS", "0.001"))
+PROFILING_DIR = Path(os.environ.get("PROFILING_DIR", ".cache/profiles"))
+PROFILING_MAX_FILES = int(os.environ.get("PROFILING_MAX_FILES", "50"))
+# Sampled profiles are skipped while this many are already running.
+PROFILING_MAX_CONCURRENT = int(os.environ.get("PROFILING_MAX_CONCURRENT", "2"))
+
+PROFILE_SUFFIX = ".speedscope.json"
+
+_PROFILE_NAME = re.compile(r"^[\w.-]+\.speedscope\.json$")
+_active = 0
+
+
+def profiling_enabled() -> bool:
+  return bool(PROFILING_TOKEN)
+
+
+def is_profiling_admin(token: str) -> bool:
+  return profiling_enabled() and bool(token) and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+def _profile_name(method: str, path: str) -> str:
+  # e.g. 20261019T085350-GET-user-menu-1a2b3c4d.speedscope.json
+  slug = re.sub(r"[^\w]+", "-", path).strip("-")[:60] or "root"
+  return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{method}-{slug}-{uuid.uuid4().hex[:8]}{PROFILE_SUFFIX}"
+
+
+def _save_profile(session, name: str):
+  PROFILING_DIR.mkdir(parents=True, exist_ok=True)
+  (PROFILING_DIR / name).write_text(SpeedscopeRenderer().render(session), encoding="utf-8")
+  prune_profiles()
+
+
+def prune_profiles(max_files: int = PROFILING_MAX_FILES):
+  # Keeps the newest max_files profiles.
+  profiles = sorted(PROFILING_DIR.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True)
+  for stale in profiles[max_files:]:
+    stale.unlink(missing_ok=True)
+
+
+def list_profiles() -> list:
+  if not PROFILING_DIR.exists():
+    return []
+  profiles = sorted(PROFILING_DIR.glob(f"*{PROFILE_SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True)
+  return [
+    {"name": p.name, "size": p.stat().st_size, "created_at": p.stat().st_mtime}
+    for p in profiles
+  ]
+
+
+def get_profile_path(name: str):
+  # None for unknown names; the pattern also rules out path traversal.
+  if not _PROFILE_NAME.match(name):
+    return None
+  path = PROFILING_DIR / name
+  return path if path.is_file() else None
+
+
+class ProfilingMiddleware:
+  # Runs pyinstrument around a request and saves a speedscope profile
+  # (open it at https://www.speedscope.app). Only the event loop thread is
+  # sampled; time spent in asyncio.to_thread workers shows up as the await.
+
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send):
+    global _active
+    if scope["type"] != "http" or not profiling_enabled():
+      return await self.app(scope, receive, send)
+
+    token = ""
+    for name, value in scope.get("headers", []):
+      if name == b"x-profile-token":
+        token = value.decode("latin-1")
+        break
+
+    requested = is_profiling_admin(token)
+    sampled = (
+      not requested
+      and PROFILING_SAMPLE_RATE > 0
+      and _active < PROFILING_MAX_CONCURRENT
+      and random.random() < PROFILING_SAMPLE_RATE
+    )
+    if not requested and not sampled:
+      return await self.app(scope, receive, send)
+
+    profile_name = _profile_name(scope.get("method"), scope.get("path"))
+
+    async def send_with_profile_name(message):
+      if requested and message["type"] == "http.response.start":
+        message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile_name.encode())]}
+      await send(message)
+
+    profiler = Profiler(interval=PROFILING_INTERVAL_SECONDS, async_mode="enabled")
+    _active += 1
+    profiler.start()
+    try:
+      await self.app(scope, receive, send_with_profile_name)
+    finally:
+      session = profiler.stop()
+      _active -= 1
+      try:
+        await asyncio.to_thread(_save_profile, session, profile_name)
+        logger.info("Request profiled", extra={"profile": profile_name, "sampled": sampled})
+      except Exception:
+        logger.exception("Saving request profile failed", extra={"profile": profile_name})
@@ -0,0 +1,104 @@
+# app/resale_feed.py
+
+import os
+import json
+import base64
+import threading
+from datetime import datetime, timezone
+from cachetools import TTLCache
+from .firebase_init import db, firestore
+from .metrics import record_cache
+from .serialization import serialize_firestore_data
+
+FEED_PAGE_SIZE = int(os.environ.get("FEED_PAGE_SIZE", "20"))
+MAX_FEED_PAGE_SIZE = 50
+FEED_CACHE_TTL_SECONDS = float(os.environ.get("FEED_CACHE_TTL_SECONDS", "5"))
+
+# Keyed by (college_id, cursor, limit). Short-lived: other workers' writes
+# only show up once an entry expires.
+_feed_cache = TTLCache(maxsize=512, ttl=FEED_CACHE_TTL_SECONDS)
+_feed_cache_lock = threading.Lock()
+
+
+class InvalidFeedCursorError(Exception):
+  pass
+
+
+def _encode_cursor(data: dict, resale_id: str) -> str:
+  # Opaque to clients: the sort values of the last item on the page, taken
+  # from the page itself so later changes to that item do not move it.
+  raw = json.dumps({
+    "expires": data["reservation_expires_at"].isoformat(),
+    "created": data["created_at"].isoformat(),
+    "id": resale_id
+  }, separators=(",", ":"))
+  return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> dict:
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    position = json.loads(raw)
+    return {
+      "reservation_expires_at": datetime.fromisoformat(position["expires"]),
+      "created_at": datetime.fromisoformat(position["created"]),
+      "__name__": str(position["id"])
+    }
+  except (ValueError, TypeError, KeyError):
+    raise InvalidFeedCursorError()
+
+
+def _query_feed_page(college_id: str, limit: int, cursor: str = None):
+  # An item is visible once reservation_expires_at has passed: it is set to
+  # the creation time for new items and pushed 5 minutes ahead on every
+  # reservation, so AVAILABLE items and lapsed reservations match one range
+  # filter and a page is a single bounded query. Firestore orders by the
+  # range field first; created_at and the document id break ties, which for
+  # never-reserved items is newest first.
+  query = (
+    db.collection("resale_items")
+    .where("college_id", "==", college_id)
+    .where("status", "in", ["AVAILABLE", "RESERVED"])
+    .where("reservation_expires_at", "<=", datetime.now(timezone.utc))
+    .order_by("reservation_expires_at", direction=firestore.Query.DESCENDING)
+    .order_by("created_at", direction=firestore.Query.DESCENDING)
+    .order_by("__name__", direction=firestore.Query.DESCENDING)
+  )
+
+  if cursor:
+    query = query.start_after(_decode_cursor(cursor))
+
+  # One extra document tells us whether there is a next page.
+  docs = list(query.limit(limit + 1).stream())
+
+  items = []
+  next_cursor = None
+  for index, doc in enumerate(docs[:limit]):
+    data = doc.to_dict()
+    if index == limit - 1 and len(docs) > limit:
+      next_cursor = _encode_cursor(data, doc.id)
+    data["resale_id"] = doc.id
+    items.append(serialize_firestore_data(data))
+
+  return items, next_cursor
+
+
+def get_feed_page(college_id: str, limit: int = FEED_PAGE_SIZE, cursor: str = None):
+  # Returns (items, next_cursor); next_cursor is None on the last page.
+  key = (college_id, cursor, limit)
+  with _feed_cache_lock:
+    page = _feed_cache.get(key)
+  record_cache("resale_feed", page is not None)
+  if page is not None:
+    return page
+
+  page = _query_feed_page(college_id, limit, cursor)
+  with _feed_cache_lock:
+    _feed_cache[key] = page
+  return page
+
+
+def invalidate_feed(college_id: str):
+  with _feed_cache_lock:
+    for key in [key for key in _feed_cache.keys() if key[0] == college_id]:
+      _feed_cache.pop(key, None)
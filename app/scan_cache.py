@@ -0,0 +1,300 @@
+# app/scan_cache.py
+
+import os
+import io
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from PIL import Image
+from .firebase_init import db
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+SCAN_CACHE_BACKEND = os.environ.get("SCAN_CACHE_BACKEND", "disk").lower()  # disk | firestore | off
+SCAN_CACHE_DIR = os.environ.get("SCAN_CACHE_DIR", ".cache/menu_scans")
+SCAN_CACHE_TTL_SECONDS = int(os.environ.get("SCAN_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+SCAN_CACHE_NEAR_DUPLICATES = os.environ.get("SCAN_CACHE_NEAR_DUPLICATES", "false").lower() == "true"
+SCAN_CACHE_MAX_DISTANCE = int(os.environ.get("SCAN_CACHE_MAX_DISTANCE", "5"))
+# Disk backend only; the oldest scans are deleted beyond this many.
+SCAN_CACHE_MAX_ENTRIES = int(os.environ.get("SCAN_CACHE_MAX_ENTRIES", "5000"))
+
+# The 64-bit perceptual hash is split into 8 bands of 8 bits. Two hashes that
+# differ in at most 7 bits share at least one band, so band lookups find every
+# near-duplicate candidate for SCAN_CACHE_MAX_DISTANCE < 8.
+_PHASH_BANDS = 8
+
+
+def content_hash(image_bytes: bytes) -> str:
+  return hashlib.sha256(image_bytes).hexdigest()
+
+
+def perceptual_hash(image_bytes: bytes):
+  # dHash: compare neighbouring pixels of a 9x8 grayscale thumbnail. Robust to
+  # recompression and resizing, which is what re-submitted photos go through.
+  try:
+    with Image.open(io.BytesIO(image_bytes)) as img:
+      img.draft("L", (64, 64))
+      pixels = list(img.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+  except Exception:
+    return None
+
+  value = 0
+  for row in range(8):
+    for col in range(8):
+      left = pixels[row * 9 + col]
+      right = pixels[row * 9 + col + 1]
+      value = (value << 1) | (1 if left > right else 0)
+  return value
+
+
+def _phash_bands(phash: int) -> list:
+  return [f"{i}:{(phash >> (i * 8)) & 0xFF:02x}" for i in range(_PHASH_BANDS)]
+
+
+def _hamming(a: int, b: int) -> int:
+  return bin(a ^ b).count("1")
+
+
+class DiskScanCache:
+  # Keeps an in-memory index of the directory (created_at and phash per key)
+  # for near-duplicate lookups and the entry limit. Our own writes update it
+  # directly; the directory is only rescanned when another worker changed it.
+
+  def __init__(self, directory: str, ttl_seconds: int, max_entries: int):
+    self.directory = directory
+    self.ttl_seconds = ttl_seconds
+    self.max_entries = max_entries
+    self._lock = threading.Lock()
+    self._entries = {}
+    self._band_index = {}
+    self._index_mtime = None
+
+  def _path(self, key: str) -> str:
+    return os.path.join(self.directory, f"{key}.json")
+
+  def _expired(self, created_at) -> bool:
+    return time.time() - (created_at or 0) > self.ttl_seconds
+
+  def _remove(self, key: str):
+    try:
+      os.remove(self._path(key))
+    except OSError:
+      pass
+
+  def _load(self, key: str):
+    try:
+      with open(self._path(key)) as f:
+        entry = json.load(f)
+    except (OSError, ValueError):
+      return None
+
+    if self._expired(entry.get("created_at")):
+      self._remove(key)
+      return None
+
+    return entry
+
+  def _dir_mtime(self):
+    try:
+      return os.stat(self.directory).st_mtime_ns
+    except FileNotFoundError:
+      return None
+
+  def _index_add(self, key: str, created_at: float, phash):
+    self._entries[key] = (created_at, phash)
+    if phash is not None:
+      for band in _phash_bands(phash):
+        self._band_index.setdefault(band, set()).add(key)
+
+  def _index_remove(self, key: str):
+    _, phash = self._entries.pop(key, (None, None))
+    if phash is not None:
+      for band in _phash_bands(phash):
+        keys = self._band_index.get(band)
+        if keys is not None:
+          keys.discard(key)
+          if not keys:
+            del self._band_index[band]
+
+  def _refresh_index(self):
+    # Caller holds self._lock.
+    mtime = self._dir_mtime()
+    if mtime is None or mtime == self._index_mtime:
+      # Missing until the first put(), or unchanged since we last looked.
+      return
+
+    # Only files we have not seen are read; known entries are checked against
+    # the TTL from the index, and expired files are deleted on the way.
+    present = set()
+    pruned = False
+    for filename in os.listdir(self.directory):
+      if not filename.endswith(".json"):
+        continue
+      key = filename[:-5]
+      known = self._entries.get(key)
+      if known is not None:
+        if self._expired(known[0]):
+          self._remove(key)
+          pruned = True
+          continue
+        present.add(key)
+        continue
+
+      entry = self._load(key)
+      if entry is None:
+        pruned = True
+        continue
+      present.add(key)
+      self._index_add(key, entry.get("created_at"), entry.get("phash"))
+
+    for key in [key for key in self._entries if key not in present]:
+      self._index_remove(key)
+
+    pruned = self._evict() or pruned
+    # Our own deletions changed the directory too.
+    self._index_mtime = self._dir_mtime() if pruned else mtime
+
+  def _evict(self) -> bool:
+    # Caller holds self._lock. Drops the oldest entries beyond max_entries.
+    excess = len(self._entries) - self.max_entries
+    if excess <= 0:
+      return False
+    oldest = sorted(self._entries, key=lambda key: self._entries[key][0] or 0)[:excess]
+    for key in oldest:
+      self._remove(key)
+      self._index_remove(key)
+    return True
+
+  def get(self, key: str, phash=None):
+    entry = self._load(key)
+    if entry:
+      return entry["items"]
+
+    if phash is None:
+      return None
+
+    with self._lock:
+      self._refresh_index()
+      candidates = set()
+      for band in _phash_bands(phash):
+        candidates |= self._band_index.get(band, set())
+
+    best = None
+    for candidate in candidates:
+      entry = self._load(candidate)
+      if not entry or entry.get("phash") is None:
+        continue
+      distance = _hamming(phash, entry["phash"])
+      if distance <= SCAN_CACHE_MAX_DISTANCE and (best is None or distance < best[0]):
+        best = (distance, entry)
+
+    return best[1]["items"] if best else None
+
+  def put(self, key: str, items: list, phash=None):
+    entry = {"items": items, "phash": phash, "created_at": time.time()}
+    os.makedirs(self.directory, exist_ok=True)
+    with self._lock:
+      self._refresh_index()
+      before = self._dir_mtime()
+      tmp_path = self._path(key) + ".tmp"
+      with open(tmp_path, "w") as f:
+        json.dump(entry, f)
+      os.replace(tmp_path, self._path(key))
+
+      self._index_remove(key)
+      self._index_add(key, entry["created_at"], phash)
+      self._evict()
+      # Skip the next rescan if nobody else touched the directory meanwhile.
+      if before == self._index_mtime:
+        self._index_mtime = self._dir_mtime()
+
+
+class FirestoreScanCache:
+  # Expired documents are removed by a Firestore TTL policy on `expires_at`;
+  # reads also check it because TTL deletion can lag by up to a day.
+
+  def __init__(self, ttl_seconds: int):
+    self.ttl_seconds = ttl_seconds
+    self.collection = db.collection("menu_scan_cache")
+
+  @staticmethod
+  def _is_fresh(data: dict) -> bool:
+    expires_at = data.get("expires_at")
+    return expires_at is None or expires_at > datetime.now(timezone.utc)
+
+  def get(self, key: str, phash=None):
+    doc = self.collection.document(key).get()
+    if doc.exists and self._is_fresh(doc.to_dict()):
+      return doc.to_dict().get("items")
+
+    if phash is None:
+      return None
+
+    candidates = (
+      self.collection
+      .where("phash_bands", "array_contains_any", _phash_bands(phash))
+      .limit(20)
+      .stream()
+    )
+
+    best = None
+    for candidate in candidates:
+      data = candidate.to_dict()
+      if not self._is_fresh(data) or not data.get("phash"):
+        continue
+      distance = _hamming(phash, int(data["phash"], 16))
+      if distance <= SCAN_CACHE_MAX_DISTANCE and (best is None or distance < best[0]):
+        best = (distance, data)
+
+    return best[1].get("items") if best else None
+
+  def put(self, key: str, items: list, phash=None):
+    data = {
+      "items": items,
+      "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+    }
+    if phash is not None:
+      data["phash"] = f"{phash:016x}"
+      data["phash_bands"] = _phash_bands(phash)
+    self.collection.document(key).set(data)
+
+
+def _create_backend():
+  if SCAN_CACHE_BACKEND == "disk":
+    return DiskScanCache(SCAN_CACHE_DIR, SCAN_CACHE_TTL_SECONDS, SCAN_CACHE_MAX_ENTRIES)
+  if SCAN_CACHE_BACKEND == "firestore":
+    return FirestoreScanCache(SCAN_CACHE_TTL_SECONDS)
+  return None
+
+
+_backend = _create_backend()
+
+
+def scan_cache_key(image_bytes: bytes):
+  phash = perceptual_hash(image_bytes) if SCAN_CACHE_NEAR_DUPLICATES else None
+  return content_hash(image_bytes), phash
+
+
+def get_cached_scan(key):
+  if _backend is None:
+    return None
+  try:
+    items = _backend.get(*key)
+  except Exception:
+    items = None
+  record_cache("menu_scan", items is not None)
+  return items
+
+
+def store_scan(key, items: list):
+  if _backend is None or not items:
+    return
+  try:
+    _backend.put(key[0], items, key[1])
+  except Exception as e:
+    # A read-only or missing cache directory only costs the cache.
+    logger.warning("Could not store menu scan in cache: %s", e)
@@ -6,6 +6,9 @@ from typing import List, Optional
 class AddStaffSchema(BaseModel):
     email: EmailStr
 
+class BulkAddStaffSchema(BaseModel):
+    emails: List[EmailStr] = Field(..., min_length=1)
+
 class StaffAuthResponse(BaseModel):
     message: str
     role: str
@@ -39,6 +42,10 @@ class MenuItemSchema(BaseModel):
 class MenuSchema(BaseModel):
     stall_id: str
     items: List[MenuItemSchema]
+    upsert: bool = Field(
+      False,
+      description="Update existing items with the same (normalized) name instead of adding duplicates"
+    )
 
 class UpdateMenuItemSchema(BaseModel):
     name: Optional[str] = None
@@ -47,6 +54,12 @@ class UpdateMenuItemSchema(BaseModel):
     image_ref: Optional[str] = None
     is_available: Optional[bool] = None
 
+class BulkMenuItemUpdateSchema(UpdateMenuItemSchema):
+    item_id: str
+
+class BulkUpdateMenuItemsSchema(BaseModel):
+    items: List[BulkMenuItemUpdateSchema] = Field(..., min_length=1)
+
 class ExtractedMenuItem(BaseModel):
     name: str = Field(..., description="The name of the food item")
     price: Optional[float] = Field(None, description="The price of the item")
@@ -56,6 +69,7 @@ class MenuScanResponse(BaseModel):
     detected_items: List[ExtractedMenuItem]
     count: int
     message: str = "Scan complete. Please verify items before saving."
+    cached: bool = False
 
 class CartItemSchema(BaseModel):
     item_id: str
@@ -81,6 +95,10 @@ class OrderResponseSchema(BaseModel):
 class UpdateOrderStatusSchema(BaseModel):
     status: str
 
+class BulkUpdateOrderStatusSchema(BaseModel):
+    order_ids: List[str] = Field(..., min_length=1)
+    status: str
+
 class VerifyPaymentSchema(BaseModel):
     razorpay_order_id: str
     razorpay_payment_id: str
@@ -0,0 +1,11 @@
+# app/serialization.py
+
+from datetime import datetime
+
+
+def serialize_firestore_data(data: dict):
+  # Timestamps become ISO strings so the dict can go into a JSONResponse.
+  for key, value in data.items():
+    if isinstance(value, datetime):
+      data[key] = value.isoformat()
+  return data
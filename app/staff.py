@@ -1,32 +1,71 @@
 # app/staff.py
 
 import os
+import asyncio
+import logging
 from dotenv import load_dotenv
 import json
 import google.generativeai as genai
 from fastapi import UploadFile
-from .schema import MenuSchema, UpdateMenuItemSchema, AddStaffSchema, UpdateOrderStatusSchema, VerifyPickupSchema, UpdateStaffProfileSchema, UpdateResalePriceSchema
-from fastapi.responses import JSONResponse
+from .schema import MenuSchema, UpdateMenuItemSchema, BulkUpdateMenuItemsSchema, AddStaffSchema, BulkAddStaffSchema, UpdateOrderStatusSchema, BulkUpdateOrderStatusSchema, VerifyPickupSchema, UpdateStaffProfileSchema, UpdateResalePriceSchema
+from fastapi.responses import JSONResponse, StreamingResponse
 from starlette import status
 from .firebase_init import db
 from firebase_admin import auth, firestore
-from datetime import datetime
-from .mailer import send_staff_password_setup_email
-from firebase_admin.auth import ActionCodeSettings
+from .outbox import enqueue_email, email_job, notify_outbox, STAFF_PASSWORD_SETUP
+from .prep_queue import get_prep_queue, PREP_QUEUE_READY_TIMEOUT
+from .firestore_batch import commit_in_batches, commit_in_batches_concurrently
+from .scan_cache import scan_cache_key, get_cached_scan, store_scan
+from .image_preprocess import preprocess_in_worker
+from .uploads import read_upload, read_image_upload, upload_too_large_message, UploadTooLargeError, UnsupportedImageTypeError
+from .json_stream import IncrementalJSONArrayParser
+from .circuit_breaker import get_breaker, circuit_open_response, CircuitOpenError
+from .resale_feed import invalidate_feed
+from .orders_store import order_collections, stream_orders, find_order, get_orders
+from collections import Counter
+import csv
+import io
+from pydantic import TypeAdapter, EmailStr, ValidationError
+from starlette.concurrency import iterate_in_threadpool
+from .logging_config import bind_log_context
+from .serialization import serialize_firestore_data
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 if os.environ.get("GEMINI_API_KEY"):
   genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
 
+MAX_SCAN_PAGES = int(os.environ.get("MAX_SCAN_PAGES", "8"))
+MAX_BULK_STAFF = int(os.environ.get("MAX_BULK_STAFF", "200"))
+# MAX_BULK_STAFF addresses fit in a few KB; anything far past that is not a staff list.
+MAX_STAFF_CSV_BYTES = int(os.environ.get("MAX_STAFF_CSV_BYTES", str(256 * 1024)))
+STAFF_CREATE_CONCURRENCY = int(os.environ.get("STAFF_CREATE_CONCURRENCY", "5"))
+GEMINI_TIMEOUT_SECONDS = float(os.environ.get("GEMINI_TIMEOUT_SECONDS", "60"))
+SCAN_CONCURRENCY = int(os.environ.get("SCAN_CONCURRENCY", "4"))
+
+SCAN_UNAVAILABLE_MESSAGE = "Menu scanning is temporarily unavailable. Please try again shortly."
+
+# A blocked or unparseable answer is about the photo, not a Gemini outage.
+gemini_breaker = get_breaker("gemini", ignore_exceptions=(
+  genai.types.BlockedPromptException,
+  genai.types.StopCandidateException
+))
+
+# Caps concurrent Gemini extractions across all scan requests in this worker.
+_scan_semaphore = asyncio.Semaphore(SCAN_CONCURRENCY)
+
 async def get_staff_details(id_token: str):
   try:
     decoded_token = auth.verify_id_token(id_token)
     uid = decoded_token["uid"]
+    bind_log_context(user_id=uid)
 
     staff_doc = db.collection("staffs").document(uid).get()
     if staff_doc.exists:
       data = staff_doc.to_dict()
+      bind_log_context(college_id=data.get("college_id"), stall_id=data.get("stall_id"))
 
       if data.get("status", "").strip() != "active":
         return None, None
@@ -36,20 +75,17 @@ async def get_staff_details(id_token: str):
     return None, None
 
   except auth.ExpiredIdTokenError:
-    print("Token expired")
+    logger.info("Staff token expired")
     return None, None
   except auth.InvalidIdTokenError:
-    print("Invalid token")
+    logger.info("Staff token invalid")
     return None, None
   except Exception as e:
-    print(f"Auth Error: {e}")
+    logger.exception("Staff authentication failed")
     return None, None
 
-def serialize_firestore_data(data: dict):
-  for key, value in data.items():
-    if isinstance(value, datetime):
-      data[key] = value.isoformat()
-  return data
+def normalize_item_name(name: str) -> str:
+  return " ".join((name or "").lower().split())
 
 def validate_extracted_items(items):
   if not isinstance(items, list):
@@ -110,18 +146,10 @@ async def add_staff_member(staff_data: AddStaffSchema, id_token: str):
     except auth.UserNotFoundError:
       user = auth.create_user(email=email)
 
-    action_settings = ActionCodeSettings(
-        url=os.getenv("FRONTEND_BASE_URL") + "/set-password",
-        handle_code_in_app=True
-    )
-    reset_link = auth.generate_password_reset_link(
-      email,
-      action_settings
-    )
-
-    send_staff_password_setup_email(email, reset_link)
-
-    db.collection("staffs").document(user.uid).set({
+    # The staff doc and its setup email are committed together; the email
+    # itself is delivered by the outbox sender, off this request.
+    batch = db.batch()
+    batch.set(db.collection("staffs").document(user.uid), {
       "email": email,
       "stall_id": stall_id,
       "college_id": college_id,
@@ -130,15 +158,164 @@ async def add_staff_member(staff_data: AddStaffSchema, id_token: str):
       "added_by": requester_data["email"],
       "created_at": firestore.SERVER_TIMESTAMP
     })
+    enqueue_email(batch, STAFF_PASSWORD_SETUP, email)
+    batch.commit()
+    notify_outbox()
+
     return JSONResponse(
       status_code=status.HTTP_201_CREATED,
-      content={"message": f"Staff {email} added successfully."
+      content={"message": f"Staff {email} added successfully. A password setup email is on its way."
               }
     )
 
   except Exception as e:
     return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"message": str(e)})
   
+_email_adapter = TypeAdapter(EmailStr)
+
+def _parse_staff_csv(text: str):
+  # Every non-empty cell is treated as an email, so both a bare list and an
+  # exported sheet with an "email" column work; header-like cells are skipped.
+  valid, invalid = [], []
+  for row in csv.reader(io.StringIO(text)):
+    for cell in row:
+      cell = cell.strip()
+      if not cell or cell.lower() in ["email", "emails", "email address"]:
+        continue
+      try:
+        valid.append(_email_adapter.validate_python(cell))
+      except ValidationError:
+        invalid.append(cell)
+  return valid, invalid
+
+def _existing_staff_by_email(emails: list) -> dict:
+  existing = {}
+  # Firestore "in" filters accept at most 30 values.
+  for start in range(0, len(emails), 30):
+    chunk = emails[start:start + 30]
+    for doc in db.collection("staffs").where("email", "in", chunk).stream():
+      existing[doc.to_dict().get("email")] = doc.to_dict()
+  return existing
+
+def _lookup_auth_users(emails: list) -> dict:
+  users = {}
+  # auth.get_users accepts at most 100 identifiers per call.
+  for start in range(0, len(emails), 100):
+    chunk = emails[start:start + 100]
+    result = auth.get_users([auth.EmailIdentifier(email) for email in chunk])
+    for user in result.users:
+      users[user.email.lower()] = user
+  return users
+
+async def _bulk_add_staff(requester_data: dict, emails: list, invalid: list):
+  stall_id = requester_data["stall_id"]
+  college_id = requester_data["college_id"]
+
+  outcomes = {}
+  for email in invalid:
+    outcomes[email] = {"email": email, "status": "invalid", "message": "Not a valid email address."}
+
+  emails = [e for e in dict.fromkeys(email.lower() for email in emails) if e not in outcomes]
+
+  existing = await asyncio.to_thread(_existing_staff_by_email, emails)
+  candidates = []
+  for email in emails:
+    if existing.get(email, {}).get("status") == "active":
+      outcomes[email] = {"email": email, "status": "already_staff", "message": "User is already a staff member."}
+    else:
+      candidates.append(email)
+
+  users = await asyncio.to_thread(_lookup_auth_users, candidates)
+  semaphore = asyncio.Semaphore(STAFF_CREATE_CONCURRENCY)
+
+  async def create_user(email):
+    async with semaphore:
+      try:
+        users[email] = await asyncio.to_thread(auth.create_user, email=email)
+      except Exception as e:
+        outcomes[email] = {"email": email, "status": "failed", "message": str(e)}
+
+  await asyncio.gather(*(create_user(email) for email in candidates if email not in users))
+
+  # Each staff doc is followed by its email job; with an even chunk size the
+  # pair always lands in the same batch.
+  ops = []
+  for email in candidates:
+    if email in outcomes:
+      continue
+    ops.append(("set", db.collection("staffs").document(users[email].uid), {
+      "email": email,
+      "stall_id": stall_id,
+      "college_id": college_id,
+      "role": "staff",
+      "status": "inactive",
+      "added_by": requester_data["email"],
+      "created_at": firestore.SERVER_TIMESTAMP
+    }))
+    job_ref, job_data = email_job(STAFF_PASSWORD_SETUP, email)
+    ops.append(("set", job_ref, job_data))
+
+  for chunk, error in commit_in_batches(ops):
+    for op in chunk[::2]:
+      email = op[2]["email"]
+      if error is None:
+        outcomes[email] = {"email": email, "status": "added", "message": "Staff added. A password setup email is on its way."}
+      else:
+        outcomes[email] = {"email": email, "status": "failed", "message": str(error)}
+
+  if ops:
+    notify_outbox()
+
+  results = [outcomes[email] for email in invalid + emails]
+  summary = Counter(r["status"] for r in results)
+
+  return JSONResponse(
+    status_code=status.HTTP_200_OK,
+    content={
+      "added": summary.get("added", 0),
+      "already_staff": summary.get("already_staff", 0),
+      "invalid": summary.get("invalid", 0),
+      "failed": summary.get("failed", 0),
+      "results": results
+    }
+  )
+
+async def add_staff_members(staff_data: BulkAddStaffSchema, id_token: str, csv_file: UploadFile = None):
+  try:
+    requester_data, requester_uid = await get_staff_details(id_token)
+
+    if not requester_data:
+      return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Invalid credentials"})
+
+    if requester_data["role"] != "manager":
+      return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"message": "Only Managers can add staff."})
+
+    if csv_file is not None:
+      try:
+        contents = await read_upload(csv_file, MAX_STAFF_CSV_BYTES)
+      except UploadTooLargeError:
+        return JSONResponse(
+          status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+          content={"message": upload_too_large_message(MAX_STAFF_CSV_BYTES)}
+        )
+      emails, invalid = _parse_staff_csv(contents.decode("utf-8-sig", errors="replace"))
+    else:
+      emails, invalid = list(staff_data.emails), []
+
+    if not emails and not invalid:
+      return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content={"message": "No emails provided."})
+
+    if len(emails) + len(invalid) > MAX_BULK_STAFF:
+      return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"message": f"Too many emails. Max {MAX_BULK_STAFF} per request."}
+      )
+
+    return await _bulk_add_staff(requester_data, emails, invalid)
+
+  except Exception as e:
+    return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"message": str(e)})
+
 async def get_my_staff_profile(id_token:str):
   staff_data, uid = await get_staff_details(id_token)
 
@@ -178,7 +355,7 @@ async def get_staff_me(id_token: str):
     if stall_doc.exists:
       stall_name = stall_doc.to_dict().get("name", "Unknown Stall")
   except Exception as e:
-    print(f"Error fetching stall name: {e}")
+    logger.exception("Error fetching stall name", extra={"stall_id": staff_data.get("stall_id")})
 
   return JSONResponse(
     status_code=status.HTTP_200_OK,
@@ -288,18 +465,43 @@ async def upload_menu(menu_data: MenuSchema, id_token: str):
 
     menu_items_ref = stall_ref.collection("menu_items")
 
-    batch = db.batch()
-
-    for item in menu_data.items:
-      item_ref = menu_items_ref.document()
-      batch.set(item_ref, {
-        **item.model_dump(),
-        "created_at": firestore.SERVER_TIMESTAMP,
-        "updated_at": firestore.SERVER_TIMESTAMP
-      })
-
-    batch.set(
-      stall_ref,
+    existing_refs = {}
+    items = menu_data.items
+    if menu_data.upsert:
+      for doc in menu_items_ref.select(["name"]).stream():
+        existing_refs.setdefault(normalize_item_name(doc.to_dict().get("name")), doc.reference)
+
+      # Within one upload the last occurrence of a name wins.
+      items = list({normalize_item_name(item.name): item for item in items}.values())
+
+    ops = []
+    items_added = 0
+    items_updated = 0
+    for item in items:
+      item_ref = existing_refs.get(normalize_item_name(item.name))
+      if item_ref is not None:
+        # Only what the upload actually carries: a re-scan has no description
+        # or image_ref worth keeping over curated ones, and sold-out flags
+        # are the stall's call, not the scan's.
+        ops.append(("set", item_ref, {
+          **item.model_dump(exclude_unset=True, exclude_none=True, exclude={"is_available"}),
+          "updated_at": firestore.SERVER_TIMESTAMP
+        }, True))
+        items_updated += 1
+      else:
+        ops.append(("set", menu_items_ref.document(), {
+          **item.model_dump(),
+          "created_at": firestore.SERVER_TIMESTAMP,
+          "updated_at": firestore.SERVER_TIMESTAMP
+        }))
+        items_added += 1
+
+    failed_writes = 0
+    for chunk, error in await commit_in_batches_concurrently(ops):
+      if error is not None:
+        failed_writes += len(chunk)
+
+    stall_ref.set(
       {
         "last_updated_by": staff_uid,
         "last_updated_at": firestore.SERVER_TIMESTAMP
@@ -307,14 +509,22 @@ async def upload_menu(menu_data: MenuSchema, id_token: str):
       merge=True
     )
 
-    batch.commit()
+    if failed_writes:
+      return JSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={
+          "message": f"{failed_writes} of {len(ops)} menu items could not be saved. Retry with upsert enabled to avoid duplicates.",
+          "stall_id": staff_stall_id
+        }
+      )
 
     return JSONResponse(
       status_code=status.HTTP_201_CREATED,
       content={
         "message": "Menu uploaded successfully",
         "stall_id": staff_stall_id,
-        "items_added": len(menu_data.items)
+        "items_added": items_added,
+        "items_updated": items_updated
       }
     )
 
@@ -442,6 +652,93 @@ async def update_menu_item(
       content={"message": str(e)}
     )
 
+async def bulk_update_menu_items(update_data: BulkUpdateMenuItemsSchema, id_token: str):
+  try:
+    staff_data, staff_uid = await get_staff_details(id_token)
+
+    if not staff_data:
+      return JSONResponse(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        content={"message": "Invalid or expired token."}
+      )
+
+    staff_college_id = staff_data.get("college_id")
+    staff_stall_id = staff_data.get("stall_id")
+
+    stall_ref = (
+      db.collection("colleges")
+      .document(staff_college_id)
+      .collection("stalls")
+      .document(staff_stall_id)
+    )
+    menu_items_ref = stall_ref.collection("menu_items")
+
+    updates_by_id = {}
+    for item in update_data.items:
+      updates = {
+        key: value
+        for key, value in item.model_dump(exclude={"item_id"}).items()
+        if value is not None
+      }
+      updates_by_id.setdefault(item.item_id, {}).update(updates)
+
+    item_ids = list(updates_by_id)
+    refs = [menu_items_ref.document(item_id) for item_id in item_ids]
+    snapshots = {doc.id: doc for doc in db.get_all(refs)}
+
+    results = {}
+    ops = []
+    for item_id, item_ref in zip(item_ids, refs):
+      doc = snapshots.get(item_id)
+      updates = updates_by_id[item_id]
+
+      if doc is None or not doc.exists:
+        results[item_id] = {"item_id": item_id, "updated": False, "message": "Menu item not found."}
+        continue
+
+      if not updates:
+        results[item_id] = {"item_id": item_id, "updated": False, "message": "No valid fields provided for update."}
+        continue
+
+      updates["updated_at"] = firestore.SERVER_TIMESTAMP
+      ops.append(("update", item_ref, updates))
+
+    for chunk, error in commit_in_batches(ops):
+      for op in chunk:
+        item_id = op[1].id
+        if error is None:
+          results[item_id] = {"item_id": item_id, "updated": True, "message": "Menu item updated successfully"}
+        else:
+          results[item_id] = {"item_id": item_id, "updated": False, "message": str(error)}
+
+    ordered_results = [results[item_id] for item_id in item_ids]
+    updated_count = sum(1 for r in ordered_results if r["updated"])
+
+    if updated_count:
+      stall_ref.set(
+        {
+          "last_updated_by": staff_uid,
+          "last_updated_at": firestore.SERVER_TIMESTAMP
+        },
+        merge=True
+      )
+
+    return JSONResponse(
+      status_code=status.HTTP_200_OK,
+      content={
+        "stall_id": staff_stall_id,
+        "updated": updated_count,
+        "failed": len(ordered_results) - updated_count,
+        "results": ordered_results
+      }
+    )
+
+  except Exception as e:
+    return JSONResponse(
+      status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+      content={"message": str(e)}
+    )
+
 async def delete_menu_item(item_id: str, id_token: str):
   try:
     staff_data, staff_uid = await get_staff_details(id_token)
@@ -486,13 +783,7 @@ async def delete_menu_item(item_id: str, id_token: str):
       content={"message": str(e)}
     )
 
-def _extract_menu_from_image(image_bytes: bytes, mime_type: str) -> list:
-  if not os.environ.get("GEMINI_API_KEY"):
-    raise Exception("GEMINI_API_KEY is missing from environment variables!")
-
-  model = genai.GenerativeModel('gemini-2.5-flash')
-
-  prompt = """
+MENU_EXTRACTION_PROMPT = """
 You are an API that extracts food menu information from images.
 
 Rules:
@@ -518,15 +809,27 @@ Output format:
 ]
 """
 
-  response = model.generate_content([
-    prompt,
-    {
-      "mime_type": mime_type,
-      "data": image_bytes
-    }
-  ])
+def _get_menu_model():
+  if not os.environ.get("GEMINI_API_KEY"):
+    raise Exception("GEMINI_API_KEY is missing from environment variables!")
+
+  return genai.GenerativeModel('gemini-2.5-flash')
+
+def _extract_menu_from_image(image_bytes: bytes, mime_type: str) -> list:
+  model = _get_menu_model()
+
+  with gemini_breaker.guard():
+    response = model.generate_content([
+      MENU_EXTRACTION_PROMPT,
+      {
+        "mime_type": mime_type,
+        "data": image_bytes
+      }
+    ], request_options={"timeout": GEMINI_TIMEOUT_SECONDS})
 
+  # Outside the guard: .text raises ValueError for blocked or empty output.
   cleaned_text = response.text.strip()
+
   if cleaned_text.startswith("```json"):
     cleaned_text = cleaned_text[7:]
   if cleaned_text.endswith("```"):
@@ -535,7 +838,93 @@ Output format:
   raw_items = json.loads(cleaned_text)
   return validate_extracted_items(raw_items)
 
-async def scan_menu_image(file: UploadFile, id_token: str):
+def _stream_gemini_text(model, image_bytes: bytes, mime_type: str):
+  # Yields the response text chunk by chunk. Only the Gemini call and the
+  # wait for chunks run under the breaker; parsing happens in the caller,
+  # and a caller that stops early closes this generator without a verdict.
+  with gemini_breaker.guard():
+    response = model.generate_content([
+      MENU_EXTRACTION_PROMPT,
+      {
+        "mime_type": mime_type,
+        "data": image_bytes
+      }
+    ], stream=True, request_options={"timeout": GEMINI_TIMEOUT_SECONDS})
+
+    for chunk in response:
+      try:
+        text = chunk.text
+      except ValueError:
+        # Chunks without text parts (e.g. only safety metadata).
+        continue
+      yield text or ""
+
+def _stream_menu_from_image(image_bytes: bytes, mime_type: str, model=None):
+  # Yields validated items while the model is still generating. Any object
+  # whose generate_content(contents, stream=True, **kwargs) returns chunks
+  # carrying `.text` works as `model`, which is how a fake stream plugs in.
+  model = model or _get_menu_model()
+
+  parser = IncrementalJSONArrayParser()
+  for text in _stream_gemini_text(model, image_bytes, mime_type):
+    for raw_item in parser.feed(text):
+      yield from validate_extracted_items([raw_item])
+
+def _scan_menu_bytes(image_bytes: bytes, mime_type: str):
+  # Returns (items, cached). Repeat scans of the same (or, in near-duplicate
+  # mode, visually identical) photo are served from the scan cache.
+  key = scan_cache_key(image_bytes)
+
+  cached_items = get_cached_scan(key)
+  if cached_items is not None:
+    items = validate_extracted_items(cached_items)
+    if items:
+      return items, True
+
+  model_bytes, model_mime_type = preprocess_in_worker(image_bytes, mime_type)
+  items = _extract_menu_from_image(model_bytes, model_mime_type)
+  store_scan(key, items)
+  return items, False
+
+async def _scan_page(image_bytes: bytes, mime_type: str):
+  async with _scan_semaphore:
+    return await asyncio.to_thread(_scan_menu_bytes, image_bytes, mime_type)
+
+def merge_scanned_items(pages: list):
+  # Merges items from several menu pages by normalized name, keeping
+  # first-seen order. Conflicting prices resolve to the most common one
+  # (earliest page wins ties); returns (items, conflicting_item_count).
+  merged = {}
+  prices = {}
+
+  for page_items in pages:
+    for item in page_items:
+      key = normalize_item_name(item["name"])
+      if not key:
+        continue
+
+      if key not in merged:
+        merged[key] = dict(item)
+        prices[key] = []
+      elif len(item.get("description") or "") > len(merged[key].get("description") or ""):
+        merged[key]["description"] = item["description"]
+
+      if item.get("price") is not None:
+        prices[key].append(item["price"])
+
+  conflicts = 0
+  for key, item in merged.items():
+    seen = prices[key]
+    if not seen:
+      continue
+    if len(set(seen)) > 1:
+      conflicts += 1
+    counts = Counter(seen)
+    item["price"] = max(seen, key=lambda p: (counts[p], -seen.index(p)))
+
+  return list(merged.values()), conflicts
+
+async def scan_menu_images(files: list, id_token: str):
   try:
     staff_data, staff_uid = await get_staff_details(id_token)
 
@@ -545,20 +934,195 @@ async def scan_menu_image(file: UploadFile, id_token: str):
         content={"message": "Invalid or expired token."}
       )
 
-    if file.content_type not in ["image/jpeg", "image/png"]:
+    if not files:
+      return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"message": "Upload at least one menu page."}
+      )
+
+    if len(files) > MAX_SCAN_PAGES:
+      return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"message": f"Too many pages. Max {MAX_SCAN_PAGES}."}
+      )
+
+    uploads = []
+    for page_number, file in enumerate(files, start=1):
+      try:
+        uploads.append(await read_image_upload(file))
+      except UnsupportedImageTypeError:
+        return JSONResponse(
+          status_code=status.HTTP_400_BAD_REQUEST,
+          content={"message": f"Page {page_number}: Invalid file type. Only JPEG and PNG allowed."}
+        )
+      except UploadTooLargeError:
+        return JSONResponse(
+          status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+          content={"message": f"Page {page_number}: {upload_too_large_message()}"}
+        )
+
+    results = await asyncio.gather(
+      *(_scan_page(contents, mime_type) for contents, mime_type in uploads),
+      return_exceptions=True
+    )
+
+    pages = []
+    failed_pages = []
+    for page_number, result in enumerate(results, start=1):
+      if isinstance(result, Exception):
+        failed_pages.append(page_number)
+      else:
+        pages.append(result[0])
+
+    extracted_items, conflicts = merge_scanned_items(pages)
+
+    if not extracted_items:
+      if failed_pages and len(failed_pages) == len(results):
+        if isinstance(results[0], CircuitOpenError):
+          raise results[0]
+        return JSONResponse(
+          status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+          content={"message": f"Internal Server Error: {results[0]}"}
+        )
+      return JSONResponse(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={"message": "Could not extract menu items. Images might be unclear."}
+      )
+
+    message = f"Scan of {len(uploads)} pages complete. Please verify items."
+    if conflicts:
+      message += f" {conflicts} items had different prices on different pages."
+    if failed_pages:
+      message += f" Pages {', '.join(map(str, failed_pages))} could not be scanned."
+
+    return JSONResponse(
+      status_code=status.HTTP_200_OK,
+      content={
+        "message": message,
+        "detected_items": extracted_items,
+        "count": len(extracted_items),
+        "cached": all(result[1] for result in results if not isinstance(result, Exception))
+      }
+    )
+
+  except CircuitOpenError as e:
+    return circuit_open_response(e, SCAN_UNAVAILABLE_MESSAGE)
+  except Exception as e:
+    return JSONResponse(
+      status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+      content={"message": f"Internal Server Error: {str(e)}"}
+    )
+
+def _format_scan_event(event: dict, stream_format: str) -> str:
+  if stream_format == "sse":
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+  return json.dumps(event) + "\n"
+
+async def _scan_event_stream(image_bytes: bytes, mime_type: str, stream_format: str, model=None):
+  # Hashing the image and the cache lookup/store are blocking, so they run
+  # in threads like in _scan_menu_bytes.
+  key = await asyncio.to_thread(scan_cache_key, image_bytes)
+  cached_items = await asyncio.to_thread(get_cached_scan, key)
+  cached_items = validate_extracted_items(cached_items) if cached_items is not None else []
+
+  if cached_items:
+    for item in cached_items:
+      yield _format_scan_event({"type": "item", "item": item}, stream_format)
+    yield _format_scan_event({"type": "done", "count": len(cached_items), "cached": True}, stream_format)
+    return
+
+  items = []
+  try:
+    async with _scan_semaphore:
+      model_bytes, model_mime_type = await asyncio.to_thread(preprocess_in_worker, image_bytes, mime_type)
+      stream = _stream_menu_from_image(model_bytes, model_mime_type, model)
+      async for item in iterate_in_threadpool(stream):
+        items.append(item)
+        yield _format_scan_event({"type": "item", "item": item}, stream_format)
+  except CircuitOpenError as e:
+    yield _format_scan_event({"type": "error", "message": SCAN_UNAVAILABLE_MESSAGE, "retry_after": e.retry_after}, stream_format)
+    return
+  except Exception as e:
+    yield _format_scan_event({"type": "error", "message": f"Internal Server Error: {str(e)}"}, stream_format)
+    return
+
+  await asyncio.to_thread(store_scan, key, items)
+
+  if not items:
+    yield _format_scan_event({"type": "error", "message": "Could not extract menu items. Image might be unclear."}, stream_format)
+    return
+
+  yield _format_scan_event({"type": "done", "count": len(items), "cached": False}, stream_format)
+
+async def stream_scan_menu_image(file: UploadFile, id_token: str, stream_format: str = "ndjson", model=None):
+  # model replaces Gemini for this request (see _stream_menu_from_image);
+  # benchmarks/scan_stream.py drives the endpoint with a fake one.
+  try:
+    staff_data, staff_uid = await get_staff_details(id_token)
+
+    if not staff_data:
+      return JSONResponse(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        content={"message": "Invalid or expired token."}
+      )
+
+    if stream_format not in ["ndjson", "sse"]:
+      return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"message": "Invalid format. Use ndjson or sse."}
+      )
+
+    try:
+      contents, mime_type = await read_image_upload(file)
+    except UnsupportedImageTypeError:
       return JSONResponse(
         status_code=status.HTTP_400_BAD_REQUEST,
         content={"message": "Invalid file type. Only JPEG and PNG allowed."}
       )
+    except UploadTooLargeError:
+      return JSONResponse(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        content={"message": upload_too_large_message()}
+      )
+
+    return StreamingResponse(
+      _scan_event_stream(contents, mime_type, stream_format, model),
+      media_type="text/event-stream" if stream_format == "sse" else "application/x-ndjson",
+      headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+  except CircuitOpenError as e:
+    return circuit_open_response(e, SCAN_UNAVAILABLE_MESSAGE)
+  except Exception as e:
+    return JSONResponse(
+      status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+      content={"message": f"Internal Server Error: {str(e)}"}
+    )
+
+async def scan_menu_image(file: UploadFile, id_token: str):
+  try:
+    staff_data, staff_uid = await get_staff_details(id_token)
+
+    if not staff_data:
+      return JSONResponse(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        content={"message": "Invalid or expired token."}
+      )
 
-    contents = await file.read()
-    if len(contents) > 5 * 1024 * 1024:
+    try:
+      contents, mime_type = await read_image_upload(file)
+    except UnsupportedImageTypeError:
+      return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"message": "Invalid file type. Only JPEG and PNG allowed."}
+      )
+    except UploadTooLargeError:
       return JSONResponse(
         status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-        content={"message": "File too large. Max 5MB."}
+        content={"message": upload_too_large_message()}
       )
 
-    extracted_items = _extract_menu_from_image(contents, file.content_type)
+    extracted_items, cached = await _scan_page(contents, mime_type)
 
     if not extracted_items:
       return JSONResponse(
@@ -571,10 +1135,13 @@ async def scan_menu_image(file: UploadFile, id_token: str):
       content={
         "message": "Scan complete. Please verify items.",
         "detected_items": extracted_items,
-        "count": len(extracted_items)
+        "count": len(extracted_items),
+        "cached": cached
       }
     )
 
+  except CircuitOpenError as e:
+    return circuit_open_response(e, SCAN_UNAVAILABLE_MESSAGE)
   except Exception as e:
     return JSONResponse(
       status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -593,14 +1160,13 @@ async def get_stall_orders(id_token: str, status_filter: str = "PAID"):
 
     stall_id = staff_data.get("stall_id")
 
-    orders_ref = (
-      db.collection("orders")
+    docs = stream_orders([
+      orders
       .where("stall_id", "==", stall_id)
       .where("status", "==", status_filter)
       .order_by("created_at", direction=firestore.Query.DESCENDING)
-    )
-
-    docs = orders_ref.stream()
+      for orders in order_collections(staff_data.get("college_id"))
+    ])
 
     orders_list = []
     for doc in docs:
@@ -626,6 +1192,32 @@ async def get_stall_orders(id_token: str, status_filter: str = "PAID"):
       content={"message": str(e)}
     )
 
+async def get_stall_prep_queue(id_token: str):
+  try:
+    staff_data, _ = await get_staff_details(id_token)
+
+    if not staff_data:
+      return JSONResponse(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        content={"message": "Invalid or expired token."}
+      )
+
+    queue = get_prep_queue(staff_data.get("college_id"), staff_data.get("stall_id"))
+
+    if not await asyncio.to_thread(queue.wait_ready, PREP_QUEUE_READY_TIMEOUT):
+      return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"message": "Prep queue is still loading. Try again shortly."}
+      )
+
+    return JSONResponse(status_code=status.HTTP_200_OK, content=queue.snapshot())
+
+  except Exception as e:
+    return JSONResponse(
+      status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+      content={"message": str(e)}
+    )
+
 async def update_order_status_staff(order_id: str, status_data: UpdateOrderStatusSchema, id_token: str):
   try:
     staff_data, _ = await get_staff_details(id_token)
@@ -634,12 +1226,12 @@ async def update_order_status_staff(order_id: str, status_data: UpdateOrderStatu
 
     stall_id = staff_data.get("stall_id")
 
-    order_ref = db.collection("orders").document(order_id)
-    order_doc = order_ref.get()
+    order_doc = find_order(order_id, staff_data.get("college_id"))
 
-    if not order_doc.exists:
+    if order_doc is None:
       return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": "Order not found"})
 
+    order_ref = order_doc.reference
     order_data = order_doc.to_dict()
 
     if order_data.get("stall_id") != stall_id:
@@ -659,18 +1251,72 @@ async def update_order_status_staff(order_id: str, status_data: UpdateOrderStatu
   except Exception as e:
     return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"message": str(e)})
 
+async def bulk_update_order_status_staff(status_data: BulkUpdateOrderStatusSchema, id_token: str):
+  try:
+    staff_data, _ = await get_staff_details(id_token)
+    if not staff_data:
+      return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized"})
+
+    stall_id = staff_data.get("stall_id")
+    order_ids = list(dict.fromkeys(status_data.order_ids))
+
+    snapshots = get_orders(order_ids, staff_data.get("college_id"))
+
+    results = {}
+    ops = []
+    for order_id in order_ids:
+      doc = snapshots.get(order_id)
+
+      if doc is None:
+        results[order_id] = {"order_id": order_id, "updated": False, "message": "Order not found"}
+        continue
+
+      if doc.to_dict().get("stall_id") != stall_id:
+        results[order_id] = {"order_id": order_id, "updated": False, "message": "You cannot update orders from other stalls."}
+        continue
+
+      ops.append(("update", doc.reference, {
+        "status": status_data.status,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+        "updated_by": staff_data.get("email")
+      }))
+
+    for chunk, error in commit_in_batches(ops):
+      for op in chunk:
+        order_id = op[1].id
+        if error is None:
+          results[order_id] = {"order_id": order_id, "updated": True, "message": f"Order status updated to {status_data.status}"}
+        else:
+          results[order_id] = {"order_id": order_id, "updated": False, "message": str(error)}
+
+    ordered_results = [results[order_id] for order_id in order_ids]
+    updated_count = sum(1 for r in ordered_results if r["updated"])
+
+    return JSONResponse(
+      status_code=status.HTTP_200_OK,
+      content={
+        "status": status_data.status,
+        "updated": updated_count,
+        "failed": len(ordered_results) - updated_count,
+        "results": ordered_results
+      }
+    )
+
+  except Exception as e:
+    return JSONResponse(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, content={"message": str(e)})
+
 async def verify_order_pickup(verify_data: VerifyPickupSchema, id_token: str):
   try:
     staff_data, _ = await get_staff_details(id_token)
     if not staff_data:
       return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": "Unauthorized"})
 
-    order_ref = db.collection("orders").document(verify_data.order_id)
-    order_doc = order_ref.get()
+    order_doc = find_order(verify_data.order_id, staff_data.get("college_id"))
 
-    if not order_doc.exists:
+    if order_doc is None:
       return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": "Order not found"})
 
+    order_ref = order_doc.reference
     data = order_doc.to_dict()
 
     if data.get("stall_id") != staff_data.get("stall_id"):
@@ -761,6 +1407,7 @@ async def update_resale_price(resale_id: str, new_price: float, id_token: str):
         "discounted_price": new_price,
         "updated_at": firestore.SERVER_TIMESTAMP
     })
+    invalidate_feed(data.get("college_id"))
 
     return JSONResponse(status_code=200, content={"message": "Price updated successfully"})
 
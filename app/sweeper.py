@@ -0,0 +1,121 @@
+# app/sweeper.py
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from .firebase_init import db, firestore
+from .firestore_batch import commit_in_batches
+from .orders_store import all_orders
+
+logger = logging.getLogger(__name__)
+
+SWEEPER_ENABLED = os.environ.get("SWEEPER_ENABLED", "true").lower() == "true"
+SWEEPER_INTERVAL_SECONDS = float(os.environ.get("SWEEPER_INTERVAL_SECONDS", "60"))
+SWEEPER_BATCH_SIZE = int(os.environ.get("SWEEPER_BATCH_SIZE", "500"))
+PENDING_ORDER_TTL_SECONDS = int(os.environ.get("PENDING_ORDER_TTL_SECONDS", "1800"))
+RESALE_RESERVATION_SECONDS = int(os.environ.get("RESALE_RESERVATION_SECONDS", "300"))
+
+
+def _sweep(query, update: dict) -> int:
+  # Applies `update` to every document matching `query`, one page at a time.
+  # Each write is conditioned on the document being unchanged since it was
+  # read, so a payment that lands mid-sweep is never overwritten.
+  swept = 0
+  while True:
+    docs = list(query.limit(SWEEPER_BATCH_SIZE).stream())
+    if not docs:
+      break
+
+    ops = [
+      ("update", doc.reference, update, db.write_option(last_update_time=doc.update_time))
+      for doc in docs
+    ]
+    results = commit_in_batches(ops)
+    swept += sum(len(chunk) for chunk, error in results if error is None)
+
+    # A failed chunk would be read again straight away; leave it to the next run.
+    if any(error is not None for _, error in results) or len(docs) < SWEEPER_BATCH_SIZE:
+      break
+
+  return swept
+
+
+def expire_stale_orders(now: datetime) -> int:
+  # Checkouts that never completed. A late payment still marks the order
+  # PAID through the webhook.
+  cutoff = now - timedelta(seconds=PENDING_ORDER_TTL_SECONDS)
+  query = (
+    all_orders()
+    .where("status", "==", "PENDING")
+    .where("created_at", "<", cutoff)
+  )
+  return _sweep(query, {
+    "status": "EXPIRED",
+    "expired_at": firestore.SERVER_TIMESTAMP,
+    "updated_at": firestore.SERVER_TIMESTAMP
+  })
+
+
+def release_stale_reservations(now: datetime) -> int:
+  cutoff = now - timedelta(seconds=RESALE_RESERVATION_SECONDS)
+  query = (
+    db.collection("resale_items")
+    .where("status", "==", "RESERVED")
+    .where("reserved_at", "<", cutoff)
+  )
+  return _sweep(query, {
+    "status": "AVAILABLE",
+    "reserved_by": firestore.DELETE_FIELD,
+    "reserved_at": firestore.DELETE_FIELD
+  })
+
+
+def backfill_reservation_expiry() -> int:
+  # One-off for resale items created before reservation_expires_at existed;
+  # the discounted feed only matches items that have the field.
+  ops = []
+  docs = (
+    db.collection("resale_items")
+    .where("status", "in", ["AVAILABLE", "RESERVED"])
+    .select(["created_at", "reserved_at", "reservation_expires_at"])
+    .stream()
+  )
+  for doc in docs:
+    data = doc.to_dict()
+    if data.get("reservation_expires_at"):
+      continue
+    if data.get("reserved_at"):
+      expires_at = data["reserved_at"] + timedelta(seconds=RESALE_RESERVATION_SECONDS)
+    else:
+      expires_at = data.get("created_at") or datetime.now(timezone.utc)
+    ops.append(("update", doc.reference, {"reservation_expires_at": expires_at}))
+
+  return sum(len(chunk) for chunk, error in commit_in_batches(ops) if error is None)
+
+
+def run_sweep() -> dict:
+  now = datetime.now(timezone.utc)
+  return {
+    "expired_orders": expire_stale_orders(now),
+    "released_reservations": release_stale_reservations(now)
+  }
+
+
+async def run_sweeper():
+  while True:
+    try:
+      await asyncio.to_thread(run_sweep)
+    except Exception:
+      logger.exception("Sweeper run failed")
+
+    await asyncio.sleep(SWEEPER_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+  import sys
+
+  if "--backfill-reservations" in sys.argv:
+    print(f"Backfilled {backfill_reservation_expiry()} resale items")
+  else:
+    print(run_sweep())
@@ -0,0 +1,154 @@
+# app/uploads.py
+
+import os
+import json
+from fastapi import UploadFile
+
+MAX_SCAN_UPLOAD_BYTES = int(os.environ.get("MAX_SCAN_UPLOAD_BYTES", str(5 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Room for multipart boundaries and part headers on top of the file itself.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+_IMAGE_SIGNATURES = (
+  (b"\xff\xd8\xff", "image/jpeg"),
+  (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+
+
+class UploadTooLargeError(Exception):
+  pass
+
+
+class UnsupportedImageTypeError(Exception):
+  pass
+
+
+def sniff_image_mime(head: bytes):
+  for signature, mime_type in _IMAGE_SIGNATURES:
+    if head.startswith(signature):
+      return mime_type
+  return None
+
+
+def upload_too_large_message(max_bytes: int = MAX_SCAN_UPLOAD_BYTES) -> str:
+  return f"File too large. Max {round(max_bytes / (1024 * 1024), 2):g}MB."
+
+
+async def read_upload(file: UploadFile, max_bytes: int) -> bytes:
+  # Like read_image_upload, without the type check.
+  total = 0
+  chunks = []
+  while True:
+    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    if not chunk:
+      break
+    total += len(chunk)
+    if total > max_bytes:
+      raise UploadTooLargeError()
+    chunks.append(chunk)
+  return b"".join(chunks)
+
+
+async def read_image_upload(file: UploadFile, max_bytes: int = MAX_SCAN_UPLOAD_BYTES):
+  # Reads the upload (already spooled by Starlette) chunk by chunk, rejecting
+  # it as soon as the running size crosses max_bytes or the first bytes are
+  # not a JPEG/PNG signature. Returns (contents, sniffed_mime_type).
+  mime_type = None
+  total = 0
+  chunks = []
+
+  while True:
+    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    if not chunk:
+      break
+
+    if mime_type is None:
+      mime_type = sniff_image_mime(chunk)
+      if mime_type is None:
+        raise UnsupportedImageTypeError()
+
+    total += len(chunk)
+    if total > max_bytes:
+      raise UploadTooLargeError()
+
+    chunks.append(chunk)
+
+  if mime_type is None:
+    raise UnsupportedImageTypeError()
+
+  return b"".join(chunks), mime_type
+
+
+class _BodyLimitExceeded(Exception):
+  pass
+
+
+class UploadSizeLimitMiddleware:
+  # Aborts oversized request bodies on upload routes before they are parsed
+  # and spooled: Content-Length is checked up front, and chunked bodies are
+  # counted as they arrive and cut off once the limit is crossed.
+
+  def __init__(self, app, limits: dict):
+    self.app = app
+    self.limits = limits
+
+  async def _reject(self, send, limit: int):
+    body = json.dumps({"message": upload_too_large_message(limit)}).encode()
+    await send({
+      "type": "http.response.start",
+      "status": 413,
+      "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"connection", b"close"),
+      ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http" or scope.get("method") != "POST":
+      return await self.app(scope, receive, send)
+
+    file_limit = self.limits.get(scope.get("path"))
+    if file_limit is None:
+      return await self.app(scope, receive, send)
+
+    body_limit = file_limit + MULTIPART_OVERHEAD_BYTES
+
+    for name, value in scope.get("headers", []):
+      if name == b"content-length":
+        try:
+          if int(value) > body_limit:
+            return await self._reject(send, file_limit)
+        except ValueError:
+          pass
+
+    state = {"received": 0, "exceeded": False, "started": False}
+
+    async def limited_receive():
+      message = await receive()
+      if message["type"] == "http.request":
+        state["received"] += len(message.get("body", b""))
+        if state["received"] > body_limit:
+          state["exceeded"] = True
+          raise _BodyLimitExceeded()
+      return message
+
+    async def guarded_send(message):
+      # The app may turn the aborted body read into its own error response;
+      # replace it with the 413.
+      if state["exceeded"]:
+        if message["type"] == "http.response.start" and not state["started"]:
+          state["started"] = True
+          await self._reject(send, file_limit)
+        return
+      if message["type"] == "http.response.start":
+        state["started"] = True
+      await send(message)
+
+    try:
+      await self.app(scope, limited_receive, guarded_send)
+    except _BodyLimitExceeded:
+      if not state["started"]:
+        await self._reject(send, file_limit)
@@ -1,40 +1,61 @@
 #app/user.py
 
 import os
+import logging
 import secrets
 import razorpay
+from razorpay.errors import BadRequestError
 from fastapi.responses import JSONResponse
 from starlette import status
 from firebase_admin import auth
 from .firebase_init import db, firestore
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from .schema import CreateOrderSchema, UpdateUserProfileSchema, VerifyPaymentSchema
-
-razorpay_client = razorpay.Client(auth=(
-    os.environ.get("RAZORPAY_KEY_ID"),
-    os.environ.get("RAZORPAY_KEY_SECRET")
-))
+from .circuit_breaker import get_breaker, circuit_open_response, CircuitOpenError
+from .http_client import get_session
+from .idempotency import run_idempotent
+from .sweeper import RESALE_RESERVATION_SECONDS
+from .archive import get_archived_user_orders
+from .orders_store import new_order_ref, order_collections, stream_orders, find_order
+from .resale_feed import get_feed_page, invalidate_feed, InvalidFeedCursorError, FEED_PAGE_SIZE
+from .logging_config import bind_log_context
+from .serialization import serialize_firestore_data
+
+logger = logging.getLogger(__name__)
+
+# RAZORPAY_BASE_URL points the client at a stand-in, e.g. the load test's
+# fake Razorpay (benchmarks/loadtest).
+razorpay_client = razorpay.Client(
+    session=get_session("razorpay", pool_size=int(os.environ.get("RAZORPAY_POOL_SIZE", "20"))),
+    auth=(
+        os.environ.get("RAZORPAY_KEY_ID"),
+        os.environ.get("RAZORPAY_KEY_SECRET")
+    ),
+    base_url=os.environ.get("RAZORPAY_BASE_URL", "https://api.razorpay.com")
+)
+
+# Rejected payloads (BadRequestError) are our fault, not an outage.
+razorpay_breaker = get_breaker("razorpay", ignore_exceptions=(BadRequestError,))
+
+PAYMENTS_UNAVAILABLE_MESSAGE = "Payments are temporarily unavailable. Please try again shortly."
 
 async def get_user_details(id_token: str):
   try:
     decoded_token = auth.verify_id_token(id_token)
     uid = decoded_token["uid"]
+    bind_log_context(user_id=uid)
 
     user_doc = db.collection("users").document(uid).get()
     if user_doc.exists:
-      return user_doc.to_dict(), uid
+      data = user_doc.to_dict()
+      bind_log_context(college_id=data.get("college_id"))
+      return data, uid
 
     return None, None
 
   except Exception:
     return None, None
 
-def serialize_firestore_data(data: dict):
-    for k, v in data.items():
-        if isinstance(v, datetime):
-            data[k] = v.isoformat()
-    return data
-
 async def update_user_profile(profile_data: UpdateUserProfileSchema, id_token: str):
   try:
     user_data, user_uid = await get_user_details(id_token)
@@ -89,10 +110,10 @@ async def verify_payment_and_update_order(payment_data: VerifyPaymentSchema, id_
 
         internal_order_id = payment_data.internal_order_id
 
-        order_ref = db.collection("orders").document(internal_order_id)
-        order_doc = order_ref.get()
+        user_data, _ = await get_user_details(id_token)
+        order_doc = find_order(internal_order_id, user_data.get("college_id") if user_data else None)
 
-        if not order_doc.exists:
+        if order_doc is None:
             return JSONResponse(
                 status_code=400,
                 content={"message": "Order not found"}
@@ -108,7 +129,7 @@ async def verify_payment_and_update_order(payment_data: VerifyPaymentSchema, id_
 
         pickup_code = str(1000 + secrets.randbelow(9000))
 
-        order_ref.update({
+        order_doc.reference.update({
             "razorpay_payment_id": payment_data.razorpay_payment_id,
             "status": "PAID",
           "pickup_code": pickup_code,
@@ -194,7 +215,7 @@ async def get_user_menu(id_token: str):
             content={"message": str(e)}
         )
 
-async def create_payment_order(order_data: CreateOrderSchema, id_token: str):
+async def create_payment_order(order_data: CreateOrderSchema, id_token: str, idempotency_key: str = None):
   try:
     user_data, user_uid = await get_user_details(id_token)
     if not user_data:
@@ -203,6 +224,21 @@ async def create_payment_order(order_data: CreateOrderSchema, id_token: str):
         content={"message": "Invalid or expired token."}
       )
 
+    return await run_idempotent(
+      user_uid, "order.create", idempotency_key, order_data.model_dump(),
+      lambda: _create_payment_order(order_data, user_data, user_uid)
+    )
+
+  except Exception as e:
+    return JSONResponse(
+      status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+      content={"message": f"Payment Error: {str(e)}"}
+    )
+
+async def _create_payment_order(order_data: CreateOrderSchema, user_data: dict, user_uid: str):
+  try:
+    razorpay_breaker.ensure_available()
+
     college_id = user_data.get("college_id")
     stall_id = order_data.stall_id
 
@@ -260,10 +296,11 @@ async def create_payment_order(order_data: CreateOrderSchema, id_token: str):
       "phone": user_data.get("phone", "")
     }
 
-    new_order_ref = db.collection('orders').document()
-    internal_order_id = new_order_ref.id
+    order_ref = new_order_ref(college_id)
+    internal_order_id = order_ref.id
 
     firestore_order_data = {
+      "order_id": internal_order_id,
       "user_id": user_uid,
       "user_details": user_snapshot,
       "stall_id": stall_id,
@@ -284,7 +321,7 @@ async def create_payment_order(order_data: CreateOrderSchema, id_token: str):
       "updated_at": firestore.SERVER_TIMESTAMP
     }
 
-    new_order_ref.set(firestore_order_data)
+    order_ref.set(firestore_order_data)
 
     data = {
       "amount": int(total_amount * 100),
@@ -298,9 +335,9 @@ async def create_payment_order(order_data: CreateOrderSchema, id_token: str):
       }
     }
 
-    order = razorpay_client.order.create(data=data)
+    order = razorpay_breaker.call(razorpay_client.order.create, data=data)
 
-    new_order_ref.update({"razorpay_order_id": order['id']})
+    order_ref.update({"razorpay_order_id": order['id']})
 
     return JSONResponse(
       status_code=status.HTTP_200_OK,
@@ -314,13 +351,33 @@ async def create_payment_order(order_data: CreateOrderSchema, id_token: str):
       }
     )
 
+  except CircuitOpenError as e:
+    return circuit_open_response(e, PAYMENTS_UNAVAILABLE_MESSAGE)
   except Exception as e:
     return JSONResponse(
       status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
       content={"message": f"Payment Error: {str(e)}"}
     )
 
-async def get_user_orders(id_token: str):
+def format_user_order(order_id: str, data: dict):
+  visible_code = data.get("pickup_code") if data.get("status") in ["PAID", "READY"] else None
+
+  refund_data = data.get("refund")
+  if refund_data:
+    refund_data = serialize_firestore_data(refund_data)
+
+  return {
+    "id": order_id,
+    "items": data["items"],
+    "cafeteriaName": data.get("stall_name", "Unknown Stall"),
+    "status": normalize_order_status(data["status"]),
+    "qrCode": visible_code,
+    "total_amount": data.get("total_amount", 0),
+    "refund": refund_data,
+    "refund_policy": data.get("refund_policy")
+  }
+
+async def get_user_orders(id_token: str, include_archived: bool = False, cursor: str = None):
   try:
     user_data, user_uid = await get_user_details(id_token)
     if not user_data:
@@ -329,37 +386,29 @@ async def get_user_orders(id_token: str):
         content={"message": "Invalid or expired token."}
       )
 
-    docs = (
-       db.collection("orders")
-       .where("user_id","==",user_uid)
-       .order_by("created_at",direction=firestore.Query.DESCENDING)
-       .stream()
-    )
-
     orders = []
-    for doc in docs:
-      data = doc.to_dict()
-
-      visible_code = data.get("pickup_code") if data.get("status") in ["PAID", "READY"] else None
-
-      refund_data = data.get("refund")
-      if refund_data:
-        refund_data = serialize_firestore_data(refund_data)
-
-      orders.append({
-         "id": doc.id,
-         "items": data["items"],
-         "cafeteriaName": data.get("stall_name", "Unknown Stall"),
-         "status": normalize_order_status(data["status"]),
-         "qrCode": visible_code,
-        "total_amount": data.get("total_amount", 0),
-        "refund": refund_data,
-        "refund_policy": data.get("refund_policy")
-      })
-      
+
+    # A cursor means the live orders were already returned on the first page.
+    if not cursor:
+      docs = stream_orders([
+         collection.where("user_id","==",user_uid).order_by("created_at",direction=firestore.Query.DESCENDING)
+         for collection in order_collections(user_data.get("college_id"))
+      ])
+      for doc in docs:
+        orders.append(format_user_order(doc.id, doc.to_dict()))
+
+    headers = None
+    if include_archived or cursor:
+      archived_orders, next_cursor = get_archived_user_orders(user_uid, cursor=cursor)
+      for data in archived_orders:
+        orders.append(format_user_order(data["id"], data))
+      if next_cursor:
+        headers = {"X-Next-Cursor": next_cursor}
+
     return JSONResponse(
       status_code=status.HTTP_200_OK,
-      content=orders
+      content=orders,
+      headers=headers
     )
 
   except Exception as e:
@@ -376,7 +425,8 @@ def normalize_order_status(status:str):
     "CLAIMED": "Claimed",
     "READY": "Ready",
     "COMPLETED": "Completed",
-    "CANCELLED": "Cancelled"
+    "CANCELLED": "Cancelled",
+    "EXPIRED": "Expired"
   }.get(status, "Unknown")
 
 def calculate_refund(order: dict):
@@ -435,12 +485,12 @@ async def cancel_order(order_id: str, id_token: str):
         content={"message": "Weekly cancellation limit reached."}
       )
 
-    order_ref = db.collection("orders").document(order_id)
-    order_doc = order_ref.get()
+    order_doc = find_order(order_id, user_data.get("college_id"))
 
-    if not order_doc.exists:
+    if order_doc is None:
       return JSONResponse(status_code=404, content={"message": "Order not found"})
 
+    order_ref = order_doc.reference
     order_data = order_doc.to_dict()
 
     if order_data.get("user_id") != user_uid:
@@ -448,7 +498,7 @@ async def cancel_order(order_id: str, id_token: str):
 
     current_status = order_data.get("status")
 
-    if current_status in ["CLAIMED", "COMPLETED", "CANCELLED"]:
+    if current_status in ["CLAIMED", "COMPLETED", "CANCELLED", "EXPIRED"]:
       return JSONResponse(
         status_code=400,
         content={"message": f"Cannot cancel order with status: {current_status}"}
@@ -475,13 +525,15 @@ async def cancel_order(order_id: str, id_token: str):
 
     if refund_amount > 0 and payment_id and refund_status not in ["INITIATED", "COMPLETED"]:
       try:
-        refund_response = razorpay_client.payment.refund(
+        refund_response = razorpay_breaker.call(
+          razorpay_client.payment.refund,
           payment_id,
           {
             "amount": int(refund_amount * 100), # Razorpay expects paise
             "speed": "normal",
             "notes": {
               "order_id": order_id,
+              "college_id": order_data.get("college_id"),
               "type": refund_type,
               "reason": "User Cancelled"
             }
@@ -489,8 +541,8 @@ async def cancel_order(order_id: str, id_token: str):
         )
         refund_id = refund_response.get("id")
         refund_status = "INITIATED"
-      except Exception as e:
-        print("[Refund Error]", e)
+      except Exception:
+        logger.exception("Refund request failed", extra={"order_id": order_id})
         refund_status = "FAILED"
 
     # --- RESALE ITEM LOGIC ---
@@ -514,10 +566,12 @@ async def cancel_order(order_id: str, id_token: str):
         "discounted_price": discounted_price,
         "max_price": discounted_price, # ✅ Store Max Price constraint
         "status": "AVAILABLE",
-        "created_at": firestore.SERVER_TIMESTAMP
+        "created_at": firestore.SERVER_TIMESTAMP,
+        "reservation_expires_at": firestore.SERVER_TIMESTAMP
       }
 
       db.collection("resale_items").add(resale_item)
+      invalidate_feed(college_id)
       resale_created = True
 
     batch = db.batch()
@@ -566,12 +620,24 @@ async def cancel_order(order_id: str, id_token: str):
 
   except Exception as e:
     return JSONResponse(status_code=500, content={"message": str(e)})
-async def buy_resale_item(resale_id: str, id_token: str):
+async def buy_resale_item(resale_id: str, id_token: str, idempotency_key: str = None):
   try:
     user_data, user_uid = await get_user_details(id_token)
     if not user_data:
       return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
+    return await run_idempotent(
+      user_uid, "resale.buy", idempotency_key, {"resale_id": resale_id},
+      lambda: _buy_resale_item(resale_id, user_data, user_uid)
+    )
+
+  except Exception as e:
+    return JSONResponse(status_code=500, content={"message": str(e)})
+
+async def _buy_resale_item(resale_id: str, user_data: dict, user_uid: str):
+  try:
+    razorpay_breaker.ensure_available()
+
     resale_ref = db.collection("resale_items").document(resale_id)
 
     if resale_ref.get("original_user_id") == user_uid:
@@ -589,12 +655,14 @@ async def buy_resale_item(resale_id: str, id_token: str):
       data = snapshot.to_dict()
       current_status = data.get("status")
       last_updated = data.get("reserved_at")
+      expires_at = data.get("reservation_expires_at")
 
       is_available = (current_status == "AVAILABLE")
 
-      if current_status == "RESERVED" and last_updated:
-        reservation_time = last_updated
-        if now - reservation_time.replace(tzinfo=None) > timedelta(minutes=5):
+      if current_status == "RESERVED":
+        if expires_at:
+          is_available = expires_at <= now
+        elif last_updated and now - last_updated > timedelta(seconds=RESALE_RESERVATION_SECONDS):
           is_available = True
 
       if not is_available:
@@ -603,14 +671,16 @@ async def buy_resale_item(resale_id: str, id_token: str):
       transaction.update(resale_ref, {
         "status": "RESERVED",
         "reserved_by": user_uid,
-        "reserved_at": firestore.SERVER_TIMESTAMP
+        "reserved_at": firestore.SERVER_TIMESTAMP,
+        "reservation_expires_at": now + timedelta(seconds=RESALE_RESERVATION_SECONDS)
       })
 
       return data
 
     try:
-      now = datetime.now()
+      now = datetime.now(timezone.utc)
       resale_data = reserve_item_transaction(transaction, resale_ref)
+      invalidate_feed(resale_data.get("college_id"))
 
       discounted_price = resale_data.get("discounted_price", 0)
 
@@ -619,10 +689,11 @@ async def buy_resale_item(resale_id: str, id_token: str):
         "phone": user_data.get("phone", "")
       }
 
-      new_order_ref = db.collection('orders').document()
-      internal_order_id = new_order_ref.id
+      order_ref = new_order_ref(resale_data.get("college_id"))
+      internal_order_id = order_ref.id
 
       firestore_order_data = {
+        "order_id": internal_order_id,
         "user_id": user_uid,
         "user_details": user_snapshot,
         "stall_id": resale_data.get("stall_id"),
@@ -651,11 +722,11 @@ async def buy_resale_item(resale_id: str, id_token: str):
         }
       }
 
-      razorpay_order = razorpay_client.order.create(data=payment_payload)
+      razorpay_order = razorpay_breaker.call(razorpay_client.order.create, data=payment_payload)
 
       firestore_order_data["razorpay_order_id"] = razorpay_order['id']
 
-      new_order_ref.set(firestore_order_data)
+      order_ref.set(firestore_order_data)
 
       return JSONResponse(
         status_code=200,
@@ -669,44 +740,30 @@ async def buy_resale_item(resale_id: str, id_token: str):
         }
       )
 
+    except CircuitOpenError:
+      raise
     except Exception as e:
       return JSONResponse(status_code=409, content={"message": str(e)})
 
+  except CircuitOpenError as e:
+    return circuit_open_response(e, PAYMENTS_UNAVAILABLE_MESSAGE)
   except Exception as e:
     return JSONResponse(status_code=500, content={"message": str(e)})
 
-async def get_discounted_feed(id_token: str):
+async def get_discounted_feed(id_token: str, limit: int = FEED_PAGE_SIZE, cursor: str = None):
   try:
     user_data, _ = await get_user_details(id_token)
     if not user_data:
       return JSONResponse(status_code=401, content={"message": "Unauthorized"})
 
-    college_id = user_data.get("college_id")
-    now = datetime.now()
-
-    resale_ref = (
-      db.collection("resale_items")
-      .where("college_id", "==", college_id)
-      .where("status", "in", ["AVAILABLE", "RESERVED"])
-      .order_by("created_at", direction=firestore.Query.DESCENDING)
-    )
-
-    docs = resale_ref.stream()
-
-    feed_items = []
-    for doc in docs:
-      data = doc.to_dict()
-
-      if data.get("status") == "RESERVED":
-        reserved_at = data.get("reserved_at")
-        if reserved_at and (now - reserved_at.replace(tzinfo=None)) < timedelta(minutes=5):
-          continue
-
-      data["resale_id"] = doc.id
-      data = serialize_firestore_data(data)
-      feed_items.append(data)
+    try:
+      feed_items, next_cursor = get_feed_page(user_data.get("college_id"), limit, cursor)
+    except InvalidFeedCursorError:
+      return JSONResponse(status_code=400, content={"message": "Invalid cursor"})
 
-    return JSONResponse(status_code=200, content=feed_items)
+    # The body stays a plain list; the next page is fetched with ?cursor=.
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return JSONResponse(status_code=200, content=feed_items, headers=headers)
 
   except Exception as e:
     return JSONResponse(status_code=500, content={"message": str(e)})
@@ -3,10 +3,14 @@
 import os
 import hmac
 import hashlib
+import logging
 import secrets
 from fastapi import APIRouter, Request, HTTPException
 from firebase_admin import firestore
 from .firebase_init import db
+from .orders_store import find_order
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -29,7 +33,7 @@ async def razorpay_webhook(request: Request):
     if not hmac.compare_digest(expected_signature, signature):
       raise HTTPException(status_code=400, detail="Invalid signature")
   except Exception as e:
-    print(f"Webhook Signature Error: {e}")
+    logger.warning("Webhook signature verification failed", extra={"error": str(e)})
     raise HTTPException(status_code=400, detail="Signature verification failed")
 
   payload = await request.json()
@@ -45,8 +49,13 @@ async def razorpay_webhook(request: Request):
     is_resale = notes.get('type') == 'RESALE'
     resale_item_id = notes.get('resale_item_id')
 
-    if internal_order_id:
-      order_ref = db.collection('orders').document(internal_order_id)
+    order_doc = find_order(internal_order_id, notes.get('college_id')) if internal_order_id else None
+
+    if internal_order_id and order_doc is None:
+      logger.error("Paid order not found", extra={"order_id": internal_order_id, "payment_id": payment_id})
+
+    elif internal_order_id:
+      order_ref = order_doc.reference
 
       transaction = db.transaction()
 
@@ -54,13 +63,13 @@ async def razorpay_webhook(request: Request):
       def update_in_transaction(transaction, order_ref):
         snapshot = order_ref.get(transaction=transaction)
         if not snapshot.exists:
-          print(f"❌ Order {internal_order_id} not found!")
+          logger.error("Paid order not found", extra={"order_id": internal_order_id, "payment_id": payment_id})
           return
 
         current_data = snapshot.to_dict()
 
         if current_data.get("status") == "PAID":
-          print(f"ℹ️ Order {internal_order_id} was already PAID. Skipping update.")
+          logger.info("Order already paid, skipping update", extra={"order_id": internal_order_id})
           return
 
         pickup_code = str(1000 + secrets.randbelow(9000))
@@ -72,7 +81,7 @@ async def razorpay_webhook(request: Request):
           "pickup_code": pickup_code,
           "updated_at": firestore.SERVER_TIMESTAMP
         })
-        print(f"✅ SUCCESS: Generated Pickup Code {pickup_code} for Order {internal_order_id}")
+        logger.info("Order marked paid", extra={"order_id": internal_order_id, "payment_id": payment_id})
 
         if is_resale and resale_item_id:
           resale_ref = db.collection("resale_items").document(resale_item_id)
@@ -81,15 +90,15 @@ async def razorpay_webhook(request: Request):
             "sold_to_order_id": internal_order_id,
             "sold_at": firestore.SERVER_TIMESTAMP
           })
-          print(f"✅ SUCCESS: Marked Resale Item {resale_item_id} as SOLD")
+          logger.info("Resale item marked sold", extra={"resale_item_id": resale_item_id, "order_id": internal_order_id})
 
       try:
         update_in_transaction(transaction, order_ref)
       except Exception as e:
-        print(f"❌ Transaction failed: {e}")
+        logger.exception("Payment update transaction failed", extra={"order_id": internal_order_id})
 
     else:
-      print(f"⚠️ Payment received without internal_order_id: {payment.get('id')}")
+      logger.warning("Payment received without internal_order_id", extra={"payment_id": payment_id})
 
   elif event_type == 'refund.processed':
     try:
@@ -100,27 +109,28 @@ async def razorpay_webhook(request: Request):
       order_id = notes.get('order_id')
 
       if order_id:
-        order_ref = db.collection('orders').document(order_id)
+        snapshot = find_order(order_id, notes.get('college_id'))
+        if snapshot is None:
+          logger.error("Refunded order not found", extra={"order_id": order_id, "payment_id": payment_id})
+          return
 
-        snapshot = order_ref.get()
-        if snapshot.exists:
-          if snapshot.to_dict().get("refund", {}).get("status") == "COMPLETED":
-            print("ℹ️ Refund already completed, skipping")
-            return
+        if snapshot.to_dict().get("refund", {}).get("status") == "COMPLETED":
+          logger.info("Refund already completed, skipping", extra={"order_id": order_id})
+          return
 
-        order_ref.update({
+        snapshot.reference.update({
           "refund.status": "COMPLETED",
           "refund.processed_at": firestore.SERVER_TIMESTAMP,
           "refund.razorpay_refund_id": refund_entity.get('id'),
           "refund.bank_ref": refund_entity.get('acquirer_data', {}).get('rrn'),
           "updated_at": firestore.SERVER_TIMESTAMP
         })
-        print(f"✅ REFUND COMPLETE: Order {order_id} refunded successfully.")
+        logger.info("Refund completed", extra={"order_id": order_id, "refund_id": refund_entity.get('id')})
       else:
-        print(f"⚠️ Refund processed but no order_id found in notes. Payment ID: {payment_id}")
+        logger.warning("Refund processed without order_id in notes", extra={"payment_id": payment_id})
 
     except Exception as e:
-      print(f"❌ Error processing refund webhook: {e}")
+      logger.exception("Error processing refund webhook")
 
   elif event_type == 'refund.failed':
     try:
@@ -128,14 +138,16 @@ async def razorpay_webhook(request: Request):
       notes = refund_entity.get('notes', {})
       order_id = notes.get('order_id')
 
-      if order_id:
-        db.collection('orders').document(order_id).update({
+      snapshot = find_order(order_id, notes.get('college_id')) if order_id else None
+
+      if snapshot is not None:
+        snapshot.reference.update({
           "refund.status": "FAILED",
           "refund.failure_reason": refund_entity.get('status_details', {}).get('description', 'Unknown Error'),
           "updated_at": firestore.SERVER_TIMESTAMP
         })
-        print(f"❌ REFUND FAILED: Order {order_id}")
+        logger.warning("Refund failed", extra={"order_id": order_id})
     except Exception as e:
-      print(f"❌ Error handling refund failure: {e}")
+      logger.exception("Error handling refund failure")
 
   return {"status": "ok"}
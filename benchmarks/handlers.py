@@ -0,0 +1,142 @@
+#benchmarks/handlers.py
+
+# Times request handlers end to end (token check, Firestore reads, response
+# building) against the in-memory Firestore, with the Firestore calls each
+# one makes. No emulator or network is needed, so a run takes seconds and is
+# stable enough to compare commits.
+#
+#   python -m benchmarks.handlers
+#   python -m benchmarks.handlers --repeat 200 --students 500 --orders 10000 --output handlers.json
+#
+# Handlers that call Razorpay or Gemini are not included.
+
+import os
+
+# Must be set before app.firebase_init is imported. The emulator host is only
+# there so firebase_admin accepts the shim's unsigned tokens; it is not contacted.
+os.environ["FIRESTORE_BACKEND"] = "memory"
+os.environ.setdefault("FIREBASE_AUTH_EMULATOR_HOST", "127.0.0.1:9099")
+os.environ.setdefault("EMAIL_OUTBOX_WORKER", "false")
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from datetime import datetime, timezone
+import firebase_admin
+from app.firebase_init import db
+from app.firestore_trace import trace_calls
+from benchmarks.loadtest.auth_shim import mint_id_token
+from benchmarks.loadtest.report import percentile
+
+
+def _handlers(fixtures: dict):
+  from app.user import get_user_menu, get_user_orders
+  from app.staff import get_stall_orders, get_staff_me
+  from app.manager import get_stall_performance_overview, get_my_staff
+
+  project_id = fixtures["project_id"]
+  student = fixtures["students"][0]
+  staff = fixtures["staff"][1] if len(fixtures["staff"]) > 1 else fixtures["staff"][0]
+  manager = next(member for member in fixtures["staff"] if member["uid"].endswith("-0"))
+  student_token = mint_id_token(student["uid"], student["email"], project_id)
+  staff_token = mint_id_token(staff["uid"], staff["email"], project_id)
+  manager_token = mint_id_token(manager["uid"], manager["email"], project_id)
+  now = datetime.now(timezone.utc)
+
+  return {
+    "user_menu": lambda: get_user_menu(student_token),
+    "user_orders": lambda: get_user_orders(student_token),
+    "staff_me": lambda: get_staff_me(staff_token),
+    "stall_orders_claimed": lambda: get_stall_orders(staff_token, status_filter="CLAIMED"),
+    "manager_staff_list": lambda: get_my_staff(manager_token),
+    "performance_overview": lambda: get_stall_performance_overview(now.month, now.year, manager_token)
+  }
+
+
+async def _measure(name: str, handler, repeat: int, warmup: int) -> dict:
+  for _ in range(warmup):
+    await handler()
+
+  timings = []
+  statuses = set()
+  with trace_calls(name) as trace:
+    for _ in range(repeat):
+      started = time.perf_counter()
+      response = await handler()
+      timings.append(time.perf_counter() - started)
+      statuses.add(getattr(response, "status_code", 200))
+  calls = trace.summary()
+
+  timings.sort()
+  return {
+    "handler": name,
+    "runs": repeat,
+    "status": sorted(statuses),
+    "p50_ms": round(percentile(timings, 50) * 1000, 3),
+    "p95_ms": round(percentile(timings, 95) * 1000, 3),
+    "mean_ms": round(statistics.mean(timings) * 1000, 3),
+    "firestore_reads_per_call": round(calls["read_calls"] / repeat, 2),
+    "docs_read_per_call": round(calls["docs_read"] / repeat, 2),
+    "firestore_writes_per_call": round(calls["write_calls"] / repeat, 2),
+    "repeated_query_shapes": [shape for shape, _ in trace.repeated_shapes(threshold=repeat)]
+  }
+
+
+def run(repeat: int, warmup: int, only: list, seed_options: dict) -> dict:
+  from benchmarks.loadtest.seed import populate
+
+  started = time.perf_counter()
+  fixtures = populate(firebase_admin.get_app().project_id, **seed_options)
+  seed_seconds = time.perf_counter() - started
+
+  handlers = _handlers(fixtures)
+  rows = []
+  for name, handler in handlers.items():
+    if only and name not in only:
+      continue
+    rows.append(asyncio.run(_measure(name, handler, repeat, warmup)))
+
+  summary = {
+    "backend": type(db).__name__,
+    "documents": fixtures["documents"],
+    "seed_seconds": round(seed_seconds, 2),
+    "repeat": repeat,
+    "seed": seed_options
+  }
+  return {"summary": summary, "handlers": rows}
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark request handlers against the in-memory Firestore.")
+  parser.add_argument("--repeat", type=int, default=50, help="Timed calls per handler")
+  parser.add_argument("--warmup", type=int, default=3)
+  parser.add_argument("--only", nargs="*", help="Handler names to run (default: all)")
+  parser.add_argument("--stalls", type=int, default=6)
+  parser.add_argument("--items", type=int, default=25, help="Menu items per stall")
+  parser.add_argument("--students", type=int, default=300)
+  parser.add_argument("--orders", type=int, default=3000, help="Past orders")
+  parser.add_argument("--seed", type=int, default=42)
+  parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+  args = parser.parse_args()
+
+  report = run(args.repeat, args.warmup, args.only, {
+    "stalls": args.stalls,
+    "items": args.items,
+    "students": args.students,
+    "orders": args.orders,
+    "rng_seed": args.seed
+  })
+
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(report, f, indent=2)
+  else:
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+  main()
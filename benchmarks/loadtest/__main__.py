@@ -0,0 +1,135 @@
+#benchmarks/loadtest/__main__.py
+
+# Load-test harness for the API, run against the Firebase emulators and the
+# fake Razorpay in this package:
+#
+#   python -m benchmarks.loadtest fake-razorpay --port 9010
+#   python -m benchmarks.loadtest seed --reset --output .cache/loadtest/fixtures.json
+#   python -m benchmarks.loadtest run --scenario lunch-rush --users 100 --duration 120 \
+#     --output .cache/loadtest/report.json --baseline previous-report.json
+#
+# See the "Load testing" section of the README for the environment the app
+# itself needs.
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+
+DEFAULT_FIXTURES = os.path.join(".cache", "loadtest", "fixtures.json")
+
+
+def _write_json(data: dict, path: str):
+  if path:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+      json.dump(data, f, indent=2)
+  else:
+    json.dump(data, sys.stdout, indent=2)
+    print()
+
+
+def _seed(args):
+  from .seed import seed
+
+  fixtures = seed(
+    colleges=args.colleges,
+    stalls=args.stalls,
+    items=args.items,
+    students=args.students,
+    staff_per_stall=args.staff_per_stall,
+    orders=args.orders,
+    history_days=args.history_days,
+    rng_seed=args.seed,
+    reset=args.reset
+  )
+  _write_json(fixtures, args.output)
+  print(f"Seeded {fixtures['documents']} documents; fixtures in {args.output}", file=sys.stderr)
+
+
+def _fake_razorpay(args):
+  from .fake_razorpay import FakeRazorpay, serve
+
+  serve(args.host, args.port, FakeRazorpay(args.latency_ms, args.jitter_ms, args.error_rate))
+
+
+def _run(args):
+  from .scenarios import LoadTest
+  from .report import build_report, compare
+
+  with open(args.fixtures) as f:
+    fixtures = json.load(f)
+
+  load_test = LoadTest(
+    fixtures,
+    args.base_url,
+    scenario=args.scenario,
+    users=args.users,
+    duration=args.duration,
+    ramp_up=args.ramp_up,
+    think_time=args.think_time,
+    burst_interval=args.burst_interval,
+    poll_interval=args.poll_interval,
+    webhook_secret=args.webhook_secret,
+    rng_seed=args.seed
+  )
+  elapsed = asyncio.run(load_test.run())
+  report = build_report(args.scenario, load_test.config(), load_test.recorder, elapsed)
+
+  if args.baseline:
+    with open(args.baseline) as f:
+      report["comparison"] = compare(report, json.load(f))
+
+  _write_json(report, args.output)
+
+
+def main():
+  from .scenarios import SCENARIOS
+
+  parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description="Load-test the API against the Firebase emulators.")
+  commands = parser.add_subparsers(dest="command", required=True)
+
+  seed_parser = commands.add_parser("seed", help="Seed the Firestore emulator and write a fixtures file")
+  seed_parser.add_argument("--colleges", type=int, default=1)
+  seed_parser.add_argument("--stalls", type=int, default=6, help="Stalls per college")
+  seed_parser.add_argument("--items", type=int, default=25, help="Menu items per stall")
+  seed_parser.add_argument("--students", type=int, default=300, help="Students per college")
+  seed_parser.add_argument("--staff-per-stall", type=int, default=2)
+  seed_parser.add_argument("--orders", type=int, default=3000, help="Past orders per college")
+  seed_parser.add_argument("--history-days", type=int, default=60)
+  seed_parser.add_argument("--seed", type=int, default=42)
+  seed_parser.add_argument("--reset", action="store_true", help="Clear the emulator's documents first")
+  seed_parser.add_argument("--output", default=DEFAULT_FIXTURES)
+  seed_parser.set_defaults(handler=_seed)
+
+  fake_parser = commands.add_parser("fake-razorpay", help="Serve a local stand-in for the Razorpay API")
+  fake_parser.add_argument("--host", default="127.0.0.1")
+  fake_parser.add_argument("--port", type=int, default=9010)
+  fake_parser.add_argument("--latency-ms", type=float, default=0, help="Added to every response")
+  fake_parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra latency, up to this much")
+  fake_parser.add_argument("--error-rate", type=float, default=0, help="Fraction of calls answered with a 502")
+  fake_parser.set_defaults(handler=_fake_razorpay)
+
+  run_parser = commands.add_parser("run", help="Run a scenario and write a JSON report")
+  run_parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="lunch-rush")
+  run_parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+  run_parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+  run_parser.add_argument("--users", type=int, default=50, help="Concurrent students")
+  run_parser.add_argument("--duration", type=float, default=60, help="Seconds")
+  run_parser.add_argument("--ramp-up", type=float, default=10, help="Seconds over which students start")
+  run_parser.add_argument("--think-time", type=float, default=2.0, help="Mean seconds between a student's actions")
+  run_parser.add_argument("--burst-interval", type=float, default=5.0, help="Seconds between webhook bursts")
+  run_parser.add_argument("--poll-interval", type=float, default=3.0, help="Mean seconds between staff polls")
+  run_parser.add_argument("--webhook-secret", default=os.environ.get("RAZORPAY_WEBHOOK_SECRET", ""))
+  run_parser.add_argument("--seed", type=int, default=42)
+  run_parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+  run_parser.add_argument("--baseline", help="Earlier report to compare against")
+  run_parser.set_defaults(handler=_run)
+
+  args = parser.parse_args()
+  args.handler(args)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,48 @@
+#benchmarks/loadtest/auth_shim.py
+
+# Mints Firebase ID tokens for seeded users without a sign-in round trip.
+# When FIREBASE_AUTH_EMULATOR_HOST is set, firebase_admin skips the signature
+# check in verify_id_token (as it does for the Auth emulator's own tokens) but
+# still checks audience, issuer and subject, so the app accepts these tokens
+# only when it runs against the emulators.
+
+import os
+import json
+import time
+import base64
+
+TOKEN_LIFETIME_SECONDS = 3600
+
+
+def _b64(data: dict) -> str:
+  return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).rstrip(b"=").decode()
+
+
+def project_id_from_env() -> str:
+  # The app verifies tokens against the project of its service account.
+  project_id = os.environ.get("GOOGLE_CLOUD_PROJECT") or os.environ.get("GCLOUD_PROJECT")
+  if project_id:
+    return project_id
+  service_account = os.environ.get("FIREBASE_SERVICE_ACCOUNT")
+  if service_account:
+    with open(service_account) as f:
+      return json.load(f)["project_id"]
+  raise RuntimeError("Set GOOGLE_CLOUD_PROJECT or FIREBASE_SERVICE_ACCOUNT to mint tokens")
+
+
+def mint_id_token(uid: str, email: str, project_id: str) -> str:
+  now = int(time.time())
+  claims = {
+    "iss": f"https://securetoken.google.com/{project_id}",
+    "aud": project_id,
+    "auth_time": now,
+    "iat": now,
+    "exp": now + TOKEN_LIFETIME_SECONDS,
+    "sub": uid,
+    "user_id": uid,
+    "email": email,
+    "email_verified": True,
+    "firebase": {"identities": {"email": [email]}, "sign_in_provider": "password"}
+  }
+  # Unsigned, like the tokens the Auth emulator issues.
+  return f"{_b64({'alg': 'none', 'typ': 'JWT'})}.{_b64(claims)}."
@@ -0,0 +1,129 @@
+#benchmarks/loadtest/fake_razorpay.py
+
+# A local stand-in for the parts of the Razorpay API the app calls: order
+# creation and refunds. Point the app at it with RAZORPAY_BASE_URL. It accepts
+# any key, keeps orders in memory and can add latency to mimic the real API.
+#
+#   python -m benchmarks.loadtest fake-razorpay --port 9010 --latency-ms 120
+
+import re
+import json
+import time
+import uuid
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_ORDER_PATH = re.compile(r"^/v1/orders/?$")
+_ORDER_ID_PATH = re.compile(r"^/v1/orders/(?P<order_id>[\w-]+)/?$")
+_REFUND_PATH = re.compile(r"^/v1/payments/(?P<payment_id>[\w-]+)/refund/?$")
+
+
+class FakeRazorpay:
+  def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0):
+    self.latency_ms = latency_ms
+    self.jitter_ms = jitter_ms
+    self.error_rate = error_rate
+    self.orders = {}
+    self.refunds = {}
+    self._lock = threading.Lock()
+
+  def delay(self):
+    latency = self.latency_ms + random.uniform(0, self.jitter_ms)
+    if latency:
+      time.sleep(latency / 1000)
+
+  def create_order(self, data: dict) -> dict:
+    order = {
+      "id": f"order_{uuid.uuid4().hex[:14]}",
+      "entity": "order",
+      "amount": int(data.get("amount", 0)),
+      "amount_paid": 0,
+      "amount_due": int(data.get("amount", 0)),
+      "currency": data.get("currency", "INR"),
+      "receipt": data.get("receipt"),
+      "status": "created",
+      "attempts": 0,
+      "notes": data.get("notes", {}),
+      "created_at": int(time.time())
+    }
+    with self._lock:
+      self.orders[order["id"]] = order
+    return order
+
+  def refund(self, payment_id: str, data: dict) -> dict:
+    refund = {
+      "id": f"rfnd_{uuid.uuid4().hex[:14]}",
+      "entity": "refund",
+      "amount": int(data.get("amount", 0)),
+      "currency": "INR",
+      "payment_id": payment_id,
+      "notes": data.get("notes", {}),
+      "status": "processed",
+      "speed_processed": data.get("speed", "normal"),
+      "created_at": int(time.time())
+    }
+    with self._lock:
+      self.refunds[refund["id"]] = refund
+    return refund
+
+
+def _handler(fake: FakeRazorpay):
+  class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+      pass
+
+    def _reply(self, status: int, body: dict):
+      payload = json.dumps(body).encode()
+      self.send_response(status)
+      self.send_header("Content-Type", "application/json")
+      self.send_header("Content-Length", str(len(payload)))
+      self.end_headers()
+      self.wfile.write(payload)
+
+    def _body(self) -> dict:
+      length = int(self.headers.get("Content-Length") or 0)
+      return json.loads(self.rfile.read(length) or b"{}")
+
+    def _failed(self) -> bool:
+      fake.delay()
+      if fake.error_rate and random.random() < fake.error_rate:
+        self._reply(502, {"error": {"code": "SERVER_ERROR", "description": "Injected failure"}})
+        return True
+      return False
+
+    def do_POST(self):
+      data = self._body()
+      if self._failed():
+        return
+      if _ORDER_PATH.match(self.path):
+        return self._reply(200, fake.create_order(data))
+      match = _REFUND_PATH.match(self.path)
+      if match:
+        return self._reply(200, fake.refund(match.group("payment_id"), data))
+      self._reply(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "Unknown endpoint"}})
+
+    def do_GET(self):
+      if self._failed():
+        return
+      match = _ORDER_ID_PATH.match(self.path)
+      order = fake.orders.get(match.group("order_id")) if match else None
+      if order is None:
+        return self._reply(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "The id provided does not exist"}})
+      self._reply(200, order)
+
+  return Handler
+
+
+def serve(host: str, port: int, fake: FakeRazorpay):
+  server = ThreadingHTTPServer((host, port), _handler(fake))
+  server.daemon_threads = True
+  print(f"Fake Razorpay listening on http://{host}:{port}")
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
@@ -0,0 +1,105 @@
+#benchmarks/loadtest/report.py
+
+import math
+import platform
+import subprocess
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+
+class Recorder:
+  # Latency samples per endpoint label ("GET /user/menu"), plus status counts.
+
+  def __init__(self):
+    self.latencies = defaultdict(list)
+    self.outcomes = defaultdict(Counter)
+
+  def record(self, label: str, seconds: float, outcome):
+    self.latencies[label].append(seconds)
+    self.outcomes[label][str(outcome)] += 1
+
+
+def percentile(sorted_values: list, q: float):
+  # Nearest-rank percentile of an already sorted list.
+  if not sorted_values:
+    return None
+  rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+  return sorted_values[rank - 1]
+
+
+def _ms(seconds):
+  return None if seconds is None else round(seconds * 1000, 2)
+
+
+def summarize(recorder: Recorder, elapsed_seconds: float) -> dict:
+  endpoints = {}
+  for label in sorted(recorder.latencies):
+    samples = sorted(recorder.latencies[label])
+    outcomes = recorder.outcomes[label]
+    errors = sum(count for outcome, count in outcomes.items() if not (outcome.isdigit() and int(outcome) < 400))
+    endpoints[label] = {
+      "requests": len(samples),
+      "errors": errors,
+      "error_rate": round(errors / len(samples), 4),
+      "throughput_rps": round(len(samples) / elapsed_seconds, 2),
+      "p50_ms": _ms(percentile(samples, 50)),
+      "p95_ms": _ms(percentile(samples, 95)),
+      "p99_ms": _ms(percentile(samples, 99)),
+      "mean_ms": _ms(sum(samples) / len(samples)),
+      "max_ms": _ms(samples[-1]),
+      "outcomes": dict(sorted(outcomes.items()))
+    }
+  return endpoints
+
+
+def git_commit():
+  try:
+    result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5)
+    return result.stdout.strip() or None
+  except (OSError, subprocess.SubprocessError):
+    return None
+
+
+def build_report(scenario: str, config: dict, recorder: Recorder, elapsed_seconds: float) -> dict:
+  endpoints = summarize(recorder, elapsed_seconds)
+  total = sum(endpoint["requests"] for endpoint in endpoints.values())
+  return {
+    "meta": {
+      "scenario": scenario,
+      "commit": git_commit(),
+      "finished_at": datetime.now(timezone.utc).isoformat(),
+      "python": platform.python_version(),
+      "duration_seconds": round(elapsed_seconds, 2),
+      "config": config
+    },
+    "totals": {
+      "requests": total,
+      "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+      "throughput_rps": round(total / elapsed_seconds, 2) if elapsed_seconds else None
+    },
+    "endpoints": endpoints
+  }
+
+
+def _change(current, baseline):
+  if current is None or not baseline:
+    return None
+  return round((current - baseline) / baseline * 100, 1)
+
+
+def compare(report: dict, baseline: dict) -> dict:
+  # Percent change per endpoint against an earlier report; positive latency
+  # changes are regressions, positive throughput changes improvements.
+  comparison = {"baseline_commit": baseline.get("meta", {}).get("commit"), "endpoints": {}}
+  for label, current in report["endpoints"].items():
+    previous = baseline.get("endpoints", {}).get(label)
+    if previous is None:
+      continue
+    comparison["endpoints"][label] = {
+      "p50_change_pct": _change(current["p50_ms"], previous.get("p50_ms")),
+      "p95_change_pct": _change(current["p95_ms"], previous.get("p95_ms")),
+      "p99_change_pct": _change(current["p99_ms"], previous.get("p99_ms")),
+      "throughput_change_pct": _change(current["throughput_rps"], previous.get("throughput_rps")),
+      "error_rate_delta": round(current["error_rate"] - previous.get("error_rate", 0), 4)
+    }
+  return comparison
@@ -0,0 +1,238 @@
+#benchmarks/loadtest/scenarios.py
+
+# Lunch-rush traffic against a running app. Students browse the menu and place
+# orders; Razorpay webhooks for those orders arrive in bursts; students then
+# read their pickup code and staff poll their order list and verify pickups.
+# Each scenario runs a subset of these actors.
+
+import json
+import time
+import hmac
+import uuid
+import random
+import asyncio
+import hashlib
+import httpx
+from .auth_shim import mint_id_token
+from .report import Recorder
+
+SCENARIOS = {
+  "lunch-rush": {"browse", "order", "webhook", "staff", "pickup"},
+  "menu-browse": {"browse"},
+  "order-create": {"order"},
+  "webhook-burst": {"order", "webhook"},
+  "staff-polling": {"staff"},
+  "pickup": {"order", "webhook", "pickup"}
+}
+
+
+class LoadTest:
+  def __init__(
+      self,
+      fixtures: dict,
+      base_url: str,
+      scenario: str = "lunch-rush",
+      users: int = 50,
+      duration: float = 60,
+      ramp_up: float = 10,
+      think_time: float = 2.0,
+      burst_interval: float = 5.0,
+      poll_interval: float = 3.0,
+      webhook_secret: str = "",
+      timeout: float = 30,
+      rng_seed: int = 42
+  ):
+    self.fixtures = fixtures
+    self.base_url = base_url.rstrip("/")
+    self.scenario = scenario
+    self.actors = SCENARIOS[scenario]
+    self.users = users
+    self.duration = duration
+    self.ramp_up = ramp_up
+    self.think_time = think_time
+    self.burst_interval = burst_interval
+    self.poll_interval = poll_interval
+    self.webhook_secret = webhook_secret
+    self.timeout = timeout
+    self.rng = random.Random(rng_seed)
+
+    self.recorder = Recorder()
+    self.webhooks = asyncio.Queue()
+    self.pickups = {}
+    self.stalls = {college["college_id"]: college["stalls"] for college in fixtures["colleges"]}
+    self.deadline = None
+    self._tokens = {}
+
+  def config(self) -> dict:
+    return {
+      "base_url": self.base_url,
+      "users": self.users,
+      "duration": self.duration,
+      "ramp_up": self.ramp_up,
+      "think_time": self.think_time,
+      "burst_interval": self.burst_interval,
+      "poll_interval": self.poll_interval,
+      "students_seeded": len(self.fixtures["students"]),
+      "staff_seeded": len(self.fixtures["staff"])
+    }
+
+  def token(self, person: dict) -> str:
+    if person["uid"] not in self._tokens:
+      self._tokens[person["uid"]] = mint_id_token(person["uid"], person["email"], self.fixtures["project_id"])
+    return self._tokens[person["uid"]]
+
+  def running(self) -> bool:
+    return time.monotonic() < self.deadline
+
+  async def request(self, client: httpx.AsyncClient, label: str, method: str, path: str, **kwargs):
+    started = time.perf_counter()
+    try:
+      response = await client.request(method, self.base_url + path, **kwargs)
+    except httpx.HTTPError as e:
+      self.recorder.record(label, time.perf_counter() - started, type(e).__name__)
+      return None
+    self.recorder.record(label, time.perf_counter() - started, response.status_code)
+    return response
+
+  async def pause(self, mean_seconds: float):
+    # Exponential think time, so arrivals are not in lockstep.
+    await asyncio.sleep(self.rng.expovariate(1 / mean_seconds) if mean_seconds > 0 else 0)
+
+  async def student(self, client, student: dict, start_delay: float):
+    await asyncio.sleep(start_delay)
+    headers = {"Authorization": f"Bearer {self.token(student)}"}
+    stalls = self.stalls[student["college_id"]]
+
+    while self.running():
+      if "browse" in self.actors:
+        await self.request(client, "GET /user/menu", "GET", "/user/menu", headers=headers)
+
+      if "order" in self.actors:
+        stall = self.rng.choice(stalls)
+        items = self.rng.sample(stall["item_ids"], k=min(len(stall["item_ids"]), self.rng.randint(1, 3)))
+        response = await self.request(
+          client, "POST /user/order/create", "POST", "/user/order/create",
+          headers={**headers, "Idempotency-Key": uuid.uuid4().hex},
+          json={"stall_id": stall["stall_id"], "items": [{"item_id": item_id, "quantity": self.rng.randint(1, 2)} for item_id in items]}
+        )
+        if response is not None and response.status_code == 200 and "webhook" in self.actors:
+          created = response.json()
+          await self.webhooks.put({
+            "student": student,
+            "stall_id": stall["stall_id"],
+            "internal_order_id": created["internal_order_id"],
+            "razorpay_order_id": created["id"],
+            "amount": created["amount"]
+          })
+
+      await self.pause(self.think_time)
+
+  def _webhook_body(self, order: dict) -> bytes:
+    payment_id = f"pay_{uuid.uuid4().hex[:14]}"
+    payload = {
+      "entity": "event",
+      "event": "payment.captured",
+      "created_at": int(time.time()),
+      "payload": {
+        "payment": {
+          "entity": {
+            "id": payment_id,
+            "entity": "payment",
+            "amount": order["amount"],
+            "currency": "INR",
+            "status": "captured",
+            "order_id": order["razorpay_order_id"],
+            "method": "upi",
+            "captured": True,
+            "notes": {
+              "internal_order_id": order["internal_order_id"],
+              "college_id": order["student"]["college_id"],
+              "stall_id": order["stall_id"],
+              "user_uid": order["student"]["uid"]
+            }
+          }
+        }
+      }
+    }
+    return json.dumps(payload).encode()
+
+  async def send_webhook(self, client, order: dict):
+    body = self._webhook_body(order)
+    signature = hmac.new(self.webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+    response = await self.request(
+      client, "POST /webhook/razorpay", "POST", "/webhook/razorpay",
+      content=body,
+      headers={"Content-Type": "application/json", "X-Razorpay-Signature": signature}
+    )
+    if response is not None and response.status_code == 200 and "pickup" in self.actors:
+      await self.collect_pickup_code(client, order)
+
+  async def webhook_bursts(self, client):
+    # Razorpay delivers captured payments in clumps during a rush; everything
+    # queued since the last burst is sent at once.
+    while self.running():
+      await asyncio.sleep(self.burst_interval)
+      burst = []
+      while not self.webhooks.empty():
+        burst.append(self.webhooks.get_nowait())
+      await asyncio.gather(*(self.send_webhook(client, order) for order in burst))
+
+  async def collect_pickup_code(self, client, order: dict):
+    # The student opens their orders to show the pickup code at the counter.
+    student = order["student"]
+    response = await self.request(
+      client, "GET /user/orders", "GET", "/user/orders",
+      headers={"Authorization": f"Bearer {self.token(student)}"}
+    )
+    if response is None or response.status_code != 200:
+      return
+    for placed in response.json():
+      if placed["id"] == order["internal_order_id"] and placed.get("qrCode"):
+        queue = self.pickups.setdefault((student["college_id"], order["stall_id"]), asyncio.Queue())
+        await queue.put((order["internal_order_id"], placed["qrCode"]))
+        return
+
+  async def staff_member(self, client, staff: dict, start_delay: float):
+    await asyncio.sleep(start_delay)
+    headers = {"Authorization": f"Bearer {self.token(staff)}"}
+    queue = self.pickups.setdefault((staff["college_id"], staff["stall_id"]), asyncio.Queue())
+
+    while self.running():
+      if "staff" in self.actors:
+        await self.request(client, "GET /staff/orders", "GET", "/staff/orders", params={"status": "PAID"}, headers=headers)
+
+      if "pickup" in self.actors:
+        while not queue.empty():
+          order_id, pickup_code = queue.get_nowait()
+          await self.request(
+            client, "POST /staff/orders/verify-pickup", "POST", "/staff/orders/verify-pickup",
+            headers=headers,
+            json={"order_id": order_id, "pickup_code": pickup_code}
+          )
+
+      await self.pause(self.poll_interval)
+
+  async def run(self) -> float:
+    students = self.fixtures["students"]
+    limits = httpx.Limits(max_connections=self.users + len(self.fixtures["staff"]) + 20)
+
+    async with httpx.AsyncClient(timeout=self.timeout, limits=limits) as client:
+      self.deadline = time.monotonic() + self.duration
+      started = time.perf_counter()
+
+      tasks = []
+      if self.actors & {"browse", "order"}:
+        tasks += [
+          self.student(client, students[n % len(students)], self.ramp_up * n / self.users)
+          for n in range(self.users)
+        ]
+      if "webhook" in self.actors:
+        tasks.append(self.webhook_bursts(client))
+      if self.actors & {"staff", "pickup"}:
+        tasks += [
+          self.staff_member(client, staff, self.rng.uniform(0, min(self.ramp_up, self.poll_interval)))
+          for staff in self.fixtures["staff"]
+        ]
+
+      await asyncio.gather(*tasks)
+      return time.perf_counter() - started
@@ -0,0 +1,191 @@
+#benchmarks/loadtest/seed.py
+
+# Seeds the Firestore emulator with colleges, stalls, menus, students, staff
+# and past orders, and writes a fixtures file the load test reads. Seeding is
+# deterministic for a given --seed, so runs on different commits start from
+# the same data. populate() does the writing and also fills the in-memory
+# Firestore for benchmarks/handlers.py.
+#
+#   python -m benchmarks.loadtest seed --reset --students 500 --orders 5000
+
+import os
+import json
+import random
+import requests
+from datetime import datetime, timedelta, timezone
+from .auth_shim import project_id_from_env
+
+FOODS = [
+  "Masala Dosa", "Idli Vada", "Veg Biryani", "Paneer Roll", "Chole Bhature",
+  "Veg Thali", "Egg Fried Rice", "Hakka Noodles", "Samosa", "Pav Bhaji",
+  "Cold Coffee", "Masala Chai", "Lemon Soda", "Veg Sandwich", "Aloo Paratha",
+  "Rajma Chawal", "Curd Rice", "Gobi Manchurian", "Filter Coffee", "Poha"
+]
+CATEGORIES = ["Breakfast", "Meals", "Snacks", "Beverages", "Chinese"]
+
+
+def _require_emulator():
+  # Never write benchmark data to a real project.
+  host = os.environ.get("FIRESTORE_EMULATOR_HOST")
+  if not host:
+    raise RuntimeError("FIRESTORE_EMULATOR_HOST is not set; refusing to seed a real Firestore project")
+  return host
+
+
+def reset_emulator(host: str, project_id: str):
+  response = requests.delete(
+    f"http://{host}/emulator/v1/projects/{project_id}/databases/(default)/documents",
+    timeout=(3.05, 30)
+  )
+  response.raise_for_status()
+
+
+def seed(reset: bool = False, **options) -> dict:
+  host = _require_emulator()
+  project_id = project_id_from_env()
+  if reset:
+    reset_emulator(host, project_id)
+  return populate(project_id, **options)
+
+
+def populate(
+    project_id: str,
+    colleges: int = 1,
+    stalls: int = 6,
+    items: int = 25,
+    students: int = 300,
+    staff_per_stall: int = 2,
+    orders: int = 3000,
+    history_days: int = 60,
+    rng_seed: int = 42
+) -> dict:
+  # Writes through app.firebase_init.db, whichever backend it is.
+  # Imported late: app.firebase_init connects on import.
+  from app.firebase_init import db
+  from app.firestore_batch import commit_in_batches
+  from app.orders_store import college_orders
+
+  rng = random.Random(rng_seed)
+  now = datetime.now(timezone.utc)
+  ops = []
+  fixtures = {"project_id": project_id, "colleges": [], "students": [], "staff": []}
+
+  for c in range(colleges):
+    college_id = f"bench-college-{c}"
+    domain = f"bench{c}.edu"
+    college_ref = db.collection("colleges").document(college_id)
+    ops.append(("set", college_ref, {"name": f"Bench College {c}", "domains": [domain]}))
+
+    college_fixture = {"college_id": college_id, "stalls": []}
+    menus = {}
+    staff_emails = {}
+
+    for s in range(stalls):
+      stall_id = f"stall-{s}"
+      stall_ref = college_ref.collection("stalls").document(stall_id)
+      ops.append(("set", stall_ref, {
+        "name": f"Stall {s}",
+        "status": "active",
+        "isVerified": True,
+        "created_at": now - timedelta(days=365)
+      }))
+
+      menu = []
+      for i in range(items):
+        item_id = f"item-{i}"
+        item = {
+          "name": f"{FOODS[i % len(FOODS)]}" + (f" {i // len(FOODS) + 1}" if i >= len(FOODS) else ""),
+          "price": rng.randrange(20, 160, 5),
+          "category": CATEGORIES[i % len(CATEGORIES)],
+          "is_available": rng.random() > 0.1,
+          "created_at": now - timedelta(days=30, minutes=i),
+          "updated_at": now - timedelta(days=30, minutes=i)
+        }
+        ops.append(("set", stall_ref.collection("menu_items").document(item_id), item))
+        menu.append({"item_id": item_id, **item})
+      menus[stall_id] = menu
+
+      staff_uids = []
+      for j in range(staff_per_stall):
+        uid = f"staff-{c}-{s}-{j}"
+        email = f"{uid}@{domain}"
+        ops.append(("set", db.collection("staffs").document(uid), {
+          "name": f"Staff {c}-{s}-{j}",
+          "email": email,
+          "role": "manager" if j == 0 else "staff",
+          "status": "active",
+          "college_id": college_id,
+          "stall_id": stall_id,
+          "created_at": now - timedelta(days=300)
+        }))
+        staff_uids.append(uid)
+        staff_emails.setdefault(stall_id, []).append(email)
+        fixtures["staff"].append({"uid": uid, "email": email, "college_id": college_id, "stall_id": stall_id})
+
+      college_fixture["stalls"].append({
+        "stall_id": stall_id,
+        "item_ids": [item["item_id"] for item in menu if item["is_available"]],
+        "staff_uids": staff_uids
+      })
+
+    student_uids = []
+    for n in range(students):
+      uid = f"student-{c}-{n}"
+      email = f"{uid}@{domain}"
+      ops.append(("set", db.collection("users").document(uid), {
+        "name": f"Student {c}-{n}",
+        "email": email,
+        "roll_number": f"B{c}{n:05d}",
+        "phone": f"9{rng.randrange(10 ** 8, 10 ** 9)}",
+        "college_id": college_id,
+        "college_name": f"Bench College {c}",
+        "role": "student",
+        "created_at": now - timedelta(days=200)
+      }))
+      student_uids.append(uid)
+      fixtures["students"].append({"uid": uid, "email": email, "college_id": college_id})
+
+    # Past orders, so list and history queries scan a realistic amount.
+    for k in range(orders):
+      stall_id = f"stall-{rng.randrange(stalls)}"
+      picked = rng.sample(menus[stall_id], k=rng.randint(1, 3))
+      order_items = [
+        {"item_id": item["item_id"], "name": item["name"], "price": item["price"], "quantity": rng.randint(1, 2)}
+        for item in picked
+      ]
+      created_at = now - timedelta(minutes=rng.randrange(30, history_days * 24 * 60))
+      order_status = "CLAIMED" if rng.random() > 0.08 else "CANCELLED"
+      order_ref = college_orders(college_id).document(f"hist-{c}-{k:06d}")
+      ops.append(("set", order_ref, {
+        "order_id": order_ref.id,
+        "user_id": rng.choice(student_uids),
+        "user_details": {"name": "Bench Student", "roll_number": "N/A", "phone": ""},
+        "stall_id": stall_id,
+        "stall_name": stall_id.replace("stall-", "Stall "),
+        "college_id": college_id,
+        "items": order_items,
+        "total_amount": sum(item["price"] * item["quantity"] for item in order_items),
+        "status": order_status,
+        "pickup_code": str(rng.randrange(1000, 10000)),
+        "refund": {"status": "NOT_APPLICABLE", "amount": 0},
+        "refund_policy": {"ready_refund_percent": 50, "cancellation_allowed": True},
+        "created_at": created_at,
+        "updated_at": created_at + timedelta(minutes=15),
+        "picked_up_at": created_at + timedelta(minutes=15) if order_status == "CLAIMED" else None,
+        "handled_by": rng.choice(staff_emails[stall_id]) if order_status == "CLAIMED" and staff_emails.get(stall_id) else None
+      }))
+
+    fixtures["colleges"].append(college_fixture)
+
+  failed = [error for _, error in commit_in_batches(ops) if error is not None]
+  if failed:
+    raise RuntimeError(f"{len(failed)} seed batches failed: {failed[0]}")
+
+  fixtures["seeded_at"] = now.isoformat()
+  fixtures["documents"] = len(ops)
+  return fixtures
+
+
+def write_fixtures(fixtures: dict, path: str):
+  with open(path, "w") as f:
+    json.dump(fixtures, f, indent=2)
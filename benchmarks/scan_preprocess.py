@@ -0,0 +1,126 @@
+#benchmarks/scan_preprocess.py
+
+# Compares menu scanning on raw uploads vs. preprocessed images.
+#
+#   python -m benchmarks.scan_preprocess                      # size + preprocessing time only
+#   python -m benchmarks.scan_preprocess --extract            # also call Gemini on both variants
+#   python -m benchmarks.scan_preprocess --extract --expected expected.json
+#
+# --extract needs GEMINI_API_KEY and FIREBASE_SERVICE_ACCOUNT (app.staff is
+# imported). Item recall is measured against --expected ({"file.jpg": ["Item", ...]})
+# when given, otherwise against the items extracted from the raw image.
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from app.image_preprocess import preprocess_menu_image
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "images_for_demo")
+
+
+def _normalize(name: str) -> str:
+  return " ".join((name or "").lower().split())
+
+
+def _timed(fn, *args):
+  start = time.perf_counter()
+  result = fn(*args)
+  return result, time.perf_counter() - start
+
+
+def _recall(found: list, expected: list):
+  expected_names = {_normalize(name) for name in expected}
+  if not expected_names:
+    return None
+  found_names = {_normalize(item["name"]) for item in found}
+  return len(found_names & expected_names) / len(expected_names)
+
+
+def run(image_dir: str, extract: bool, expected: dict, repeat: int):
+  extract_fn = None
+  if extract:
+    from app.staff import _extract_menu_from_image
+    extract_fn = _extract_menu_from_image
+
+  rows = []
+  for filename in sorted(os.listdir(image_dir)):
+    if not filename.lower().endswith((".jpg", ".jpeg", ".png")):
+      continue
+
+    with open(os.path.join(image_dir, filename), "rb") as f:
+      raw = f.read()
+    mime_type = "image/png" if filename.lower().endswith(".png") else "image/jpeg"
+
+    timings = []
+    for _ in range(repeat):
+      (processed, processed_mime), elapsed = _timed(preprocess_menu_image, raw, mime_type)
+      timings.append(elapsed)
+
+    row = {
+      "image": filename,
+      "raw_bytes": len(raw),
+      "processed_bytes": len(processed),
+      "size_reduction": round(1 - len(processed) / len(raw), 3),
+      "preprocess_ms": round(statistics.median(timings) * 1000, 1)
+    }
+
+    if extract_fn:
+      raw_items, raw_elapsed = _timed(extract_fn, raw, mime_type)
+      processed_items, processed_elapsed = _timed(extract_fn, processed, processed_mime)
+      reference = expected.get(filename) or [item["name"] for item in raw_items]
+
+      row.update({
+        "raw_extract_ms": round(raw_elapsed * 1000, 1),
+        "processed_extract_ms": round(processed_elapsed * 1000, 1),
+        "raw_items": len(raw_items),
+        "processed_items": len(processed_items),
+        "raw_recall": _recall(raw_items, reference) if filename in expected else None,
+        "processed_recall": _recall(processed_items, reference)
+      })
+
+    rows.append(row)
+
+  summary = {
+    "images": len(rows),
+    "raw_bytes_total": sum(r["raw_bytes"] for r in rows),
+    "processed_bytes_total": sum(r["processed_bytes"] for r in rows),
+    "preprocess_ms_median": statistics.median(r["preprocess_ms"] for r in rows) if rows else None
+  }
+  if extract_fn and rows:
+    summary["raw_extract_ms_median"] = statistics.median(r["raw_extract_ms"] for r in rows)
+    summary["processed_extract_ms_median"] = statistics.median(r["processed_extract_ms"] for r in rows)
+    recalls = [r["processed_recall"] for r in rows if r["processed_recall"] is not None]
+    summary["processed_recall_mean"] = statistics.mean(recalls) if recalls else None
+
+  return {"summary": summary, "images": rows}
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Benchmark menu image preprocessing against raw uploads.")
+  parser.add_argument("--images", default=IMAGE_DIR)
+  parser.add_argument("--extract", action="store_true", help="Run Gemini extraction on raw and preprocessed images")
+  parser.add_argument("--expected", help="JSON file mapping image filename to expected item names")
+  parser.add_argument("--repeat", type=int, default=3, help="Preprocessing repetitions per image (median is reported)")
+  parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+  args = parser.parse_args()
+
+  expected = {}
+  if args.expected:
+    with open(args.expected) as f:
+      expected = json.load(f)
+
+  report = run(args.images, args.extract, expected, args.repeat)
+
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(report, f, indent=2)
+  else:
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+  main()
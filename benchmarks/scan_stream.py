@@ -0,0 +1,180 @@
+#benchmarks/scan_stream.py
+
+# Drives the streaming menu scan (stream_scan_menu_image) with a fake model
+# that emits a known menu as JSON text in timed chunks, so the streaming path
+# runs without Gemini. Reports time to the first item, total time, how long
+# the event loop was blocked, and whether the streamed items match the menu;
+# a second run of the same image is served from the scan cache.
+#
+#   python -m benchmarks.scan_stream
+#   python -m benchmarks.scan_stream --items 40 --chunk-chars 24 --chunk-delay-ms 50
+
+import os
+import tempfile
+
+# Must be set before app.firebase_init is imported; see benchmarks/handlers.py.
+os.environ["FIRESTORE_BACKEND"] = "memory"
+os.environ.setdefault("FIREBASE_AUTH_EMULATOR_HOST", "127.0.0.1:9099")
+os.environ.setdefault("EMAIL_OUTBOX_WORKER", "false")
+os.environ.setdefault("SCAN_CACHE_BACKEND", "disk")
+os.environ.setdefault("SCAN_CACHE_DIR", tempfile.mkdtemp(prefix="scan-stream-cache-"))
+
+import io
+import sys
+import json
+import time
+import asyncio
+import argparse
+import firebase_admin
+from PIL import Image
+from starlette.datastructures import UploadFile, Headers
+from app.firebase_init import db
+from benchmarks.loadtest.auth_shim import mint_id_token
+
+
+class _Chunk:
+  def __init__(self, text: str):
+    self.text = text
+
+
+class FakeMenuModel:
+  # Stands in for genai.GenerativeModel in _stream_menu_from_image: returns
+  # the menu as a ```json fenced array, split into chunk_chars pieces with
+  # chunk_delay seconds between them, like a streamed model response.
+
+  def __init__(self, items: list, chunk_chars: int = 32, chunk_delay: float = 0.02):
+    self.items = items
+    self.chunk_chars = chunk_chars
+    self.chunk_delay = chunk_delay
+    self.calls = 0
+
+  def generate_content(self, contents, stream=False, **kwargs):
+    self.calls += 1
+    text = "```json\n" + json.dumps(self.items, indent=2) + "\n```"
+    return self._chunks(text) if stream else _Chunk(text)
+
+  def _chunks(self, text: str):
+    for start in range(0, len(text), self.chunk_chars):
+      time.sleep(self.chunk_delay)
+      yield _Chunk(text[start:start + self.chunk_chars])
+
+
+def _menu(count: int) -> list:
+  return [
+    {"name": f"Menu Item {n}", "price": 20 + 5 * n, "description": f"Simple dish number {n}"}
+    for n in range(1, count + 1)
+  ]
+
+
+def _image_bytes(seed: int) -> bytes:
+  out = io.BytesIO()
+  Image.new("RGB", (640, 480), (seed % 256, 120, 60)).save(out, format="PNG")
+  return out.getvalue()
+
+
+def _staff_token() -> str:
+  uid = "bench-scan-staff"
+  email = f"{uid}@bench0.edu"
+  db.collection("staffs").document(uid).set({
+    "name": "Bench Scanner",
+    "email": email,
+    "role": "staff",
+    "status": "active",
+    "college_id": "bench-college-0",
+    "stall_id": "stall-0"
+  })
+  return mint_id_token(uid, email, firebase_admin.get_app().project_id)
+
+
+async def _loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+  # Longest gap between ticks beyond the expected interval.
+  worst = 0.0
+  while not stop.is_set():
+    started = time.perf_counter()
+    await asyncio.sleep(interval)
+    worst = max(worst, time.perf_counter() - started - interval)
+  return worst
+
+
+async def _scan_once(token: str, image: bytes, model: FakeMenuModel, stream_format: str) -> dict:
+  from app.staff import stream_scan_menu_image
+
+  upload = UploadFile(io.BytesIO(image), filename="menu.png", headers=Headers({"content-type": "image/png"}))
+  stop = asyncio.Event()
+  lag_task = asyncio.create_task(_loop_lag(stop))
+
+  started = time.perf_counter()
+  response = await stream_scan_menu_image(upload, token, stream_format=stream_format, model=model)
+  if not hasattr(response, "body_iterator"):
+    stop.set()
+    await lag_task
+    raise RuntimeError(f"Scan was rejected: {response.status_code} {response.body.decode()}")
+
+  events = []
+  first_item = None
+  async for chunk in response.body_iterator:
+    text = chunk.decode() if isinstance(chunk, bytes) else chunk
+    for line in text.splitlines():
+      if stream_format == "sse":
+        if not line.startswith("data: "):
+          continue
+        line = line[6:]
+      if not line.strip():
+        continue
+      event = json.loads(line)
+      if event["type"] == "item" and first_item is None:
+        first_item = time.perf_counter() - started
+      events.append(event)
+  total = time.perf_counter() - started
+
+  stop.set()
+  lag = await lag_task
+  return {"events": events, "first_item": first_item, "total": total, "lag": lag}
+
+
+def _summarize(label: str, result: dict, expected: list) -> dict:
+  items = [event["item"] for event in result["events"] if event["type"] == "item"]
+  last = result["events"][-1] if result["events"] else {}
+  return {
+    "run": label,
+    "items": len(items),
+    "matches_menu": [(item["name"], item["price"]) for item in items] == [(item["name"], item["price"]) for item in expected],
+    "final_event": last.get("type"),
+    "cached": last.get("cached"),
+    "first_item_ms": round(result["first_item"] * 1000, 1) if result["first_item"] is not None else None,
+    "total_ms": round(result["total"] * 1000, 1),
+    "max_loop_lag_ms": round(result["lag"] * 1000, 1)
+  }
+
+
+async def run(items: int, chunk_chars: int, chunk_delay: float, stream_format: str) -> dict:
+  menu = _menu(items)
+  model = FakeMenuModel(menu, chunk_chars=chunk_chars, chunk_delay=chunk_delay)
+  token = _staff_token()
+  image = _image_bytes(items)
+
+  rows = [
+    _summarize("fresh", await _scan_once(token, image, model, stream_format), menu),
+    _summarize("repeat", await _scan_once(token, image, model, stream_format), menu)
+  ]
+  return {"model_calls": model.calls, "format": stream_format, "runs": rows}
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Exercise the streaming menu scan with a fake model stream.")
+  parser.add_argument("--items", type=int, default=20, help="Items in the fake menu")
+  parser.add_argument("--chunk-chars", type=int, default=32, help="Characters per streamed chunk")
+  parser.add_argument("--chunk-delay-ms", type=float, default=20, help="Delay before each chunk")
+  parser.add_argument("--format", choices=["ndjson", "sse"], default="ndjson")
+  args = parser.parse_args()
+
+  report = asyncio.run(run(args.items, args.chunk_chars, args.chunk_delay_ms / 1000, args.format))
+  json.dump(report, sys.stdout, indent=2)
+  print()
+
+  ok = all(row["matches_menu"] and row["final_event"] == "done" for row in report["runs"])
+  sys.exit(0 if ok and report["model_calls"] == 1 else 1)
+
+
+if __name__ == "__main__":
+  main()